@@ -0,0 +1,139 @@
+'''
+Description: Offline tracker benchmark on MOT sequences and synthetic crowds
+Version:
+Author:
+Date: 2026-10-18 16:02:51
+LastEditTime: 2026-10-18 16:02:51
+'''
+# limit the number of cpus used by high performance libraries, same as main.py
+import os
+os.environ["OMP_NUM_THREADS"] = "1"
+os.environ["OPENBLAS_NUM_THREADS"] = "1"
+os.environ["MKL_NUM_THREADS"] = "1"
+os.environ["VECLIB_MAXIMUM_THREADS"] = "1"
+os.environ["NUMEXPR_NUM_THREADS"] = "1"
+
+import sys
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from tabulate import tabulate
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[0]  #root directory
+
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+
+from tools.benchmark import MotSequence, Sequence, SyntheticCrowd, load_detections, replay, summarize
+from tracker.deep_sort.utils.io import write_results
+
+
+def load_sequences(args):
+    seqs = []
+    if args.mot_root:
+        root = Path(args.mot_root)
+        names = args.seqs or sorted(p.name for p in root.iterdir() if (p / 'det' / 'det.txt').is_file())
+        seqs += [MotSequence(root / name, min_score=args.min_score) for name in names]
+    for path in args.dets:
+        seq = Sequence(Path(path).stem.split('.')[0], load_detections(path, args.min_score), *args.frame_size)
+        seq.data_root = None
+        seqs.append(seq)
+    for n in args.crowd:
+        seqs.append(SyntheticCrowd(n, length=args.crowd_frames, seed=args.seed))
+    return seqs
+
+
+def run(name, args, seq):
+    if args.inline:
+        return replay(name, args, seq)
+    # a fresh interpreter per run, so imports, weights and peak RSS are the tracker's own
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+        return executor.submit(replay, name, args, seq).result()
+
+
+def main(args):
+    try:
+        from tracker.deep_sort.utils.evaluation import Evaluator
+    except ImportError as e:  # motmetrics
+        print(f'MOTA/IDF1 skipped: {e}')
+        Evaluator = None
+
+    save_dir = Path(args.output)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    seqs = load_sequences(args)
+    assert seqs, 'nothing to replay, give --mot-root, --dets or --crowd'
+
+    rows = []
+    for seq in seqs:
+        if seq.data_root is None and seq.write_gt(save_dir / 'gt'):
+            seq.data_root = str(save_dir / 'gt')
+        n_dets = sum(len(d) for d in seq.detections.values())
+        for name in args.trackers:
+            print(f'{name} on {seq.name} ({len(seq)} frames, {n_dets / max(len(seq), 1):.1f} detections per frame)')
+            out = run(name, args, seq)
+            result_file = save_dir / name / f'{seq.name}.txt'
+            result_file.parent.mkdir(parents=True, exist_ok=True)
+            write_results(str(result_file), out['results'], 'mot')
+
+            row = {'sequence': seq.name, 'tracker': name, 'frames': len(seq),
+                   'dets/frame': n_dets / max(len(seq), 1)}
+            row.update(summarize(out))
+            if Evaluator is not None and seq.data_root is not None:
+                acc = Evaluator(seq.data_root, seq.name, 'mot').eval_file(str(result_file))
+                summary = Evaluator.get_summary([acc], [seq.name], metrics=('mota', 'idf1', 'num_switches'))
+                row.update(MOTA=summary['mota'][seq.name], IDF1=summary['idf1'][seq.name],
+                           IDsw=int(summary['num_switches'][seq.name]))
+            rows.append(row)
+
+    print(tabulate(rows, headers='keys', floatfmt='.2f'))
+    import pandas as pd
+    pd.DataFrame(rows).to_csv(save_dir / 'benchmark.csv', index=False)
+    print('Results saved to %s' % save_dir)
+
+
+def get_args():
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--trackers', nargs='+', type=str, default=['bytetracker', 'deepsort', 'deep_bytetracker'],
+                        help='registered trackers to compare')
+    parser.add_argument('--device', default='cpu', help='cuda device, i.e. 0 or 0,1,2,3 or cpu')
+    # detections
+    parser.add_argument('--mot-root', type=str, default=None, help='MOTChallenge split, i.e. MOT16/train')
+    parser.add_argument('--seqs', nargs='+', type=str, default=None, help='sequences of --mot-root, default all')
+    parser.add_argument('--dets', nargs='+', type=str, default=[], help='extra det.txt / .npz detection files')
+    parser.add_argument('--frame-size', nargs=2, type=int, default=[1920, 1080], help='w h of --dets frames')
+    parser.add_argument('--min-score', type=float, default=None, help='drop detections below this score')
+    parser.add_argument('--crowd', nargs='+', type=int, default=[], help='synthetic crowds of these sizes, i.e. 10 50 200')
+    parser.add_argument('--crowd-frames', type=int, default=300, help='frames per synthetic crowd')
+    parser.add_argument('--seed', type=int, default=0, help='synthetic crowd seed')
+    parser.add_argument('--output', type=str, default='./inference/benchmark', help='output folder')
+    parser.add_argument('--inline', action='store_true', help='run every tracker in this process (no RSS isolation)')
+
+    ####byte track
+    parser.add_argument("--track_thresh", type=float, default=0.5, help="tracking confidence threshold")
+    parser.add_argument("--track_buffer", type=int, default=30, help="the frames for keep lost tracks")
+    parser.add_argument("--match_thresh", type=float, default=0.8, help="matching threshold for tracking")
+    parser.add_argument('--min-box-area', type=int, default=10, help='filter out tiny boxes')
+    parser.add_argument("--mot20", dest="mot20", default=False, action="store_true", help="test mot20.")
+    parser.add_argument('--det-interval', type=int, default=1, help='detected frames, the others are predict-only')
+    parser.add_argument('--det-adaptive', action='store_true', help='adapt the interval to track speed')
+    parser.add_argument('--det-max-shift', type=float, default=0.1, help='motion between detections, in box heights')
+
+    ####deep sort
+    parser.add_argument('--deep_sort_model', type=str, default='osnet_x0_25')
+    parser.add_argument("--config_deepsort", type=str, default="tracker/deep_sort/configs/deep_sort.yaml")
+
+    args = parser.parse_args()
+
+    return args
+
+if __name__ == '__main__':
+
+    args = get_args()
+    main(args)
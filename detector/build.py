@@ -15,6 +15,8 @@ The registered object must be a callable that accepts one arguments:
 args
 Registered object must return instance of :class:`DETECTOR`.
 """
+# imported on first use, models.common pulls in the whole YOLOv5 package
+DETECTOR_REGISTRY.register_lazy("yolov5", "models.common")
 
 def build_detector(args):
     detector_name = args.detector
@@ -1 +1,6 @@
-from models.common import DetectMultiBackend
+def __getattr__(name):
+    # models.common pulls in the whole detector, imported when DetectMultiBackend is used only
+    if name == 'DetectMultiBackend':
+        from models.common import DetectMultiBackend
+        return DetectMultiBackend
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -6,6 +6,7 @@ Format                  | Example                   | `--include ...` argument
 ---                     | ---                       | ---
 PyTorch                 | yolov5s.pt                | -
 TorchScript             | yolov5s.torchscript       | `torchscript`
+TorchScript INT8 (CPU)  | yolov5s-int8.torchscript  | `torchscript --int8`
 ONNX                    | yolov5s.onnx              | `onnx`
 CoreML                  | yolov5s.mlmodel           | `coreml`
 OpenVINO                | yolov5s_openvino_model/   | `openvino`
@@ -42,7 +43,9 @@ import os
 import subprocess
 import sys
 import time
+from copy import deepcopy
 from pathlib import Path
+from typing import List, Tuple
 
 import torch
 import torch.nn as nn
@@ -80,6 +83,102 @@ def export_torchscript(model, im, file, optimize, prefix=colorstr('TorchScript:'
         LOGGER.info(f'{prefix} export failure: {e}')
 
 
+class _QuantizableBody(nn.Module):
+    # Model layers up to Detect(), returns the Detect() inputs. Model.forward() without its augment/profile/visualize
+    # branches, which torch.fx can not trace
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x):
+        y = []  # outputs
+        for m in self.model.model[:-1]:
+            if m.f != -1:  # if not from previous layer
+                x = y[m.f] if isinstance(m.f, int) else [x if j == -1 else y[j] for j in m.f]  # from earlier layers
+            x = m(x)  # run
+            y.append(x if m.i in self.model.save else None)  # save output
+        return [y[j] for j in self.model.model[-1].f]
+
+
+class _ScriptableDetect(nn.Module):
+    # Detect() inference in float for TorchScript scripting, the grids follow the shape of every input so that the
+    # scripted model runs any batch and image size
+    def __init__(self, detect):
+        super().__init__()
+        self.na, self.no = detect.na, detect.no
+        self.m = detect.m
+        self.register_buffer('stride', detect.stride.clone())
+        self.register_buffer('anchors', detect.anchors.clone())  # shape(nl,na,2), in grid cells
+
+    def forward(self, x: List[torch.Tensor]) -> Tuple[torch.Tensor, List[torch.Tensor]]:
+        z, out = [], []
+        for i, conv in enumerate(self.m):
+            p = conv(x[i])
+            bs, _, ny, nx = p.shape  # x(bs,255,20,20) to x(bs,3,20,20,85)
+            p = p.view(bs, self.na, self.no, ny, nx).permute(0, 1, 3, 4, 2).contiguous()
+            yv, xv = torch.meshgrid([torch.arange(ny, device=p.device), torch.arange(nx, device=p.device)],
+                                    indexing='ij')
+            grid = torch.stack((xv, yv), 2).view(1, 1, ny, nx, 2).float()
+            anchor_grid = (self.anchors[i] * self.stride[i]).view(1, self.na, 1, 1, 2)
+            y = p.sigmoid()
+            xy = (y[..., 0:2] * 2 - 0.5 + grid) * self.stride[i]  # xy
+            wh = (y[..., 2:4] * 2) ** 2 * anchor_grid  # wh
+            z.append(torch.cat((xy, wh, y[..., 4:]), -1).view(bs, -1, self.no))
+            out.append(p)
+        return torch.cat(z, 1), out
+
+
+class _Int8Model(nn.Module):
+    # INT8 body and float Detect(), returns (inference output, Detect() outputs) as Model.forward()
+    def __init__(self, body, detect):
+        super().__init__()
+        self.body = body
+        self.detect = detect
+
+    def forward(self, x):
+        return self.detect(self.body(x))
+
+
+def export_torchscript_int8(model, im, file, data, calib, ncalib, prefix=colorstr('TorchScript INT8:')):
+    # YOLOv5 TorchScript INT8 export, PyTorch FX post-training static quantization for CPU inference
+    try:
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+        engine = torch.backends.quantized.engine  # x86 or fbgemm on Intel/AMD, qnnpack on ARM
+        LOGGER.info(f'\n{prefix} starting export with torch {torch.__version__} ({engine} engine)...')
+        f = str(file).replace('.pt', '-int8.torchscript')
+        batch_size, ch, *imgsz = list(im.shape)  # BCHW
+
+        model = deepcopy(model).float().cpu()
+        for m in model.modules():
+            if isinstance(m, Conv) and isinstance(m.act, SiLU):
+                m.act = nn.SiLU()  # x * sigmoid(x) quantizes to int8 mul and sigmoid ops, slower than float SiLU
+        # Detect() decodes the boxes in float, outside of the quantized graph
+        prepared = prepare_fx(_QuantizableBody(model), get_default_qconfig_mapping(engine), (im.float().cpu(),))
+        dataset = LoadImages(calib or check_dataset(data)['train'], img_size=imgsz, stride=int(max(model.stride)),
+                             auto=False)  # calibration frames
+        n = 0
+        for path, img, im0s, vid_cap, s in dataset:
+            prepared(torch.from_numpy(img)[None].float() / 255)  # observe activation ranges
+            n += 1
+            if n >= ncalib:
+                break
+        assert n, f'no calibration images in {calib or data}'
+        quantized = convert_fx(prepared)
+
+        # scripted, not traced: a trace fixes the batch and image size of `im`
+        im = im.float().cpu()
+        ts = torch.jit.script(_Int8Model(quantized, _ScriptableDetect(model.model[-1])))
+        d = {"shape": im.shape, "stride": int(max(model.stride)), "names": model.names, "qengine": engine}
+        extra_files = {'config.txt': json.dumps(d)}  # DetectMultiBackend selects the quantized engine from it
+        ts.save(f, _extra_files=extra_files)
+
+        LOGGER.info(f'{prefix} calibrated on {n} images, saved as {f} ({file_size(f):.1f} MB)')
+    except Exception as e:
+        LOGGER.info(f'{prefix} export failure: {e}')
+
+
 def export_onnx(model, im, file, opset, train, dynamic, simplify, prefix=colorstr('ONNX:')):
     # YOLOv5 ONNX export
     try:
@@ -341,7 +440,9 @@ def run(data=ROOT / 'data/coco128.yaml',  # 'dataset.yaml path'
         inplace=False,  # set YOLOv5 Detect() inplace=True
         train=False,  # model.train() mode
         optimize=False,  # TorchScript: optimize for mobile
-        int8=False,  # CoreML/TF INT8 quantization
+        int8=False,  # CoreML/TF/TorchScript INT8 quantization
+        calib=None,  # TorchScript INT8: calibration images or videos, default the --data train split
+        ncalib=100,  # TorchScript INT8: calibration images
         dynamic=False,  # ONNX/TF: dynamic axes
         simplify=False,  # ONNX: simplify model
         opset=12,  # ONNX: opset version
@@ -393,7 +494,10 @@ def run(data=ROOT / 'data/coco128.yaml',  # 'dataset.yaml path'
 
     # Exports
     if 'torchscript' in include:
-        export_torchscript(model, im, file, optimize)
+        if int8:
+            export_torchscript_int8(model, im, file, data, calib, ncalib)
+        else:
+            export_torchscript(model, im, file, optimize)
     if ('onnx' in include) or ('openvino' in include):  # OpenVINO requires ONNX
         export_onnx(model, im, file, opset, train, dynamic, simplify)
     if 'engine' in include:
@@ -434,7 +538,9 @@ def parse_opt():
     parser.add_argument('--inplace', action='store_true', help='set YOLOv5 Detect() inplace=True')
     parser.add_argument('--train', action='store_true', help='model.train() mode')
     parser.add_argument('--optimize', action='store_true', help='TorchScript: optimize for mobile')
-    parser.add_argument('--int8', action='store_true', help='CoreML/TF INT8 quantization')
+    parser.add_argument('--int8', action='store_true', help='CoreML/TF/TorchScript INT8 quantization')
+    parser.add_argument('--calib', type=str, default=None, help='TorchScript INT8: calibration images')
+    parser.add_argument('--ncalib', type=int, default=100, help='TorchScript INT8: number of calibration images')
     parser.add_argument('--dynamic', action='store_true', help='ONNX/TF: dynamic axes')
     parser.add_argument('--simplify', action='store_true', help='ONNX: simplify model')
     parser.add_argument('--opset', type=int, default=12, help='ONNX: opset version')
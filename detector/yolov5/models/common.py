@@ -13,8 +13,6 @@ from pathlib import Path
 
 import cv2
 import numpy as np
-import pandas as pd
-import requests
 import torch
 import torch.nn as nn
 from PIL import Image
@@ -22,7 +20,7 @@ from torch.cuda import amp
 
 from utils.datasets import exif_transpose, letterbox
 from utils.general import (LOGGER, check_requirements, check_suffix, check_version, colorstr, increment_path,
-                           make_divisible, non_max_suppression, scale_coords, xywh2xyxy, xyxy2xywh)
+                           make_divisible, nms, non_max_suppression, scale_coords, xywh2xyxy, xyxy2xywh)
 from utils.plots import Annotator, colors, save_one_box
 from utils.torch_utils import copy_attr, time_sync
 from detector.build import DETECTOR_REGISTRY
@@ -282,31 +280,37 @@ class DetectMultiBackend(Detector):
         # Usage:
         #   PyTorch:      weights = *.pt
         #   TorchScript:            *.torchscript
+        #   TorchScript INT8 (CPU): *-int8.torchscript
         #   CoreML:                 *.mlmodel
         #   TensorFlow:             *_saved_model
         #   TensorFlow:             *.pb
         #   TensorFlow Lite:        *.tflite
         #   ONNX Runtime:           *.onnx
         #   OpenCV DNN:             *.onnx with dnn=True
+        #   OpenVINO:               *.xml
         #   TensorRT:               *.engine
         from models.experimental import attempt_download, attempt_load  # scoped to avoid circular import
 
         super().__init__()
         w = str(weights[0] if isinstance(weights, list) else weights)
         suffix = Path(w).suffix.lower()
-        suffixes = ['.pt', '.torchscript', '.onnx', '.engine', '.tflite', '.pb', '', '.mlmodel']
+        suffixes = ['.pt', '.torchscript', '.onnx', '.engine', '.tflite', '.pb', '', '.mlmodel', '.xml']
         check_suffix(w, suffixes)  # check weights have acceptable suffix
-        pt, jit, onnx, engine, tflite, pb, saved_model, coreml = (suffix == x for x in suffixes)  # backend booleans
+        pt, jit, onnx, engine, tflite, pb, saved_model, coreml, xml = (suffix == x for x in suffixes)  # backends
         stride, names = 64, [f'class{i}' for i in range(1000)]  # assign defaults
         w = attempt_download(w)  # download if not local
 
         if jit:  # TorchScript
             LOGGER.info(f'Loading {w} for TorchScript inference...')
             extra_files = {'config.txt': ''}  # model metadata
-            model = torch.jit.load(w, _extra_files=extra_files)
+            model = torch.jit.load(w, _extra_files=extra_files, map_location=device)
             if extra_files['config.txt']:
                 d = json.loads(extra_files['config.txt'])  # extra_files dict
                 stride, names = int(d['stride']), d['names']
+                if d.get('qengine'):  # INT8 model of export.py --int8, its kernels run on the CPU only
+                    assert torch.device(device or 'cpu').type == 'cpu', f'{w} is an INT8 CPU model, use --device cpu'
+                    torch.backends.quantized.engine = d['qengine']
+                    LOGGER.info(f'INT8 model, {d["qengine"]} quantized engine')
         elif pt:  # PyTorch
             model = attempt_load(weights if isinstance(weights, list) else w, map_location=device)
             stride = int(model.stride.max())  # model stride
@@ -327,6 +331,13 @@ class DetectMultiBackend(Detector):
             import onnxruntime
             providers = ['CUDAExecutionProvider', 'CPUExecutionProvider'] if cuda else ['CPUExecutionProvider']
             session = onnxruntime.InferenceSession(w, providers=providers)
+        elif xml:  # OpenVINO
+            LOGGER.info(f'Loading {w} for OpenVINO inference...')
+            check_requirements(('openvino-dev',))  # requires openvino-dev: https://pypi.org/project/openvino-dev/
+            import openvino.inference_engine as ie
+            core = ie.IECore()
+            network = core.read_network(model=w, weights=Path(w).with_suffix('.bin'))  # *.xml, *.bin paths
+            executable_network = core.load_network(network, device_name='CPU', num_requests=1)
         elif engine:  # TensorRT
             LOGGER.info(f'Loading {w} for TensorRT inference...')
             import tensorrt as trt  # https://developer.nvidia.com/nvidia-tensorrt-download
@@ -400,6 +411,13 @@ class DetectMultiBackend(Detector):
                 y = self.net.forward()
             else:  # ONNX Runtime
                 y = self.session.run([self.session.get_outputs()[0].name], {self.session.get_inputs()[0].name: im})[0]
+        elif self.xml:  # OpenVINO
+            im = im.cpu().numpy()  # FP32
+            desc = self.ie.TensorDesc(precision='FP32', dims=im.shape, layout='NCHW')  # Tensor Description
+            request = self.executable_network.requests[0]  # inference request
+            request.set_blob(blob_name='images', blob=self.ie.Blob(desc, im))  # name=next(iter(request.input_blobs))
+            request.infer()
+            y = request.output_blobs['output'].buffer  # name=next(iter(request.output_blobs))
         elif self.engine:  # TensorRT
             assert im.shape == self.bindings['images'].shape, (im.shape, self.bindings['images'].shape)
             self.binding_addrs['images'] = int(im.data_ptr())
@@ -430,6 +448,17 @@ class DetectMultiBackend(Detector):
         y = torch.tensor(y) if isinstance(y, np.ndarray) else y
         return (y, []) if val else y
 
+    def prune(self, classes=None, conf_thres=None):
+        # Prune the Detect() outputs of PyTorch models to `classes` and rows above `conf_thres`, see Detect.prune()
+        # Returns the class of every output class column for non_max_suppression(class_map=...), None if not pruned
+        from models.yolo import Detect  # scoped to avoid circular import
+
+        heads = [m for m in self.model.modules() if isinstance(m, Detect)] if self.pt else []
+        for m in heads:
+            m.prune(classes, conf_thres)
+        if heads and classes is not None:
+            return list(classes)
+
     def warmup(self, imgsz=(1, 3, 640, 640), half=False):
         # Warmup model by running inference once
         if self.pt or self.engine or self.onnx:  # warmup types
@@ -439,7 +468,13 @@ class DetectMultiBackend(Detector):
 
 @DETECTOR_REGISTRY.register()
 def yolov5(args):
-    yolo = DetectMultiBackend(args.yolo_model,args.device,args.dnn)
+    weights = args.yolo_model
+    if getattr(args, 'compile', None):  # fused TorchScript, ONNX or OpenVINO IR from the model cache
+        from tools.modelcache import compiled_model
+        weights = compiled_model(weights, args.compile, args.imgsz, args.compile_batch, args.half, args.device,
+                                 args.compile_dir, args.opset)
+    yolo = DetectMultiBackend(weights,args.device,args.dnn)
+    nms(torch.zeros((0, 4)), torch.zeros(0), 0.45)  # imports torchvision now instead of within the first frame
     return yolo
 
 class AutoShape(nn.Module):
@@ -495,6 +530,7 @@ class AutoShape(nn.Module):
         for i, im in enumerate(imgs):
             f = f'image{i}'  # filename
             if isinstance(im, (str, Path)):  # filename or uri
+                import requests
                 im, f = Image.open(requests.get(im, stream=True).raw if str(im).startswith('http') else im), im
                 im = np.asarray(exif_transpose(im))
             elif isinstance(im, Image.Image):  # PIL Image
@@ -610,6 +646,9 @@ class Detections:
 
     def pandas(self):
         # return detections as pandas DataFrames, i.e. print(results.pandas().xyxy[0])
+        import pandas as pd  # slow to import, only needed here
+        pd.options.display.max_columns = 10
+
         new = copy(self)  # return copy
         ca = 'xmin', 'ymin', 'xmax', 'ymax', 'confidence', 'class', 'name'  # xyxy columns
         cb = 'xcenter', 'ycenter', 'width', 'height', 'confidence', 'class', 'name'  # xywh columns
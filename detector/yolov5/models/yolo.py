@@ -33,6 +33,8 @@ except ImportError:
 class Detect(nn.Module):
     stride = None  # strides computed during build
     onnx_dynamic = False  # ONNX export parameter
+    classes = None  # inference outputs of these classes only, see prune()
+    conf_thres = None  # inference outputs above this confidence only, see prune()
 
     def __init__(self, nc=80, anchors=(), ch=(), inplace=True):  # detection layer
         super().__init__()
@@ -47,6 +49,8 @@ class Detect(nn.Module):
         self.inplace = inplace  # use in-place ops (e.g. slice assignment)
 
     def forward(self, x):
+        if not self.training and (self.classes is not None or self.conf_thres is not None):
+            return self._forward_pruned(x)
         z = []  # inference output
         for i in range(self.nl):
             x[i] = self.m[i](x[i])  # conv
@@ -69,6 +73,45 @@ class Detect(nn.Module):
 
         return x if self.training else (torch.cat(z, 1), x)
 
+    def prune(self, classes=None, conf_thres=None):
+        # Inference outputs pruned per scale, before they are concatenated: only rows above `conf_thres` in some image
+        # and only the box, objectness and `classes` columns. Rows an image would not keep get objectness 0 in that
+        # image, so that best-class NMS with the same conf_thres and classes returns the same detections from a
+        # fraction of the outputs, with class indices into `classes` (see non_max_suppression(class_map=...)).
+        # None, None restores the full outputs.
+        self.classes = None if classes is None else list(classes)
+        self.conf_thres = conf_thres
+
+    def _forward_pruned(self, x):
+        z = []  # inference output
+        conf_thres = 0.0 if self.conf_thres is None else self.conf_thres
+        for i in range(self.nl):
+            x[i] = self.m[i](x[i])  # conv
+            bs, _, ny, nx = x[i].shape  # x(bs,255,20,20) to x(bs,3,20,20,85)
+            x[i] = x[i].view(bs, self.na, self.no, ny, nx).permute(0, 1, 3, 4, 2)
+            if self.onnx_dynamic or self.grid[i].shape[2:4] != x[i].shape[2:4]:
+                self.grid[i], self.anchor_grid[i] = self._make_grid(nx, ny, i)
+
+            # objectness first, the class columns of the few rows above conf_thres only
+            p = x[i].reshape(bs, -1, self.no)
+            rows = (p[..., 4].sigmoid() > conf_thres).any(0).nonzero()[:, 0]
+            y = p[:, rows].sigmoid()
+            conf, j = (y[..., 5:] * y[..., 4:5]).max(-1)  # best class, as in non_max_suppression()
+            valid = conf > conf_thres
+            if self.classes is not None:
+                valid &= (j[..., None] == torch.tensor(self.classes, device=j.device)).any(-1)
+                y = y[..., list(range(5)) + [5 + c for c in self.classes]]
+            keep = valid.any(0)
+            rows, y, valid = rows[keep], y[:, keep], valid[:, keep]
+            y[..., 4] *= valid  # objectness 0 where this image drops the row
+
+            grid, anchor_grid = self.grid[i].reshape(-1, 2)[rows], self.anchor_grid[i].reshape(-1, 2)[rows]
+            y[..., 0:2] = (y[..., 0:2] * 2 - 0.5 + grid) * self.stride[i]  # xy
+            y[..., 2:4] = (y[..., 2:4] * 2) ** 2 * anchor_grid  # wh
+            z.append(y)
+
+        return torch.cat(z, 1), x
+
     def _make_grid(self, nx=20, ny=20, i=0):
         d = self.anchors[i].device
         if check_version(torch.__version__, '1.10.0'):  # torch>=1.10.0 meshgrid workaround for torch>=0.7 compatibility
@@ -0,0 +1,99 @@
+# YOLOv5 🚀 by Ultralytics, GPL-3.0 license
+"""
+Quantize a YOLOv5 PyTorch model to INT8 for CPU inference and compare it with fp32 on a dataset
+
+The model is quantized with PyTorch FX post-training static quantization, calibrated on a folder of frames of the
+target cameras, and saved as TorchScript. val.py then reports mAP and latency of the fp32 and INT8 TorchScript
+models, both with the same square letterboxed inputs and CPU threads.
+
+Usage:
+    $ python path/to/quantize.py --weights yolov5s.pt --calib path/to/frames/ --data data.yaml --img 640
+
+Inference:
+    $ python main.py --yolo_model yolov5s-int8.torchscript --device cpu --imgsz 640
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import torch
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[0]  # YOLOv5 root directory
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+ROOT = Path(os.path.relpath(ROOT, Path.cwd()))  # relative
+
+import export
+import val
+from utils.general import LOGGER, colorstr, print_args
+
+
+def run(weights=ROOT / 'yolov5s.pt',  # model.pt path
+        data=ROOT / 'data/coco128.yaml',  # dataset.yaml path, for the comparison
+        calib=None,  # calibration images or videos, default the --data train split
+        ncalib=100,  # number of calibration images
+        imgsz=640,  # inference size (pixels)
+        batch_size=1,  # val.py batch size
+        conf_thres=0.001,  # val.py confidence threshold
+        iou_thres=0.6,  # val.py NMS IoU threshold
+        task='val',  # val.py split
+        threads=1,  # CPU threads
+        compare=True,  # run val.py on both models
+        project=ROOT / 'runs/quantize',  # save val.py results to project/name
+        name='exp',  # save val.py results to project/name
+        ):
+    torch.set_num_threads(threads)
+    weights = str(weights)
+    assert weights.endswith('.pt'), f'--weights must be a PyTorch model, not {weights}'
+    fp32, int8 = weights.replace('.pt', '.torchscript'), weights.replace('.pt', '-int8.torchscript')
+    export.run(data=data, weights=weights, imgsz=[imgsz], device='cpu', include=('torchscript',), int8=True,
+               calib=calib, ncalib=ncalib)
+    assert Path(int8).exists(), f'INT8 export of {weights} failed, see the log above'
+    if not compare:
+        return int8
+
+    export.run(data=data, weights=weights, imgsz=[imgsz], device='cpu', include=('torchscript',))  # fp32 reference
+    rows = []
+    for label, w in (('fp32', fp32), ('INT8', int8)):
+        (mp, mr, map50, map, *_), _, t = val.run(data, weights=w, batch_size=batch_size, imgsz=imgsz,
+                                                 conf_thres=conf_thres, iou_thres=iou_thres, task=task, device='cpu',
+                                                 half=False, plots=False, project=project, name=f'{name}_{label}')
+        rows.append((f'{label} {Path(w).name}', mp, mr, map50, map, t[1]))
+
+    LOGGER.info(f"\n{colorstr('Quantization:')} {threads} CPU thread(s), batch-size {batch_size}, {imgsz} pixels")
+    LOGGER.info(('%32s' + '%11s' * 6) % ('Model', 'P', 'R', 'mAP@.5', 'mAP@.5:.95', 'ms/img', 'speedup'))
+    for model, mp, mr, map50, map, ms in rows:
+        LOGGER.info(('%32s' + '%11.3g' * 5 + '%10.2fx') % (model, mp, mr, map50, map, ms, rows[0][-1] / ms))
+    return int8
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', type=str, default=ROOT / 'yolov5s.pt', help='model.pt path')
+    parser.add_argument('--data', type=str, default=ROOT / 'data/coco128.yaml', help='dataset.yaml path')
+    parser.add_argument('--calib', type=str, default=None, help='calibration images or videos, default --data train')
+    parser.add_argument('--ncalib', type=int, default=100, help='number of calibration images')
+    parser.add_argument('--imgsz', '--img', '--img-size', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--batch-size', type=int, default=1, help='val.py batch size')
+    parser.add_argument('--conf-thres', type=float, default=0.001, help='val.py confidence threshold')
+    parser.add_argument('--iou-thres', type=float, default=0.6, help='val.py NMS IoU threshold')
+    parser.add_argument('--task', default='val', help='val.py split, train, val or test')
+    parser.add_argument('--threads', type=int, default=1, help='CPU threads, main.py runs with 1')
+    parser.add_argument('--no-compare', dest='compare', action='store_false', help='skip the val.py comparison')
+    parser.add_argument('--project', default=ROOT / 'runs/quantize', help='save val.py results to project/name')
+    parser.add_argument('--name', default='exp', help='save val.py results to project/name')
+    opt = parser.parse_args()
+    print_args(FILE.stem, opt)
+    return opt
+
+
+def main(opt):
+    run(**vars(opt))
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    main(opt)
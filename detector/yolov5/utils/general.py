@@ -23,10 +23,7 @@ from zipfile import ZipFile
 
 import cv2
 import numpy as np
-import pandas as pd
-import pkg_resources as pkg
 import torch
-import torchvision
 import yaml
 
 from .downloads import gsutil_getsize
@@ -39,7 +36,6 @@ NUM_THREADS = min(8, max(1, os.cpu_count() - 1))  # number of YOLOv5 multiproces
 
 torch.set_printoptions(linewidth=320, precision=5, profile='long')
 np.set_printoptions(linewidth=320, formatter={'float_kind': '{:11.5g}'.format})  # format short g, %precision=5
-pd.options.display.max_columns = 10
 cv2.setNumThreads(0)  # prevent OpenCV from multithreading (incompatible with PyTorch DataLoader)
 os.environ['NUMEXPR_MAX_THREADS'] = str(NUM_THREADS)  # NumExpr max threads
 
@@ -252,6 +248,8 @@ def check_python(minimum='3.6.2'):
 
 def check_version(current='0.0.0', minimum='0.0.0', name='version ', pinned=False, hard=False, verbose=False):
     # Check version vs. required version
+    import pkg_resources as pkg  # slow to import, only needed here
+
     current, minimum = (pkg.parse_version(x) for x in (current, minimum))
     result = (current == minimum) if pinned else (current >= minimum)  # bool
     s = f'{name}{minimum} required by YOLOv5, but {name}{current} is currently installed'  # string
@@ -265,6 +263,8 @@ def check_version(current='0.0.0', minimum='0.0.0', name='version ', pinned=Fals
 @try_except
 def check_requirements(requirements=ROOT / 'requirements.txt', exclude=(), install=True):
     # Check installed dependencies meet requirements (pass *.txt file or list of packages)
+    import pkg_resources as pkg
+
     prefix = colorstr('red', 'bold', 'requirements:')
     check_python()  # check python version
     if isinstance(requirements, (str, Path)):  # requirements.txt file
@@ -507,7 +507,7 @@ def labels_to_class_weights(labels, nc=80):
         return torch.Tensor()
 
     labels = np.concatenate(labels, 0)  # labels.shape = (866643, 5) for COCO
-    classes = labels[:, 0].astype(np.int)  # labels = [class xywh]
+    classes = labels[:, 0].astype(int)  # labels = [class xywh]
     weights = np.bincount(classes, minlength=nc)  # occurrences per class
 
     # Prepend gridpoint count (for uCE training)
@@ -522,7 +522,7 @@ def labels_to_class_weights(labels, nc=80):
 
 def labels_to_image_weights(labels, nc=80, class_weights=np.ones(80)):
     # Produces image weights based on class_weights and image contents
-    class_counts = np.array([np.bincount(x[:, 0].astype(np.int), minlength=nc) for x in labels])
+    class_counts = np.array([np.bincount(x[:, 0].astype(int), minlength=nc) for x in labels])
     image_weights = (class_weights.reshape(1, nc) * class_counts).sum(1)
     # index = random.choices(range(n), weights=image_weights, k=1)  # weight image sample
     return image_weights
@@ -644,14 +644,63 @@ def clip_coords(boxes, shape):
         boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, shape[0])  # y1, y2
 
 
+_torchvision_nms = True  # False once torchvision.ops.nms failed, e.g. torchvision built without its C++ ops
+
+
+def nms_numpy(boxes, scores, iou_thres):
+    # Greedy NMS in NumPy, indices of the kept boxes by decreasing score (as torchvision.ops.nms)
+    boxes = boxes.astype(np.float64)
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+    while order.size:
+        i, rest = order[0], order[1:]
+        keep.append(i)
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        order = rest[inter / (areas[i] + areas[rest] - inter + 1E-9) <= iou_thres]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def nms(boxes, scores, iou_thres):
+    # torchvision.ops.nms, falls back to nms_numpy() where torchvision's compiled ops are missing
+    global _torchvision_nms
+    if _torchvision_nms:
+        try:
+            import torchvision  # imported on first use, it also pulls in torch._dynamo
+            return torchvision.ops.nms(boxes, scores, iou_thres)
+        except (ImportError, RuntimeError, NotImplementedError) as e:
+            _torchvision_nms = False
+            LOGGER.warning(f'WARNING: torchvision.ops.nms unavailable ({e}), using NumPy NMS')
+    keep = nms_numpy(boxes.detach().cpu().numpy(), scores.detach().cpu().numpy(), iou_thres)
+    return torch.from_numpy(keep).to(boxes.device)
+
+
+def batched_nms(boxes, scores, groups, iou_thres):
+    # NMS within groups (e.g. image and class) in a single call: every group is shifted by its own offset so that
+    # boxes of different groups never overlap. Group ids are compacted first, which keeps the offsets small enough
+    # for float32 boxes. Returns kept indices by decreasing score.
+    if not len(boxes):
+        return torch.zeros(0, dtype=torch.long, device=boxes.device)
+    groups = torch.unique(groups, return_inverse=True)[1]
+    span = boxes.max() - boxes.min() + 1
+    return nms(boxes + (groups.to(boxes.dtype) * span)[:, None], scores, iou_thres)
+
+
 def non_max_suppression(prediction, conf_thres=0.25, iou_thres=0.45, classes=None, agnostic=False, multi_label=False,
-                        labels=(), max_det=300):
+                        labels=(), max_det=300, class_map=None):
     """Runs Non-Maximum Suppression (NMS) on inference results
 
+    All images of the batch go through one NMS call, boxes are grouped by image (and class unless agnostic).
+    class_map lists the class of every class column of a pruned prediction (Detect.prune()).
+
     Returns:
          list of detections, on (n,6) tensor per image [xyxy, conf, cls]
     """
 
+    bs = prediction.shape[0]  # batch size
     nc = prediction.shape[2] - 5  # number of classes
     xc = prediction[..., 4] > conf_thres  # candidates
 
@@ -661,81 +710,85 @@ def non_max_suppression(prediction, conf_thres=0.25, iou_thres=0.45, classes=Non
 
     # Settings
     min_wh, max_wh = 2, 4096  # (pixels) minimum and maximum box width and height
-    max_nms = 30000  # maximum number of boxes into torchvision.ops.nms()
-    time_limit = 10.0  # seconds to quit after
+    max_nms = 30000  # maximum number of boxes per image into NMS
     redundant = True  # require redundant detections
     multi_label &= nc > 1  # multiple labels per box (adds 0.5ms/img)
     merge = False  # use merge-NMS
 
-    t = time.time()
-    output = [torch.zeros((0, 6), device=prediction.device)] * prediction.shape[0]
-    for xi, x in enumerate(prediction):  # image index, image inference
-        # Apply constraints
-        # x[((x[..., 2:4] < min_wh) | (x[..., 2:4] > max_wh)).any(1), 4] = 0  # width-height
-        x = x[xc[xi]]  # confidence
-
-        # Cat apriori labels if autolabelling
-        if labels and len(labels[xi]):
-            l = labels[xi]
-            v = torch.zeros((len(l), nc + 5), device=x.device)
-            v[:, :4] = l[:, 1:5]  # box
-            v[:, 4] = 1.0  # conf
-            v[range(len(l)), l[:, 0].long() + 5] = 1.0  # cls
-            x = torch.cat((x, v), 0)
-
-        # If none remain process next image
-        if not x.shape[0]:
-            continue
-
-        # Compute conf
-        x[:, 5:] *= x[:, 4:5]  # conf = obj_conf * cls_conf
-
-        # Box (center x, center y, width, height) to (x1, y1, x2, y2)
-        box = xywh2xyxy(x[:, :4])
-
-        # Detections matrix nx6 (xyxy, conf, cls)
-        if multi_label:
-            i, j = (x[:, 5:] > conf_thres).nonzero(as_tuple=False).T
-            x = torch.cat((box[i], x[i, j + 5, None], j[:, None].float()), 1)
-        else:  # best class only
-            conf, j = x[:, 5:].max(1, keepdim=True)
-            x = torch.cat((box, conf, j.float()), 1)[conf.view(-1) > conf_thres]
-
-        # Filter by class
-        if classes is not None:
-            x = x[(x[:, 5:6] == torch.tensor(classes, device=x.device)).any(1)]
-
-        # Apply finite constraint
-        # if not torch.isfinite(x).all():
-        #     x = x[torch.isfinite(x).all(1)]
-
-        # Check shape
-        n = x.shape[0]  # number of boxes
-        if not n:  # no boxes
-            continue
-        elif n > max_nms:  # excess boxes
-            x = x[x[:, 4].argsort(descending=True)[:max_nms]]  # sort by confidence
-
-        # Batched NMS
-        c = x[:, 5:6] * (0 if agnostic else max_wh)  # classes
-        boxes, scores = x[:, :4] + c, x[:, 4]  # boxes (offset by class), scores
-        i = torchvision.ops.nms(boxes, scores, iou_thres)  # NMS
-        if i.shape[0] > max_det:  # limit detections
-            i = i[:max_det]
-        if merge and (1 < n < 3E3):  # Merge NMS (boxes merged using weighted mean)
-            # update boxes as boxes(i,4) = weights(i,n) * boxes(n,4)
-            iou = box_iou(boxes[i], boxes) > iou_thres  # iou matrix
-            weights = iou * scores[None]  # box weights
-            x[i, :4] = torch.mm(weights, x[:, :4]).float() / weights.sum(1, keepdim=True)  # merged boxes
-            if redundant:
-                i = i[iou.sum(1) > 1]  # require redundancy
-
-        output[xi] = x[i]
-        if (time.time() - t) > time_limit:
-            print(f'WARNING: NMS time limit {time_limit}s exceeded')
-            break  # time limit exceeded
-
-    return output
+    # Candidates of all images, with their image index
+    # x[((x[..., 2:4] < min_wh) | (x[..., 2:4] > max_wh)).any(1), 4] = 0  # width-height
+    x = prediction[xc]  # confidence
+    bi = xc.nonzero(as_tuple=False)[:, 0] if bs > 1 else torch.zeros(len(x), dtype=torch.long, device=x.device)  # image
+
+    # Cat apriori labels if autolabelling
+    if labels and any(len(l) for l in labels):
+        v = [torch.zeros((len(l), nc + 5), device=x.device) for l in labels]
+        for l, vi in zip(labels, v):
+            vi[:, :4] = l[:, 1:5]  # box
+            vi[:, 4] = 1.0  # conf
+            vi[range(len(l)), l[:, 0].long() + 5] = 1.0  # cls
+        x = torch.cat([x] + v, 0)
+        bi = torch.cat([bi] + [torch.full((len(l),), i, device=x.device) for i, l in enumerate(labels)])
+
+    # Compute conf
+    x[:, 5:] *= x[:, 4:5]  # conf = obj_conf * cls_conf
+
+    # Box (center x, center y, width, height) to (x1, y1, x2, y2)
+    box = xywh2xyxy(x[:, :4])
+
+    # Detections matrix nx6 (xyxy, conf, cls)
+    if multi_label:
+        i, j = (x[:, 5:] > conf_thres).nonzero(as_tuple=False).T
+        x, bi = torch.cat((box[i], x[i, j + 5, None], j[:, None].float()), 1), bi[i]
+    else:  # best class only
+        conf, j = x[:, 5:].max(1, keepdim=True)
+        keep = conf.view(-1) > conf_thres
+        x, bi = torch.cat((box, conf, j.float()), 1)[keep], bi[keep]
+    if class_map is not None:  # class columns to classes
+        x[:, 5] = torch.tensor(class_map, device=x.device, dtype=x.dtype)[x[:, 5].long()]
+        nc = max(class_map) + 1
+
+    # Filter by class
+    if classes is not None:
+        keep = (x[:, 5:6] == torch.tensor(classes, device=x.device)).any(1)
+        x, bi = x[keep], bi[keep]
+
+    # Apply finite constraint
+    # if not torch.isfinite(x).all():
+    #     x = x[torch.isfinite(x).all(1)]
+
+    # Check shape
+    n = x.shape[0]  # number of boxes
+    if not n:  # no boxes
+        return [torch.zeros((0, 6), device=prediction.device) for _ in range(bs)]
+    if n > max_nms and torch.bincount(bi).max() > max_nms:  # excess boxes, keep the most confident ones of every image
+        counts = torch.bincount(bi, minlength=bs)
+        i = x[:, 4].argsort(descending=True)
+        i = i[torch.sort(bi[i], stable=True)[1]]  # by image, then confidence
+        rank = torch.arange(n, device=x.device) - (counts.cumsum(0) - counts)[bi[i]]
+        i = i[rank < max_nms]
+        x, bi = x[i], bi[i]
+
+    # Batched NMS
+    groups = bi if agnostic else bi * nc + x[:, 5].long()  # image (and class)
+    boxes, scores = x[:, :4], x[:, 4]
+    i = batched_nms(boxes, scores, groups, iou_thres)  # NMS
+    if merge and (1 < n < 3E3):  # Merge NMS (boxes merged using weighted mean)
+        # update boxes as boxes(i,4) = weights(i,n) * boxes(n,4)
+        iou = (box_iou(boxes[i], boxes) > iou_thres) & (groups[i, None] == groups[None])  # iou matrix
+        weights = iou * scores[None]  # box weights
+        x[i, :4] = torch.mm(weights, x[:, :4]).float() / weights.sum(1, keepdim=True)  # merged boxes
+        if redundant:
+            i = i[iou.sum(1) > 1]  # require redundancy
+
+    # Split by image, most confident first, at most max_det per image
+    if bs == 1:
+        return [x[i[:max_det]]]
+    i = i[torch.sort(bi[i], stable=True)[1]]
+    counts = torch.bincount(bi[i], minlength=bs)
+    rank = torch.arange(len(i), device=x.device) - (counts.cumsum(0) - counts)[bi[i]]
+    i = i[rank < max_det]
+    return list(x[i].split(torch.clamp(counts, max=max_det).tolist()))
 
 
 def strip_optimizer(f='best.pt', s=''):  # from utils.general import *; strip_optimizer()
@@ -779,6 +832,7 @@ def print_mutation(results, hyp, save_dir, bucket):
 
     # Save yaml
     with open(evolve_yaml, 'w') as f:
+        import pandas as pd
         data = pd.read_csv(evolve_csv)
         data = data.rename(columns=lambda x: x.strip())  # strip keys
         i = np.argmax(fitness(data.values[:, :7]))  #
@@ -0,0 +1,102 @@
+'''
+Description: Import-time benchmark, startup cost of main.py and of the first use of every registered backend
+Version:
+Author:
+Date: 2026-10-19 02:31:48
+LastEditTime: 2026-10-19 02:31:48
+'''
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+
+from tabulate import tabulate
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[0]  #root directory
+
+# runs in a fresh interpreter: `setup` first, then `stmt` is timed, the marker splits the -X importtime log
+SNIPPET = '''
+import sys, time
+{setup}
+sys.stderr.write('--- timed ---\\n')
+t = time.perf_counter()
+{stmt}
+print(time.perf_counter() - t)
+'''
+
+
+def cases(args):
+    # (name, setup, stmt), the backends are timed on top of an imported main.py as in a run
+    out = [('import main', '', 'import main')]
+    for name in args.trackers:
+        out.append((f'tracker {name}', 'import main\nfrom tracker.build import TRACKER_REGISTRY',
+                    f'TRACKER_REGISTRY.get({name!r})'))
+    for name in args.detectors:
+        out.append((f'detector {name}', 'import main\nfrom detector.build import DETECTOR_REGISTRY',
+                    f'DETECTOR_REGISTRY.get({name!r})'))
+    if args.reid:
+        out.append((f'reid {args.reid}', 'import main\nimport torchreid',
+                    f'torchreid.models.build_model({args.reid!r}, num_classes=1, pretrained=False)'))
+    if args.ros:
+        out.append(('ros', 'import main\nfrom tools.io import ros_message', "import rospy; ros_message('CompressedImage')"))
+    return out
+
+
+def measure(setup, stmt, top=3):
+    """
+    Seconds `stmt` takes in a fresh interpreter after `setup`, and its
+    `top` slowest imports (name, seconds) as -X importtime reports them.
+    """
+    p = subprocess.run([sys.executable, '-X', 'importtime', '-c', SNIPPET.format(setup=setup, stmt=stmt)],
+                       cwd=ROOT, capture_output=True, text=True)
+    if p.returncode:
+        raise RuntimeError(p.stderr.strip().splitlines()[-1])
+    log = p.stderr.split('--- timed ---\n', 1)[-1]
+    imports = []  # (depth, name, cumulative seconds), depth 0 is imported by stmt itself
+    for line in log.splitlines():
+        fields = line.split('|')
+        if line.startswith('import time:') and len(fields) == 3 and fields[1].strip().isdigit():
+            name = fields[2][1:]
+            imports.append(((len(name) - len(name.lstrip())) // 2, name.strip(), int(fields[1]) / 1E6))
+    depth = 1 if sum(d == 0 for d, _, _ in imports) == 1 else 0  # `import main` alone, list what main imports
+    slowest = sorted(((n, s) for d, n, s in imports if d == depth), key=lambda x: -x[1])[:top]
+    return float(p.stdout.strip().splitlines()[-1]), slowest
+
+
+def main(args):
+    rows = []
+    for name, setup, stmt in cases(args):
+        try:
+            runs = [measure(setup, stmt, args.top) for _ in range(args.runs)]
+        except RuntimeError as e:  # i.e. no ROS installation
+            rows.append({'case': name, 'seconds': None, 'slowest imports': f'failed: {e}'})
+            continue
+        runs.sort(key=lambda r: r[0])
+        t, imports = runs[len(runs) // 2]  # median run
+        rows.append({'case': name, 'seconds': t, 'min': runs[0][0],
+                     'slowest imports': ', '.join(f'{m} {s:.2f}s' for m, s in imports)})
+        print(f'{name}: {t:.3f}s')
+    print(tabulate(rows, headers='keys', floatfmt='.3f'))
+
+
+def get_args():
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--trackers', nargs='+', type=str, default=['bytetracker', 'deepsort', 'deep_bytetracker'],
+                        help='registered trackers to resolve')
+    parser.add_argument('--detectors', nargs='+', type=str, default=['yolov5'], help='registered detectors to resolve')
+    parser.add_argument('--reid', type=str, default='osnet_x0_25', help='torchreid model to build, empty to skip')
+    parser.add_argument('--ros', action='store_true', help='also time importing rospy and the image message')
+    parser.add_argument('--runs', type=int, default=3, help='fresh interpreters per case, the median is reported')
+    parser.add_argument('--top', type=int, default=3, help='slowest imports listed per case')
+
+    args = parser.parse_args()
+
+    return args
+
+if __name__ == '__main__':
+
+    args = get_args()
+    main(args)
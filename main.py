@@ -30,6 +30,15 @@ from tracker.build import build_tracker
 from detector.build import build_detector
 
 from tools.io import *
+from tools.pipeline import Pipeline
+from tools.streams import StreamState, stream_count, stream_names, video_info
+from tools.sinks import SINK_REGISTRY, SinkFlusher, build_sinks
+from tools.detcache import DetectionCache, CachedExtractor, cache_key, cache_path
+from tools.scheduler import DetectionScheduler
+from tools.motion import MotionGate, parse_rois
+from tools.regions import RegionCropper, load_regions
+from tools.preprocess import InputBuffers
+from tracker.deep_sort.deep_sort import shared_extractor
 
 
 FILE = Path(__file__).resolve()
@@ -59,329 +68,561 @@ def main(args):
     args.device = select_device(args.device)
     device = args.device
     print("using device {} computing...".format(device))
+
+    sources = [f'ros:{args.topic}' if s == '1' else s for s in args.source]
+
+    # detection cache: a run with --det-cache records the NMS outputs, later runs with the same
+    # sources, weights, size and NMS settings replay them and skip the detector
+    replay, recorder = None, None
+    if args.det_cache:
+        cache_dir = cache_path(args.det_cache, cache_key(args, sources))
+        if DetectionCache.exists(cache_dir, args.deep_sort_model if args.cache_embeddings else None):
+            replay = DetectionCache.open(cache_dir)
+            LOGGER.info(f'Replaying detections from {cache_dir}')
+    # embeddings come from the cache (replay) or are computed once for all detections (record)
+    use_embs = replay is not None and replay.has_embeddings and replay.meta['emb_model'] == args.deep_sort_model
+    record_embs = replay is None and args.det_cache and args.cache_embeddings
     
-    # initialize detector
-    model = build_detector(args)
-    stride, names, pt, jit, _ = model.stride, model.names, model.pt, model.jit, model.onnx
+    # initialize detector, --compile exports it once per weights, size, batch and dtype and loads the export after
+    if replay is not None:
+        model, names, stride, pt, jit = None, replay.names, 32, True, False
+    else:
+        # ONNX and OpenVINO fix the batch size, crops of regions and tiles come in batches of any size
+        args.compile_batch = None if args.roi or args.tile else stream_count(sources)
+        model = build_detector(args)
+        stride, names, pt, jit, _ = model.stride, model.names, model.pt, model.jit, model.onnx
     imgsz  = args.imgsz
     imgsz = check_img_size(imgsz, s=stride)  # check image size
-    args.half &= pt and args.device.type != 'cpu'  # half precision only supported by PyTorch on CUDA
-    if pt:
+    # half precision only supported by PyTorch on CUDA, and by models compiled in half precision
+    args.half &= (pt or args.compile in ('torchscript', 'onnx')) and args.device.type != 'cpu'
+    if pt and model is not None:
         model.model.half() if args.half else model.model.float()
-
-    # initialize tracker
-    tracker = build_tracker(args)
-
-    # Set Dataloader
-    vid_path, vid_writer = None, None
+    # the detection head outputs the --classes columns and the rows above --conf-thres only, NMS gets a small tensor
+    class_map = None
+    if model is not None and not (args.augment or args.full_head):
+        class_map = model.prune(args.classes, args.conf_thres)
 
     # Check if environment supports image displays
+    show_vid = False
     if args.show_vid:
         show_vid = check_imshow()
 
-    source = args.source
-    rostopic = source == '1'
-    webcam = source == '0' or source.startswith(
-        'rtsp') or source.startswith('http') or source.endswith('.txt')
+    source = args.source[0]
+    multisource = len(sources) > 1
+    rostopic = not multisource and source == '1'
+    webcam = not multisource and (source == '0' or source.startswith(
+        'rtsp') or source.startswith('http') or source.endswith('.txt'))
 
     # Dataloader
-    if webcam:
+    if replay is not None and not (args.save_vid or args.show_vid or args.motion_gate or
+                                   (args.tracker != 'bytetracker' and not use_embs)):
+        dataset = replay  # nothing needs the real frames, blank ones of the recorded size
+        bs = len(dataset.sources) or 1  # batch_size
+    elif multisource:
+        cudnn.benchmark = True  # set True to speed up constant image size inference
+        dataset = LoadMultiSource(sources, img_size=imgsz, stride=stride, datatype='CompressedImage', chw=False)
+        bs = len(dataset)  # batch_size
+    elif webcam:
         show_vid = check_imshow()
         cudnn.benchmark = True  # set True to speed up constant image size inference
-        dataset = LoadStreams(source, img_size=imgsz, stride=stride, auto=pt and not jit)
+        dataset = LoadStreams(source, img_size=imgsz, stride=stride, auto=pt and not jit, chw=False)
         bs = len(dataset)  # batch_size
     elif rostopic:
         show_vid = check_imshow()
         cudnn.benchmark = True  # set True to speed up constant image size inference
-        dataset = LoadRosTopic(args.topic, img_size=imgsz, stride=stride, auto=pt and not jit, datatype=CompressedImage)
+        dataset = LoadRosTopic(args.topic, img_size=imgsz, stride=stride, auto=pt and not jit, datatype='CompressedImage',
+                               chw=False)
         bs = len(dataset)  # batch_size
     else:   
-        dataset = LoadImages(source, img_size=imgsz, stride=stride, auto=pt and not jit)
+        dataset = LoadImages(source, img_size=imgsz, stride=stride, auto=pt and not jit, chw=False)
         bs = 1  # batch_size
-    vid_path, vid_writer = [None] * bs, [None] * bs
+    batched = webcam or multisource  # im0s is a list with one frame per stream
+    # boxes are drawn for display and video only, stream loaders hand out the same frame until a
+    # new one arrives so those are drawn on copies
+    annotate = show_vid or args.save_vid
+    copy_frames = annotate and (webcam or (multisource and dataset.reuses_frames))
 
     # Get names and colors
-    names = model.module.names if hasattr(model, 'module') else model.names
-
-    # extract what is in between the last '/' and last '.'
-    txt_file_name = source.split('/')[-1].split('.')[0]
-    txt_path = str(Path(save_dir)) + '/' + txt_file_name + '.txt'
-
-    # Prepare for entrance counting
-    if args.en_counting:
-        in_id_list = list()
-        out_id_list = list()
-        in_flag = dict()
-        out_flag = dict()
-        prev_center = dict()
-        count_str = ""
-
-    # create publisher
-    pub = PublishRosTopic()
-
-    if pt and device.type != 'cpu':
+    if model is not None:
+        names = model.module.names if hasattr(model, 'module') else model.names
+
+    # initialize one tracker, writer and counter set per stream, the detector is shared
+    if multisource:
+        stream_sources = sources
+    elif webcam:
+        stream_sources = dataset.sources
+    else:
+        stream_sources = [source]
+    streams = [StreamState(build_tracker(args), save_dir if len(stream_sources) == 1 else save_dir / name, name)
+               for name in stream_names(stream_sources)]
+    if args.save_txt:
+        for st in streams:
+            st.sinks = build_sinks(args.save_format, st.results_path, names)
+    flusher = SinkFlusher([sink for st in streams for sink in st.sinks], interval=args.flush_interval)
+    if use_embs or record_embs:
+        reid_model = shared_extractor(args.deep_sort_model, device) if record_embs else None
+        for st in streams:
+            if hasattr(st.tracker, 'extractor'):
+                st.tracker.extractor = CachedExtractor()
+    if args.det_cache and replay is None:
+        recorder = DetectionCache.create(cache_dir, cache_key(args, sources), names, stream_sources, batched,
+                                         args.deep_sort_model if record_embs else None)
+
+    # the detector runs on the frames the scheduler picks, the trackers extrapolate the others
+    scheduler = DetectionScheduler(args.det_interval, args.det_adaptive, args.det_max_shift)
+    if recorder is not None and args.det_interval > 1:
+        LOGGER.warning('--det-cache records every frame, --det-interval is ignored')
+        scheduler = DetectionScheduler()
+
+    # letterboxed frames go straight into reused input buffers, enough for the batches in flight
+    inputs = InputBuffers(device, args.half, depth=args.queue_size + 2)
+
+    # the detector runs on crops of the regions of interest only, or on overlapping tiles of the frames
+    cropper = None
+    if (args.roi or args.tile) and replay is None:
+        cropper = RegionCropper(load_regions(args.roi, stream_sources) if args.roi else {}, imgsz, stride,
+                                auto=pt and not jit, tile=args.tile, overlap=args.tile_overlap, full=args.tile_full)
+
+    # static scenes skip the detector and ReID, the trackers hold their tracks
+    motion = None
+    if args.motion_gate:
+        motion = MotionGate(parse_rois(args.motion_roi), args.motion_thresh, args.motion_pixel_thresh, args.motion_hold)
+        if recorder is not None:
+            LOGGER.warning('--det-cache records every frame, --motion-gate is ignored')
+            motion = None
+
+    # create publisher for ROS sources only, sending happens on its own thread
+    pub, boxes_msg, box_msg = None, None, None
+    if any(s.startswith('ros:') for s in sources):
+        pub = PublishRosTopic()
+        boxes_msg, box_msg = ros_message('boxes'), ros_message('box')
+
+    if pt and model is not None and device.type != 'cpu':
         model(torch.zeros(1, 3, *imgsz).to(device).type_as(next(model.model.parameters())))  # warmup
     dt, seen = [0.0, 0.0, 0.0, 0.0], 0
+    stopped_early = False
 
     signal.signal(signal.SIGINT, handler)
 
-    start_time = time_sync()
-
-    for frame_idx, (path, img, im0s, vid_cap, data) in enumerate(dataset):
-        s = ''
-        tram_status = 0
-        # when stopped, start the detection process
-        if tram_status==0:
-            print("The tram is stopped, detection started.")
-            # do image enhancement
-            if args.process:
-            # do equilized histgram for BCHW RGB images
-                for i in range(img.shape[0]): 
-                    pic = img[i][::-1,...].transpose((1,2,0)) # move the channel dim to the last and convert into BGR(Opencv needs)
-
-                    lab= cv2.cvtColor(pic, cv2.COLOR_BGR2LAB)
-                    #-----Splitting the LAB image to different channels-------------------------
-                    l, a, b = cv2.split(lab)
-                    #-----Applying CLAHE to L-channel-------------------------------------------
-                    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-                    cl = clahe.apply(l)
-                    #-----Merge the CLAHE enhanced L-channel with the a and b channel-----------
-                    limg = cv2.merge((cl,a,b))
-                    #-----Converting image from LAB Color model to RGB model--------------------
-                    final = cv2.cvtColor(limg, cv2.COLOR_LAB2BGR)
-                    # cv2.imshow('final', final)
-                    # cv2.waitKey(1)
-                    img[i] = final[...,::-1].transpose(2,0,1)
-                    im0s[i] = final.copy()
-
-            # Use roi to filter 
-            if args.roi:
-                origin = (50,80)
-                img[...,0:origin[1],:] = 0
-                img[...,origin[1]::,0:origin[0]] = 0
-
-            t1 = time_sync()
-            img = torch.from_numpy(img).to(device)
-            img = img.half() if args.half else img.float()  # uint8 to fp16/32
-            img /= 255.0  # 0 - 255 to 0.0 - 1.0
-            if img.ndimension() == 3:
-                img = img.unsqueeze(0)
-            t2 = time_sync()
-            dt[0] += t2 - t1
-
-            # Inference
-            visualize = increment_path(save_dir / Path(path).stem, mkdir=True) if args.visualize else False
-            pred = model(img, augment=args.augment, visualize=visualize)
+    def decode(dataset):
+        # stage 0: frames as produced by the dataloader, tagged with their index
+        frames = [0] * len(streams)  # per-stream frame counters
+        for frame_idx, (path, img, im0s, vid_cap, data) in enumerate(dataset):
+            ids = list(dataset.streams) if multisource else list(range(len(streams)))
+            for k in ids:
+                frames[k] += 1
+            caps = vid_cap if isinstance(vid_cap, list) else [vid_cap] * len(ids)
+            # the tram drives when any camera reports so, other sources never do
+            tram_status = max((d.tram_status for d in (data if multisource else [data]) if isinstance(d, RosFrame)),
+                              default=0)
+            yield dict(frame_idx=frame_idx, path=path, img=img, im0s=im0s, vid_cap=vid_cap, data=data,
+                       tram_status=tram_status, streams=ids, frames=[frames[k] for k in ids],
+                       static=[False] * len(ids), vid_info=[video_info(c) for c in caps])
+
+    def gate(batch):
+        # flags the streams whose scene did not move, they skip detection and ReID
+        if batch['tram_status'] != 0:
+            return batch
+        im0s = batch['im0s'] if batched else [batch['im0s']]
+        batch['static'] = [motion(k, im0) for k, im0 in zip(batch['streams'], im0s)]
+        return batch
+
+    # grad mode is per thread, the stages do not inherit the caller's torch.no_grad()
+    @torch.no_grad()
+    def preprocess(batch):
+        # when the tram drives, frames go straight to the sink which resets the counters
+        if batch['tram_status'] != 0:
+            return batch
+        batch['detect'] = not all(batch['static']) and scheduler.step()
+        if not batch['detect']:
+            batch['img_shape'] = (batch['img'] if batched else [batch['img']])[0].shape[:2]
+            batch['t_yolo'] = 0.0
+            return batch
+        return prepare(batch)
+
+    def prepare(batch, buffers=inputs):
+        frames = batch['img'] if batched else [batch['img']]  # letterboxed BGR HWC
+        im0s = batch['im0s']
+        # do image enhancement
+        if args.process:
+        # do equilized histgram for BGR images
+            for i, pic in enumerate(frames):
+
+                lab= cv2.cvtColor(pic, cv2.COLOR_BGR2LAB)
+                #-----Splitting the LAB image to different channels-------------------------
+                l, a, b = cv2.split(lab)
+                #-----Applying CLAHE to L-channel-------------------------------------------
+                clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
+                cl = clahe.apply(l)
+                #-----Merge the CLAHE enhanced L-channel with the a and b channel-----------
+                limg = cv2.merge((cl,a,b))
+                #-----Converting image from LAB Color model to RGB model--------------------
+                final = cv2.cvtColor(limg, cv2.COLOR_LAB2BGR)
+                # cv2.imshow('final', final)
+                # cv2.waitKey(1)
+                frames[i] = final
+                if batched:
+                    im0s[i] = final
+                else:
+                    batch['im0s'] = im0s = final
+
+        t1 = time_sync()
+        if cropper is not None:  # stacks of equally shaped crops instead of the letterboxed frames
+            groups = cropper.inputs(batch['streams'], im0s if batched else [im0s])
+            batch['img'] = [buffers(crops, key='crops') for crops, _ in groups]
+            batch['windows'] = [w for _, windows in groups for w in windows]
+            batch['img_shape'] = max((x.shape[2:] for x in batch['img']), key=lambda s: s[0] * s[1], default=(0, 0))
+            dt[0] += time_sync() - t1
+            return batch
+        # BGR to RGB, HWC to CHW, uint8 to fp16/32 and 0 - 255 to 0.0 - 1.0 in one pass
+        img = buffers(frames)
+        dt[0] += time_sync() - t1
+        batch['img'] = img
+        batch['img_shape'] = img.shape[2:]
+        return batch
+
+    @torch.no_grad()
+    def inference(batch):
+        if batch['tram_status'] != 0 or not batch['detect']:
+            return batch
+        t2 = time_sync()
+        visualize = increment_path(save_dir / Path(batch['path']).stem, mkdir=True) if args.visualize else False
+        if cropper is not None:
+            preds, batch['t_yolo'] = [], 0.0
+            for img in batch['img']:
+                t2 = time_sync()
+                pred = model(img, augment=args.augment, visualize=visualize)
+                t3 = time_sync()
+                dt[1] += t3 - t2
+                batch['t_yolo'] += t3 - t2
+                preds += non_max_suppression(pred, args.conf_thres, args.iou_thres, args.classes, args.agnostic_nms,
+                                             max_det=args.max_det, class_map=class_map)
+                dt[2] += time_sync() - t3
             t3 = time_sync()
-            dt[1] += t3 - t2
-
-            # Apply NMS
-            pred = non_max_suppression(pred, args.conf_thres, args.iou_thres, args.classes, args.agnostic_nms, max_det=args.max_det)
+            batch['pred'] = cropper.merge(preds, batch['windows'], len(batch['streams']), args.iou_thres,
+                                          args.agnostic_nms, args.max_det)
             dt[2] += time_sync() - t3
+            batch['scaled'] = True  # already in frame coordinates
+            return batch
+        pred = model(batch['img'], augment=args.augment, visualize=visualize)
+        t3 = time_sync()
+        dt[1] += t3 - t2
+
+        # Apply NMS
+        batch['pred'] = non_max_suppression(pred, args.conf_thres, args.iou_thres, args.classes, args.agnostic_nms,
+                                            max_det=args.max_det, class_map=class_map)
+        dt[2] += time_sync() - t3
+        batch['t_yolo'] = t3 - t2
+        return batch
+
+    def replay_dets(batch):
+        # replaces preprocess and inference: NMS outputs of the batch from the cache
+        if batch['tram_status'] != 0:
+            return batch
+        records = replay.batch(batch['frame_idx'])
+        assert [int(r[1]) for r in records] == batch['streams'], \
+            f'cache {replay.path} does not match batch {batch["frame_idx"]} of the source'
+        batch['img_shape'] = tuple(int(x) for x in records[0][6:8])
+        batch['t_yolo'] = 0.0
+        batch['detect'] = not all(batch['static']) and scheduler.step()
+        if not batch['detect']:
+            return batch
+        return cached_dets(batch)
+
+    def cached_dets(batch):
+        records = replay.batch(batch['frame_idx'])
+        batch['pred'] = [torch.from_numpy(np.array(replay.dets(r))).to(device) for r in records]
+        batch['embs'] = [replay.embs(r) for r in records]
+        batch['scaled'] = True  # already in image coordinates
+        return batch
+
+    # a batch queued as predict-only before a new track appeared is detected here, one at a time
+    late_inputs = InputBuffers(device, args.half, depth=1)
+
+    def detect_late(batch):
+        batch['detect'] = True
+        if replay is not None:
+            return cached_dets(batch)
+        return inference(prepare(batch, late_inputs))
+
+    @torch.no_grad()
+    def associate(batch):
+        if batch['tram_status'] != 0:
+            return batch
+        if not batch['detect'] and not all(batch['static']) and \
+                scheduler.overdue(batch['streams'], batch['frames']):
+            batch = detect_late(batch)
+        im0s = batch['im0s']
+        batch['tracks'] = []
+        for i, k in enumerate(batch['streams']):
+            # predict-only frame or static scene, no detections to associate
+            if batch['static'][i] or not batch['detect']:
+                t4 = time_sync()
+                outputs = streams[k].tracker.hold() if batch['static'][i] else streams[k].tracker.predict()
+                t_track = time_sync() - t4
+                dt[3] += t_track
+                unknown = torch.full((len(outputs),), -1.0)  # no confidence nor class without a detection
+                batch['tracks'].append((None, outputs, unknown, unknown, t_track))
+                continue
+            det = batch['pred'][i]  # detections per image
+            im0 = im0s[i] if batched else im0s
+            tracker = streams[k].tracker
+            outputs, confs, clss, t_track = [], [], [], 0.0
+            if det is not None and len(det) and not batch.get('scaled'):
+                # Rescale boxes from img_size to im0 size
+                det[:, :4] = scale_coords(
+                    batch['img_shape'], det[:, :4], im0.shape).round()
+            embs = None
+            if det is not None and len(det) and (use_embs or record_embs):
+                boxes = det[:, :4].cpu().numpy()
+                if use_embs:
+                    embs = batch['embs'][i]
+                else:  # every detection once, the tracker reads them back through CachedExtractor
+                    embs = reid_model.extract_boxes(im0, np.trunc(boxes)).cpu().numpy()
+                if hasattr(tracker, 'extractor'):
+                    tracker.extractor.load(boxes, embs)
+            if recorder is not None:
+                p = batch['path'][i] if batched else batch['path']
+                recorder.add(batch['frame_idx'], batch['streams'][i], batch['frames'][i], str(p), im0.shape[:2],
+                             batch['img_shape'], det.cpu().numpy() if det is not None else None, embs)
+            if det is not None and len(det):
+
+                xywhs = xyxy2xywh(det[:, 0:4])
+                confs = det[:, 4]
+                clss = det[:, 5]
+
+                # pass detections to deepsort
+                t4 = time_sync()
+                if args.tracker == 'deepsort':
+                    outputs = tracker.update(xywhs.cpu(), confs.cpu(), clss.cpu(), im0)
+                elif args.tracker == 'bytetracker':
+                    outputs = tracker.update(det[:, 0:5].cpu(),[im0.shape[0],im0.shape[1]],[im0.shape[0],im0.shape[1]])
+                elif args.tracker == 'deep_bytetracker':
+                    outputs = tracker.update(det[:, 0:5].cpu(),[im0.shape[0],im0.shape[1]],[im0.shape[0],im0.shape[1]],im0)
+                t_track = time_sync() - t4
+                dt[3] += t_track
+            elif args.tracker == 'deepsort':
+                tracker.increment_ages()
+            scheduler.observe(batch['streams'][i], batch['frames'][i], outputs)
+            batch['tracks'].append((det, outputs, confs, clss, t_track))
+        return batch
+
+    def sink(batch):
+        nonlocal seen, stopped_early
+        path, im0s, data = (batch[k] for k in ('path', 'im0s', 'data'))
+        if batch['tram_status'] != 0:
+            print("The tram is driving, detection is stopped.")
 
-            # Process detections
-            for i, det in enumerate(pred):  # detections per image
-                seen += 1
-                if webcam:  # batch_size >= 1
-                    p, im0, _ = path[i], im0s[i].copy(), dataset.count
-                    s += f'webcam{i}: '
-                else:
-                    p, im0, _ = path, im0s.copy(), getattr(dataset, 'frame', 0)
-
-                p = Path(p)  # to Path
-                save_path = str(save_dir / p.name)  # im.jpg, vid.mp4, ...
-                s += '%gx%g ' % img.shape[2:]  # print string
-
-                annotator = Annotator(im0, line_width=2, pil=not ascii)
-
-                # Determination of the lines may be tricky, use incline line
-                shape = im0.shape
-                # entrance1 =  tuple(map(int,[0, shape[0] / 2.0, shape[1], shape[0] / 2.0]))
-                # entrance2 =  tuple(map(int,[0, shape[0] / 1.8, shape[1], shape[0] / 1.8]))
-
-                entrance1 = tuple(map(int,[shape[1]/2.0, shape[0], shape[1], shape[0] / 2.5]))
-                entrance2 = tuple(map(int,[shape[1]/1.5, shape[0], shape[1], shape[0] / 2.2]))
-
-                if det is not None and len(det):
-                    # Rescale boxes from img_size to im0 size
-                    det[:, :4] = scale_coords(
-                        img.shape[2:], det[:, :4], im0.shape).round()
+            if args.en_counting:
+                for st in streams:
+                    st.reset_counting()
+            return batch
 
-                    
-                    xywhs = xyxy2xywh(det[:, 0:4])
-                    confs = det[:, 4]
-                    clss = det[:, 5]
-    
-                    # pass detections to deepsort
-                    t4 = time_sync()
-                    if args.tracker == 'deepsort':
-                        outputs = tracker.update(xywhs.cpu(), confs.cpu(), clss.cpu(), im0)
-                    elif args.tracker == 'bytetracker':
-                        outputs = tracker.update(det[:, 0:5].cpu(),[im0.shape[0],im0.shape[1]],[im0.shape[0],im0.shape[1]])
-                    elif args.tracker == 'deep_bytetracker':
-                        outputs = tracker.update(det[:, 0:5].cpu(),[im0.shape[0],im0.shape[1]],[im0.shape[0],im0.shape[1]],im0)
-                    t5 = time_sync()
-                    dt[3] += t5 - t4
-
-                    # # Print results
-                    # for c in det[:, -1].unique():
-                    #     n = (det[:, -1] == c).sum()  # detections per class
-                    #     s += f"{n} {names[int(c)]} {'s' * (n > 1)}, "  # add to string  class name: {names[int(c)]}
-
-                    # xyxy boxes to be sent, set the header as same as image header
-                    bs = boxes()
-                    bs.header = data.header
-
-                    # draw boxes for visualization
-                    if len(outputs) > 0:
-
-                        n = len(outputs)
-                        s += f"{n} person{'s' * (n>1)}"
-
-                        for j, (output, conf,cls) in enumerate(zip(outputs, confs, clss)):
-
-                            bboxes = output[0:4]
-                            track_id = output[4]
-                            # cls = output[5]
-
-                            #store box detected
-                            b = box()
+        print("The tram is stopped, detection started.")
+        s = ''
+        # Process detections
+        for i, (det, outputs, confs, clss, t_track) in enumerate(batch['tracks']):  # detections per image
+            seen += 1
+            k, frame_idx = batch['streams'][i], batch['frames'][i] - 1
+            st = streams[k]
+            st.seen += 1
+            predicted = det is None  # held or extrapolated, not detected
+            if batched:  # batch_size >= 1
+                p, im0, _ = path[i], im0s[i], dataset.count
+                s += f'webcam{i}: ' if webcam else f'stream{k}: '
+            else:
+                p, im0, _ = path, im0s, getattr(dataset, 'frame', 0)
+            if copy_frames:
+                im0 = im0.copy()
+
+            p = Path(p)  # to Path
+            save_path = str(st.save_dir / p.name)  # im.jpg, vid.mp4, ...
+            s += '%gx%g ' % tuple(batch['img_shape'])  # print string
+            if predicted:
+                s += 'static ' if batch['static'][i] else 'predicted '
+            frame_data = data[i] if multisource else data
+            if isinstance(frame_data, RosFrame):  # seq gaps are frames dropped by the loader
+                s += f'seq {frame_data.seq} ({frame_data.latency() * 1E3:.0f}ms latency) '
+
+            annotator = Annotator(im0, line_width=2, pil=not ascii)
+
+            # Determination of the lines may be tricky, use incline line
+            shape = im0.shape
+            # entrance1 =  tuple(map(int,[0, shape[0] / 2.0, shape[1], shape[0] / 2.0]))
+            # entrance2 =  tuple(map(int,[0, shape[0] / 1.8, shape[1], shape[0] / 1.8]))
+
+            entrance1 = tuple(map(int,[shape[1]/2.0, shape[0], shape[1], shape[0] / 2.5]))
+            entrance2 = tuple(map(int,[shape[1]/1.5, shape[0], shape[1], shape[0] / 2.2]))
+
+            if (det is not None and len(det)) or predicted:
+
+                # # Print results
+                # for c in det[:, -1].unique():
+                #     n = (det[:, -1] == c).sum()  # detections per class
+                #     s += f"{n} {names[int(c)]} {'s' * (n > 1)}, "  # add to string  class name: {names[int(c)]}
+
+                # xyxy boxes to be sent, set the header as same as image header
+                msg = boxes_msg() if pub is not None else None
+                if msg is not None and getattr(frame_data, 'header', None) is not None:
+                    msg.header = frame_data.header
+
+                # draw boxes for visualization
+                if len(outputs) > 0:
+
+                    n = len(outputs)
+                    s += f"{n} person{'s' * (n>1)}"
+
+                    for j, (output, conf,cls) in enumerate(zip(outputs, confs, clss)):
+
+                        bboxes = output[0:4]
+                        track_id = output[4]
+                        # cls = output[5]
+
+                        #store box detected
+                        if msg is not None:
+                            b = box_msg()
                             b.coordinates = bboxes
-                            bs.boxes.append(b)
+                            msg.boxes.append(b)
 
-                            c = int(cls)  # integer class
-                            label = f'{track_id} {conf:.2f}' # class name:{names[c]}
+                        c = int(cls)  # integer class
+                        label = f'{track_id} pred' if predicted else f'{track_id} {conf:.2f}' # class name:{names[c]}
+                        if annotate:
                             annotator.box_label(bboxes, label, color=colors(c, True))
 
-                            # Use two line to do entrance counting
-                            if args.en_counting and cls in args.classes:
-                                
-                                if track_id < 0: continue
-
-                                x1, y1, x2,y2 = bboxes
-                                center_x = (x1 + x2)/2.
-                                center_y = (y1 + y2)/2.
-
-                                k1 = (entrance1[3] - entrance1[1]) / (entrance1[2] - entrance1[0])
-                                k2 = (entrance2[3] - entrance2[1]) / (entrance2[2] - entrance2[0])
-                                b1 = entrance1[3] - k1 * entrance1[2]
-                                b2 = entrance2[3] - k2 * entrance2[2]
-
-                                if track_id in prev_center:
-
-                                    # In number counting 
-                                    if prev_center[track_id][1] <= k1*prev_center[track_id][0] + b1 and \
-                                    center_y > k1*center_x + b1:
-                                        in_flag[track_id] = 1
-                                    elif prev_center[track_id][1] <= k2*prev_center[track_id][0] + b2 and \
-                                    center_y > k2*center_x + b2 and in_flag[track_id] == 1:
-                                        in_id_list.append(track_id)
-                                        in_flag[track_id] = 0
-
-                                    # Out number counting
-                                    elif prev_center[track_id][1] >= k2*prev_center[track_id][0] + b2 and \
-                                    center_y < k2*center_x + b2:
-                                        out_flag[track_id] = 1
-                                    elif prev_center[track_id][1] >= k1*prev_center[track_id][0] + b1 and \
-                                    center_y < k1*center_x + b1 and out_flag[track_id] == 1:
-                                        out_id_list.append(track_id)
-                                        out_flag[track_id] = 0
-
-                                    prev_center[track_id] = [center_x, center_y]
-                                else:
-                                    prev_center[track_id] = [center_x, center_y]
-                                    in_flag[track_id] = 0
-                                    out_flag[track_id] = 0
-                                
-                                count_str = f"In: {len(in_id_list)}, Out: {len(out_id_list)}"
-                                print(count_str)
-
-                            if args.save_txt:
-                                # to MOT format
-                                bbox_left = output[0]
-                                bbox_top = output[1]
-                                bbox_w = output[2] - output[0]
-                                bbox_h = output[3] - output[1]
-                                # Write MOT compliant results to file
-                                with open(txt_path, 'a') as f:
-                                    f.write(('%g ' * 10 + '\n') % (frame_idx + 1, id, bbox_left,  # MOT format
-                                                                bbox_top, bbox_w, bbox_h, -1, -1, -1, -1))
-                    
-                    # send xyxy boxes, if no detection, bs.boxes will be empty
-                    pub.send(bs)
-
-                    LOGGER.info(f'{s}Done. YOLO:({t3 - t2:.3f}s), DeepSort:({t5 - t4:.3f}s)')
-                else:
-                    if args.tracker == 'deepsort':
-                        tracker.increment_ages()
-                    LOGGER.info('No detections')
-
-                # Stream results
-                im0 = annotator.result()
-
-                if show_vid:
-                    
-                    lw = 3
-                    tf = max(lw - 1, 1)
-                    w, h = cv2.getTextSize(s, 0, fontScale=lw / 3, thickness=tf)[0] 
-                    p1 = (0,0)
+                        # Use two line to do entrance counting
+                        if args.en_counting and cls in args.classes:
+                            
+                            if track_id < 0: continue
+
+                            x1, y1, x2,y2 = bboxes
+                            center_x = (x1 + x2)/2.
+                            center_y = (y1 + y2)/2.
+
+                            k1 = (entrance1[3] - entrance1[1]) / (entrance1[2] - entrance1[0])
+                            k2 = (entrance2[3] - entrance2[1]) / (entrance2[2] - entrance2[0])
+                            b1 = entrance1[3] - k1 * entrance1[2]
+                            b2 = entrance2[3] - k2 * entrance2[2]
+
+                            if track_id in st.prev_center:
+
+                                # In number counting 
+                                if st.prev_center[track_id][1] <= k1*st.prev_center[track_id][0] + b1 and \
+                                center_y > k1*center_x + b1:
+                                    st.in_flag[track_id] = 1
+                                elif st.prev_center[track_id][1] <= k2*st.prev_center[track_id][0] + b2 and \
+                                center_y > k2*center_x + b2 and st.in_flag[track_id] == 1:
+                                    st.in_id_list.append(track_id)
+                                    st.in_flag[track_id] = 0
+
+                                # Out number counting
+                                elif st.prev_center[track_id][1] >= k2*st.prev_center[track_id][0] + b2 and \
+                                center_y < k2*center_x + b2:
+                                    st.out_flag[track_id] = 1
+                                elif st.prev_center[track_id][1] >= k1*st.prev_center[track_id][0] + b1 and \
+                                center_y < k1*center_x + b1 and st.out_flag[track_id] == 1:
+                                    st.out_id_list.append(track_id)
+                                    st.out_flag[track_id] = 0
+
+                                st.prev_center[track_id] = [center_x, center_y]
+                            else:
+                                st.prev_center[track_id] = [center_x, center_y]
+                                st.in_flag[track_id] = 0
+                                st.out_flag[track_id] = 0
+                            
+                            st.count_str = f"In: {len(st.in_id_list)}, Out: {len(st.out_id_list)}"
+                            print(st.count_str)
+
+
+                    if args.save_txt:
+                        # buffered, the sinks write once per flush interval
+                        out = np.asarray(outputs)
+                        tlwhs = np.c_[out[:, 0:2], out[:, 2:4] - out[:, 0:2]]
+                        # the trackers do not report which detection a track matched, score and class stay -1
+                        st.write_results(frame_idx + 1, tlwhs, out[:, 4], predicted=np.full(len(out), predicted))
+
+                # send xyxy boxes, if no detection, msg.boxes will be empty
+                if pub is not None:
+                    pub.send(msg)
+
+                LOGGER.info(f'{s}Done. YOLO:({batch["t_yolo"]:.3f}s), DeepSort:({t_track:.3f}s)')
+            else:
+                LOGGER.info('No detections')
+
+            # Stream results
+            im0 = annotator.result()
+
+            if show_vid:
+                
+                lw = 3
+                tf = max(lw - 1, 1)
+                w, h = cv2.getTextSize(s, 0, fontScale=lw / 3, thickness=tf)[0] 
+                p1 = (0,0)
+                p2 = (p1[0] + int(w), p1[1]+int(h)+10)
+                cv2.rectangle(im0, p1, p2, (0,240,240), -1, cv2.LINE_AA)  # filled
+                cv2.putText(im0, s, (p1[0], p1[1]+h+3), 0, lw / 3, (255,255,255),
+                            thickness=tf, lineType=cv2.LINE_AA)
+
+                if args.en_counting:
+                    w, h = cv2.getTextSize(st.count_str, 0, fontScale=lw / 3, thickness=tf)[0]
+                    p1 = (0,p2[1])
                     p2 = (p1[0] + int(w), p1[1]+int(h)+10)
-                    cv2.rectangle(im0, p1, p2, (0,240,240), -1, cv2.LINE_AA)  # filled
-                    cv2.putText(im0, s, (p1[0], p1[1]+h+3), 0, lw / 3, (255,255,255),
+                    cv2.rectangle(im0, p1, p2, (240,240,0), -1, cv2.LINE_AA)  # filled
+                    cv2.putText(im0, st.count_str, (p1[0], p1[1]+h+3), 0, lw / 3, (255,255,255),
                                 thickness=tf, lineType=cv2.LINE_AA)
-
-                    if args.en_counting:
-                        w, h = cv2.getTextSize(count_str, 0, fontScale=lw / 3, thickness=tf)[0]
-                        p1 = (0,p2[1])
-                        p2 = (p1[0] + int(w), p1[1]+int(h)+10)
-                        cv2.rectangle(im0, p1, p2, (240,240,0), -1, cv2.LINE_AA)  # filled
-                        cv2.putText(im0, count_str, (p1[0], p1[1]+h+3), 0, lw / 3, (255,255,255),
-                                    thickness=tf, lineType=cv2.LINE_AA)
-                        cv2.line(im0,entrance1[0:2],entrance1[2:4],(0,255,255),1)
-                        cv2.line(im0,entrance2[0:2],entrance2[2:4],(0,255,255),1)
-
-                    # cv2.namedWindow(str(p),WINDOW_NORMAL)  
-                    # cv2.resizeWindow(str(p),640,480)  
-                    cv2.imshow(str(p), im0)
-                    if cv2.waitKey(1) == ord('q'):  # q to quit
-                        raise StopIteration
-
-                # Save results (image with detections)
-                if args.save_vid:
-                    if vid_path != save_path:  # new video
-                        vid_path = save_path
-                        if isinstance(vid_writer, cv2.VideoWriter):
-                            vid_writer.release()  # release previous video writer
-                        if vid_cap:  # video
-                            fps = vid_cap.get(cv2.CAP_PROP_FPS)
-                            w = int(vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                            h = int(vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                        else:  # stream
-                            fps, w, h = 30, im0.shape[1], im0.shape[0]
-                            save_path += '.mp4'
-
-                        vid_writer = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
-
-                    vid_writer.write(im0)
-        else:
-            print("The tram is driving, detection is stopped.")
-
-            if args.en_counting:
-                in_id_list.clear()
-                out_id_list.clear()
-                in_flag.clear()
-                out_flag.clear()
-                prev_center.clear()
-                count_str = ""
+                    cv2.line(im0,entrance1[0:2],entrance1[2:4],(0,255,255),1)
+                    cv2.line(im0,entrance2[0:2],entrance2[2:4],(0,255,255),1)
+
+                # cv2.namedWindow(str(p),WINDOW_NORMAL)  
+                # cv2.resizeWindow(str(p),640,480)  
+                cv2.imshow(str(p), im0)
+                if cv2.waitKey(1) == ord('q'):  # q to quit
+                    stopped_early = True
+                    raise StopIteration
+
+            # Save results (image with detections)
+            if args.save_vid:
+                st.write_video(save_path, im0, batch['vid_info'][i])
+        return batch
+
+    # decode -> preprocess -> inference -> association -> sink, each stage on its own worker
+    pipeline = Pipeline(queue_size=args.queue_size)
+    if motion is not None:
+        pipeline.add_stage('motion', gate)
+    if replay is not None:
+        pipeline.add_stage('replay', replay_dets)
+    else:
+        pipeline.add_stage('preprocess', preprocess)
+        pipeline.add_stage('inference', inference)
+    pipeline.add_stage('association', associate)
+    try:
+        pipeline.run(decode(dataset), sink=sink)
+        if recorder is not None and not stopped_early:  # a cut short run is not a complete cache
+            recorder.close()
+            LOGGER.info(f'Detections cached to {cache_dir}')
+    finally:
+        # also on ctrl-c, so buffered results reach the disk
+        flusher.close()
+        for st in streams:
+            st.release()
+        if pub is not None:
+            pub.close()
+    LOGGER.info(pipeline.summary())
+    if args.det_interval > 1:
+        LOGGER.info(scheduler.summary())
+    if motion is not None:
+        LOGGER.info(motion.summary())
 
     # Print results
-    t = tuple(x / seen * 1E3 for x in dt)  # speeds per image
+    t = tuple(x / max(seen, 1) * 1E3 for x in dt)  # speeds per image
     LOGGER.info(f'Speed: %.1fms pre-process, %.1fms inference, %.1fms NMS, %.1fms deep sort update \
         per image at shape {(1, 3, *imgsz)}' % t)
+    skips = [st.tracker.reid_skip_rate for st in streams if hasattr(st.tracker, 'reid_skip_rate')]
+    if skips:
+        LOGGER.info('ReID skipped for %.1f%% of detections' % (sum(skips) / len(skips) * 1E2))
     if args.save_txt or args.save_vid:
-        print('Results saved to %s' % save_path)
+        print('Results saved to %s' % save_dir)
         if platform == 'darwin':  # MacOS
-            os.system('open ' + save_path)
+            os.system('open ' + str(save_dir))
 
 
 def get_args():
@@ -408,7 +649,7 @@ def get_args():
     ####deep sort
     parser.add_argument('--yolo_model', nargs='+', type=str, default='yolov5m.pt', help='model.pt path(s)')
     parser.add_argument('--deep_sort_model', type=str, default='osnet_x0_25')
-    parser.add_argument('--source', type=str, default='0', help='source')  # file/folder, 0 for webcam
+    parser.add_argument('--source', nargs='+', type=str, default=['0'], help='source(s), several ones are batched')  # file/folder, 0 for webcam
     parser.add_argument('--output', type=str, default='./inference/output', help='output folder')  # output folder
     parser.add_argument('--imgsz', nargs='+', type=int, default=[640], help='inference size h,w')
     parser.add_argument('--conf-thres', type=float, default=0.3, help='object confidence threshold')
@@ -417,9 +658,14 @@ def get_args():
     parser.add_argument('--show-vid', action='store_true', help='display tracking video results')
     parser.add_argument('--save-vid', action='store_true', help='save video tracking results')
     parser.add_argument('--save-txt', action='store_true', help='save MOT compliant results to *.txt')
+    parser.add_argument('--save-format', nargs='+', type=str, default=['mot'], choices=[k for k, _ in SINK_REGISTRY],
+                        help='result formats written with --save-txt')
+    parser.add_argument('--flush-interval', type=float, default=1.0, help='seconds between two writes of buffered results')
     # class 0 is person, 1 is bycicle, 2 is car... 79 is oven
     parser.add_argument('--classes', nargs='+', type=int, help='filter by class: --class 0, or --class 16 17')
     parser.add_argument('--agnostic-nms', action='store_true', help='class-agnostic NMS')
+    parser.add_argument('--full-head', action='store_true',
+                        help='keep all classes and rows of the detection head output, no pruning before NMS')
     parser.add_argument('--augment', action='store_true', help='augmented inference')
     parser.add_argument('--evaluate', action='store_true', help='augmented inference')
     parser.add_argument("--config_deepsort", type=str, default="tracker/deep_sort/configs/deep_sort.yaml")
@@ -427,15 +673,44 @@ def get_args():
     parser.add_argument('--visualize', action='store_true', help='visualize features')
     parser.add_argument('--max-det', type=int, default=1000, help='maximum detection per image')
     parser.add_argument('--dnn', action='store_true', help='use OpenCV DNN for ONNX inference')
-    parser.add_argument('--roi', action='store_true', help='turn on roi filter')
+    parser.add_argument('--compile', type=str, default=None, choices=['torchscript', 'onnx', 'openvino'],
+                        help='run --yolo_model compiled to this format, built into --compile-dir on first use')
+    parser.add_argument('--compile-dir', type=str, default='weights/compiled', help='compiled model cache folder')
+    parser.add_argument('--opset', type=int, default=12, help='ONNX opset of --compile onnx')
+    parser.add_argument('--roi', type=str, default=None,
+                        help='regions of interest per source (yaml), the detector only runs on them, see tools/regions.py')
+    parser.add_argument('--tile', action='store_true',
+                        help='detect on overlapping --imgsz tiles of the frames instead of scaling them down')
+    parser.add_argument('--tile-overlap', type=float, default=0.2, help='overlap of neighbouring tiles')
+    parser.add_argument('--tile-full', action='store_true',
+                        help='with --tile, also detect on the whole frame scaled down, for objects larger than a tile')
     parser.add_argument('--en_counting', action='store_true', help='turn on entrance counting')
     parser.add_argument('--process', action='store_true', help='turn on image processing')
     parser.add_argument('--topic', default='/usb_cam/image_raw/compressed', help='rostopic to be subscribed')
+    parser.add_argument('--queue-size', type=int, default=4, help='max frames buffered between pipeline stages')
+    parser.add_argument('--det-cache', type=str, default=None,
+                        help='record NMS outputs into this folder, or replay them when a matching cache exists')
+    parser.add_argument('--cache-embeddings', action='store_true', help='also cache ReID embeddings with --det-cache')
+    parser.add_argument('--det-interval', type=int, default=1,
+                        help='run the detector every N frames, the trackers extrapolate the frames in between')
+    parser.add_argument('--det-adaptive', action='store_true',
+                        help='detect as rarely as track speed allows, every --det-interval frames at most')
+    parser.add_argument('--det-max-shift', type=float, default=0.1,
+                        help='with --det-adaptive, track motion allowed between two detections, in box heights')
+    parser.add_argument('--motion-gate', action='store_true',
+                        help='skip the detector and ReID on static frames, found by background subtraction')
+    parser.add_argument('--motion-thresh', type=float, default=0.002,
+                        help='fraction of moving pixels of an ROI that counts as motion')
+    parser.add_argument('--motion-pixel-thresh', type=float, default=20,
+                        help='grey level change of a moving pixel')
+    parser.add_argument('--motion-hold', type=int, default=5, help='frames still detected after the last motion')
+    parser.add_argument('--motion-roi', nargs='+', type=str, default=None,
+                        help='regions watched for motion as x1,y1,x2,y2 fractions of the frame, default the whole frame')
 
     args = parser.parse_args()
     args.imgsz *= 2 if len(args.imgsz) == 1 else 1  # expand
 
-    return parser.parse_args()
+    return args
 
 if __name__ == '__main__':
     
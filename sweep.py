@@ -0,0 +1,105 @@
+'''
+Description: Parallel hyperparameter sweep of a tracker over MOT sequences
+Version:
+Author:
+Date: 2026-10-18 19:48:26
+LastEditTime: 2026-10-18 19:48:26
+'''
+# limit the number of cpus used by high performance libraries, the sweep parallelizes over trials
+import os
+os.environ["OMP_NUM_THREADS"] = "1"
+os.environ["OPENBLAS_NUM_THREADS"] = "1"
+os.environ["MKL_NUM_THREADS"] = "1"
+os.environ["VECLIB_MAXIMUM_THREADS"] = "1"
+os.environ["NUMEXPR_NUM_THREADS"] = "1"
+
+import sys
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from tabulate import tabulate
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[0]  #root directory
+
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+
+from tools.sweep import Leaderboard, SearchSpace, init_worker, run_trial, trial_context, trial_id
+
+
+def main(args):
+    space = SearchSpace.from_file(args.space)
+    trials = space.grid() if args.search == 'grid' else space.random(args.trials, args.seed)
+
+    root = Path(args.mot_root)
+    names = args.seqs or sorted(p.name for p in root.iterdir()
+                                if (p / 'det' / 'det.txt').is_file() and (p / 'gt' / 'gt.txt').is_file())
+    assert names, f'no sequences with det/det.txt and gt/gt.txt in {root}'
+    seq_dirs = [str(root / name) for name in names]
+
+    board = Leaderboard(args.leaderboard)
+    context = trial_context(args, names)  # same grid on another tracker or sequences is a new set of trials
+    todo = [p for p in trials if trial_id(p, context) not in board.done]
+    print(f'{len(trials)} trials on {len(seq_dirs)} sequences, {len(trials) - len(todo)} already done')
+
+    config_dir = Path(args.leaderboard).parent / 'configs'
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx, initializer=init_worker,
+                             initargs=(seq_dirs, args.min_score)) as executor:
+        futures = {executor.submit(run_trial, p, args, str(config_dir), context): p for p in todo}
+        for k, future in enumerate(as_completed(futures), 1):
+            row = future.result()
+            board.add(row)
+            print(f'[{k}/{len(todo)}] {row["trial"]} {args.rank}={row[args.rank]:.4f} '
+                  + ' '.join(f'{n}={v}' for n, v in futures[future].items()))
+
+    table = board.table(rank=args.rank, top=args.top)
+    print(tabulate(table, headers='keys', showindex=False, floatfmt='.4f'))
+    print('Leaderboard saved to %s' % args.leaderboard)
+
+
+def get_args():
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--space', type=str, required=True, help='search space yaml, see tools/sweep.py')
+    parser.add_argument('--search', type=str, default='grid', choices=['grid', 'random'], help='search strategy')
+    parser.add_argument('--trials', type=int, default=20, help='configurations drawn by --search random')
+    parser.add_argument('--seed', type=int, default=0, help='random search seed')
+    parser.add_argument('--mot-root', type=str, required=True, help='MOTChallenge split with ground truth, i.e. MOT16/train')
+    parser.add_argument('--seqs', nargs='+', type=str, default=None, help='sequences of --mot-root, default all')
+    parser.add_argument('--min-score', type=float, default=None, help='drop detections below this score')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='parallel trials')
+    parser.add_argument('--leaderboard', type=str, default='./inference/sweep/leaderboard.csv',
+                        help='results, .csv or .parquet, finished trials are skipped on resume')
+    parser.add_argument('--rank', type=str, default='idf1', help='metric the leaderboard is sorted by')
+    parser.add_argument('--top', type=int, default=10, help='rows printed at the end')
+
+    parser.add_argument("--tracker", type=str, default="bytetracker", help="set tracker")
+    parser.add_argument('--device', default='cpu', help='cuda device, i.e. 0 or 0,1,2,3 or cpu')
+
+    ####byte track
+    parser.add_argument("--track_thresh", type=float, default=0.5, help="tracking confidence threshold")
+    parser.add_argument("--track_buffer", type=int, default=30, help="the frames for keep lost tracks")
+    parser.add_argument("--match_thresh", type=float, default=0.8, help="matching threshold for tracking")
+    parser.add_argument('--min-box-area', type=int, default=10, help='filter out tiny boxes')
+    parser.add_argument("--mot20", dest="mot20", default=False, action="store_true", help="test mot20.")
+    parser.add_argument('--det-interval', type=int, default=1, help='detected frames, the others are predict-only')
+    parser.add_argument('--det-adaptive', action='store_true', help='adapt the interval to track speed')
+    parser.add_argument('--det-max-shift', type=float, default=0.1, help='motion between detections, in box heights')
+
+    ####deep sort
+    parser.add_argument('--deep_sort_model', type=str, default='osnet_x0_25')
+    parser.add_argument("--config_deepsort", type=str, default="tracker/deep_sort/configs/deep_sort.yaml")
+
+    args = parser.parse_args()
+
+    return args
+
+if __name__ == '__main__':
+
+    args = get_args()
+    main(args)
@@ -0,0 +1,277 @@
+'''
+Description: Offline tracker benchmark, replays detections through the registered trackers
+Version:
+Author:
+Date: 2026-10-18 16:02:51
+LastEditTime: 2026-10-18 16:02:51
+'''
+import configparser
+import copy
+import resource
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+
+from tools.scheduler import DetectionScheduler
+
+__all__ = ["Sequence", "MotSequence", "SyntheticCrowd", "load_detections", "update_tracker",
+           "replay", "summarize"]
+
+
+class Sequence(object):
+    """
+    Detections of one sequence, replayed frame by frame.
+    Args:
+        name (str): sequence name, used for the result files.
+        detections (dict[int, array]): frame id (1-based) -> Nx6 detections
+            (x1, y1, x2, y2, score, class).
+        width (int), height (int): frame size.
+        length (int): number of frames, defaults to the last frame with detections.
+        gt (array): Mx6 ground truth rows (frame, id, x, y, w, h), optional.
+    """
+    def __init__(self, name, detections, width, height, length=None, gt=None):
+        self.name = name
+        self.detections = detections
+        self.width = width
+        self.height = height
+        self.length = length or max(detections, default=0)
+        self.gt = gt
+        self._blank = None
+
+    def __len__(self):
+        return self.length
+
+    def dets(self, frame_id):
+        return self.detections.get(frame_id, np.zeros((0, 6), dtype=np.float32))
+
+    def image(self, frame_id):
+        """
+        BGR frame handed to appearance based trackers; a blank canvas when the
+        sequence has no images.
+        """
+        return self.blank()
+
+    def blank(self):
+        """
+        Gray frame of the sequence size, handed to trackers that only use the
+        frame shape.
+        """
+        if self._blank is None:
+            self._blank = np.full((self.height, self.width, 3), 114, dtype=np.uint8)
+        return self._blank
+
+    def write_gt(self, root):
+        """
+        Store the ground truth as `root/<name>/gt/gt.txt`, the layout
+        :class:`Evaluator` reads. Returns False without ground truth.
+        """
+        if self.gt is None:
+            return False
+        path = Path(root) / self.name / 'gt'
+        path.mkdir(parents=True, exist_ok=True)
+        rows = np.c_[self.gt[:, :6], np.ones((len(self.gt), 3))]  # conf, class, visibility
+        np.savetxt(path / 'gt.txt', rows, fmt='%d,%d,%.2f,%.2f,%.2f,%.2f,%d,%d,%d')
+        return True
+
+
+class MotSequence(Sequence):
+    """
+    A MOTChallenge sequence folder (seqinfo.ini, det/det.txt, gt/gt.txt, img1/).
+    Images are only read when present and only for appearance based trackers,
+    the ground truth is evaluated in place.
+    Args:
+        path (str): sequence folder.
+        det_file (str): detections, defaults to `det/det.txt`.
+        min_score (float): drop detections below this score.
+    """
+    def __init__(self, path, det_file=None, min_score=None):
+        path = Path(path)
+        info = configparser.ConfigParser()
+        info.read(path / 'seqinfo.ini')
+        seq = info['Sequence'] if info.has_section('Sequence') else {}
+        detections = load_detections(det_file or path / 'det' / 'det.txt', min_score)
+        super().__init__(path.name, detections,
+                         int(seq.get('imWidth', 1920)), int(seq.get('imHeight', 1080)),
+                         int(seq['seqLength']) if 'seqLength' in seq else None)
+        self.data_root = str(path.parent) if (path / 'gt' / 'gt.txt').is_file() else None
+        self.img_dir = path / seq.get('imDir', 'img1')
+        self.img_ext = seq.get('imExt', '.jpg')
+
+    def image(self, frame_id):
+        img = cv2.imread(str(self.img_dir / f'{frame_id:06d}{self.img_ext}'))
+        return img if img is not None else super().image(frame_id)
+
+
+class SyntheticCrowd(Sequence):
+    """
+    Pedestrian-like boxes moving at constant speed and bouncing off the frame
+    borders, with missed detections, box noise and clutter. The frames are
+    drawn from the ground truth (one colour per identity), so appearance
+    features are not degenerate.
+    Args:
+        num_objects (int): people in the scene, the knob for scaling curves.
+        length (int): number of frames.
+        miss_rate (float): probability that a person is not detected.
+        clutter (float): mean number of false positives per frame.
+        noise (float): box noise in pixels.
+        seed (int): random seed, the same arguments give the same sequence.
+    """
+    def __init__(self, num_objects, length=300, width=1920, height=1080, miss_rate=0.1, clutter=2.0,
+                 noise=2.0, seed=0):
+        rng = np.random.RandomState(seed)
+        w = rng.uniform(20, 60, num_objects)
+        wh = np.c_[w, w * rng.uniform(2.2, 2.8, num_objects)]
+        pos = rng.uniform(0, 1, (num_objects, 2)) * ([width, height] - wh)
+        vel = rng.normal(0, 3, (num_objects, 2))
+        colors = rng.randint(0, 255, (num_objects, 3))
+
+        gt, detections = [], {}
+        for frame_id in range(1, length + 1):
+            pos += vel
+            out = (pos < 0) | (pos + wh > [width, height])
+            vel[out] *= -1
+            pos = np.clip(pos, 0, [width, height] - wh)
+            gt.append(np.c_[np.full(num_objects, frame_id), np.arange(1, num_objects + 1), pos, wh])
+
+            seen = rng.rand(num_objects) > miss_rate
+            tlbr = np.c_[pos, pos + wh][seen] + rng.normal(0, noise, (seen.sum(), 4))
+            scores = rng.uniform(0.2, 1.0, seen.sum())  # low scores feed ByteTrack's second association
+            k = rng.poisson(clutter)
+            xy = rng.uniform(0, 1, (k, 2)) * [width - 40, height - 100]
+            tlbr = np.r_[tlbr, np.c_[xy, xy + [40, 100]]]
+            scores = np.r_[scores, rng.uniform(0.1, 0.6, k)]
+            detections[frame_id] = np.c_[tlbr, scores, np.zeros(len(scores))].astype(np.float32)
+
+        super().__init__(f'crowd{num_objects}', detections, width, height, length, np.concatenate(gt))
+        self.colors = colors
+        self.data_root = None
+
+    def image(self, frame_id):
+        img = super().image(frame_id).copy()
+        rows = self.gt[self.gt[:, 0] == frame_id]
+        for row in rows[np.argsort(rows[:, 3] + rows[:, 5])]:  # far to near, near people occlude
+            x, y, w, h = row[2:6].astype(int)
+            cv2.rectangle(img, (x, y), (x + w, y + h), self.colors[int(row[1]) - 1].tolist(), -1)
+        return img
+
+
+def load_detections(path, min_score=None):
+    """
+    Detections per frame from a MOT `det.txt` (frame, -1, x, y, w, h, score, ...)
+    or an .npz with `frame`, `x`, `y`, `w`, `h`, `score` and optional `cls`
+    columns (e.g. saved NMS outputs).
+    Returns:
+        dict[int, array]: frame id -> Nx6 (x1, y1, x2, y2, score, class).
+    """
+    path = str(path)
+    if path.endswith('.npz'):
+        with np.load(path) as f:
+            cols = {k: f[k] for k in f.files}
+        cls = cols.get('cls', np.zeros(len(cols['frame'])))
+        rows = np.c_[cols['frame'], cols['x'], cols['y'], cols['w'], cols['h'], cols['score'], cls]
+    else:
+        rows = np.loadtxt(path, delimiter=',', ndmin=2)
+        rows = np.c_[rows[:, 0], rows[:, 2:7], np.zeros(len(rows))]
+    if min_score is not None:
+        rows = rows[rows[:, 5] >= min_score]
+    rows[:, 3:5] += rows[:, 1:3]  # tlwh to tlbr
+    frames = rows[:, 0].astype(int)
+    order = np.argsort(frames, kind='stable')
+    rows, frames = rows[order], frames[order]
+    ids, starts = np.unique(frames, return_index=True)
+    return {int(k): r[:, 1:].astype(np.float32) for k, r in zip(ids, np.split(rows, starts[1:]))}
+
+
+def update_tracker(name, tracker, det, im0):
+    """
+    Feed one frame of Nx6 detections to `tracker` the way main.py does.
+    Returns:
+        list or array of [x1, y1, x2, y2, track_id].
+    """
+    if not len(det):
+        if name == 'deepsort':
+            tracker.increment_ages()
+        return []
+    det = torch.from_numpy(det)
+    shape = [im0.shape[0], im0.shape[1]]
+    if name == 'deepsort':
+        xywhs = torch.cat([(det[:, 0:2] + det[:, 2:4]) / 2, det[:, 2:4] - det[:, 0:2]], 1)
+        return tracker.update(xywhs, det[:, 4], det[:, 5], im0)
+    elif name == 'bytetracker':
+        return tracker.update(det[:, 0:5], shape, shape)
+    elif name == 'deep_bytetracker':
+        return tracker.update(det[:, 0:5], shape, shape, im0)
+    raise KeyError(f"No replay rule for tracker '{name}'")
+
+
+def peak_rss():
+    """
+    Peak resident set size of this process in bytes.
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def replay(name, args, seq, warmup=5):
+    """
+    Run tracker `name` over `seq`, timing every update. Meant to run in a fresh
+    process so that the peak RSS belongs to this tracker alone. Frames left
+    out by `--det-interval` / `--det-adaptive` are predict-only steps.
+    Args:
+        name (str): registered tracker name.
+        args (Namespace): tracker arguments, as parsed by main.py.
+        seq (Sequence): detections to replay.
+        warmup (int): leading frames left out of the latency statistics.
+    Returns:
+        dict: `latency` (seconds per timed frame), `results` ((frame_id, tlwhs,
+            ids) per frame, for `write_results`), `peak_rss` (bytes) and
+            `reid_skip_rate` (None for trackers without ReID).
+    """
+    from tracker.build import build_tracker  # imports (and registers) every tracker
+
+    args = copy.copy(args)
+    args.tracker = name
+    trk = build_tracker(args)
+    scheduler = DetectionScheduler(getattr(args, 'det_interval', 1), getattr(args, 'det_adaptive', False),
+                                   getattr(args, 'det_max_shift', 0.1))
+    appearance = hasattr(trk, 'extractor')  # the others only read the frame shape, skip reading and drawing frames
+    latency, results = [], []
+    for frame_id in range(1, len(seq) + 1):
+        det, im0 = seq.dets(frame_id), seq.image(frame_id) if appearance else seq.blank()
+        t = time.perf_counter()
+        if scheduler.step():
+            outputs = update_tracker(name, trk, det, im0)
+            scheduler.observe(0, frame_id, outputs)
+        else:
+            outputs = trk.predict()
+        dt = time.perf_counter() - t
+        if frame_id > warmup:
+            latency.append(dt)
+        out = np.asarray(outputs, dtype=np.float64).reshape(-1, 5)
+        results.append((frame_id, np.c_[out[:, 0:2], out[:, 2:4] - out[:, 0:2]], out[:, 4].astype(int)))
+    return dict(latency=np.asarray(latency), results=results, peak_rss=peak_rss(),
+                reid_skip_rate=getattr(trk, 'reid_skip_rate', None))
+
+
+def summarize(run):
+    """
+    Latency percentiles (ms), FPS, peak RSS (MB) and the share of detections
+    that skipped ReID (%) of a :func:`replay` run.
+    """
+    lat = run['latency'] * 1E3
+    if not len(lat):
+        lat = np.zeros(1)
+    skip = run.get('reid_skip_rate')
+    return {
+        'p50 ms': np.percentile(lat, 50),
+        'p90 ms': np.percentile(lat, 90),
+        'p99 ms': np.percentile(lat, 99),
+        'max ms': lat.max(),
+        'FPS': len(lat) / max(lat.sum() / 1E3, 1E-9),
+        'peak RSS MB': run['peak_rss'] / 2 ** 20,
+        'ReID skip %': np.nan if skip is None else skip * 1E2,
+    }
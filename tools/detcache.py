@@ -0,0 +1,266 @@
+'''
+Description: Memory-mapped cache of NMS outputs and ReID embeddings, for tracker-only re-runs
+Version:
+Author:
+Date: 2026-10-18 17:31:08
+LastEditTime: 2026-10-18 17:31:08
+'''
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import torch
+
+__all__ = ["DetectionCache", "CachedExtractor", "cache_key", "cache_path"]
+
+# records.bin columns, one row per image
+RECORD_COLUMNS = ('batch', 'stream', 'frame', 'path', 'height', 'width', 'img_height', 'img_width', 'start', 'count')
+
+
+def _file_id(path):
+    # path plus size and mtime, so a re-encoded video or retrained model misses the cache
+    if os.path.isfile(path):
+        st = os.stat(path)
+        return [str(Path(path).resolve()), st.st_size, int(st.st_mtime)]
+    return [str(Path(path).resolve()) if os.path.exists(path) else path]
+
+
+def cache_key(args, sources):
+    """
+    Everything the NMS outputs depend on: sources, detector weights, input
+    size and NMS settings. Tracker arguments are deliberately left out.
+    """
+    weights = args.yolo_model if isinstance(args.yolo_model, (list, tuple)) else [args.yolo_model]
+    return dict(
+        sources=[_file_id(s) for s in sources],
+        detector=args.detector,
+        weights=[_file_id(w) for w in weights],
+        imgsz=list(args.imgsz),
+        conf_thres=args.conf_thres,
+        iou_thres=args.iou_thres,
+        classes=args.classes,
+        agnostic_nms=args.agnostic_nms,
+        max_det=args.max_det,
+        augment=args.augment,
+        half=args.half,
+        roi=_file_id(args.roi) if args.roi else None,
+        tile=[args.tile, args.tile_overlap, args.tile_full] if args.tile else None,
+        process=args.process,
+    )
+
+
+def cache_path(root, key):
+    """
+    Cache folder of `key` under `root`: `<first source stem>_<hash>`.
+    """
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()[:12]
+    stem = Path(str(key['sources'][0][0]).rstrip('/')).stem or 'source'
+    return Path(root) / f'{stem}_{digest}'
+
+
+class DetectionCache(object):
+    """
+    Per-frame NMS outputs of a detector run, stored column by column so that
+    replaying them costs a memory map instead of a forward pass:
+    .. code-block:: none
+        meta.json     cache key, class names, embedding size and paths
+        records.bin   int64 rows, see RECORD_COLUMNS (one per image)
+        dets.bin      float32 (x1, y1, x2, y2, conf, cls) per detection, in
+                      original image coordinates
+        embs.bin      float16 ReID embedding per detection, optional
+    Recording appends to `<path>.partial` and renames it on :meth:`close`, so
+    an interrupted run never leaves a cache that looks complete.
+    Use :meth:`create` to record and :meth:`open` to replay.
+    """
+    def __init__(self, path, meta, writable):
+        self.path = Path(path)
+        self.meta = meta
+        self.writable = writable
+        self.names = meta['names']
+        self.emb_dim = meta.get('emb_dim', 0)
+        self.paths = list(meta.get('paths', []))
+        self.sources = list(meta.get('sources', []))
+        self.batched = meta.get('batched', False)
+        self.streams = []
+        self.count = -1
+
+    @property
+    def has_embeddings(self):
+        return self.emb_dim > 0
+
+    @staticmethod
+    def exists(path, embeddings=None):
+        """
+        True for a complete cache, which also holds embeddings of model
+        `embeddings` when given.
+        """
+        meta = Path(path) / 'meta.json'
+        if not meta.is_file():
+            return False
+        if embeddings is None:
+            return True
+        meta = json.loads(meta.read_text())
+        return meta.get('emb_dim', 0) > 0 and meta.get('emb_model') == embeddings
+
+    @classmethod
+    def create(cls, path, key, names, sources, batched, emb_model=None):
+        """
+        Start recording into `path`, replacing any previous cache there.
+        Args:
+            key (dict): :func:`cache_key` of the run.
+            names (list[str]): detector class names.
+            sources (list[str]): one source per stream.
+            batched (bool): whether the dataloader yields lists of frames.
+            emb_model (str): ReID model name when embeddings are stored.
+        """
+        path = Path(path)
+        tmp = path.with_name(path.name + '.partial')
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        meta = dict(key=key, names=list(names), sources=list(sources), batched=batched,
+                    emb_model=emb_model, emb_dim=0, paths=[])
+        cache = cls(path, meta, writable=True)
+        cache._tmp = tmp
+        cache._path_ids = {}
+        cache._files = {k: open(tmp / f'{k}.bin', 'ab') for k in ('records', 'dets', 'embs')}
+        cache._count = 0
+        return cache
+
+    @classmethod
+    def open(cls, path):
+        """
+        Memory-map a complete cache for replay.
+        """
+        path = Path(path)
+        cache = cls(path, json.loads((path / 'meta.json').read_text()), writable=False)
+        cache.records = cache._map('records', np.int64, len(RECORD_COLUMNS))
+        cache.det_table = cache._map('dets', np.float32, 6)
+        cache.emb_table = cache._map('embs', np.float16, cache.emb_dim) if cache.has_embeddings else None
+        batches, starts = np.unique(cache.records[:, 0], return_index=True)
+        ends = np.r_[starts[1:], len(cache.records)]
+        cache.batches = {int(b): (int(s), int(e)) for b, s, e in zip(batches, starts, ends)}
+        return cache
+
+    def _map(self, name, dtype, width):
+        file = self.path / f'{name}.bin'
+        if not file.is_file() or file.stat().st_size == 0:
+            return np.zeros((0, width), dtype=dtype)
+        return np.memmap(file, dtype=dtype, mode='r').reshape(-1, width)
+
+    def add(self, batch, stream, frame, path, shape, img_shape, det, emb=None):
+        """
+        Append the detections of one image.
+        Args:
+            batch (int): index of the batch the image came in.
+            stream (int): stream index inside the batch.
+            frame (int): 1-based frame number of the stream.
+            path (str): image / video path.
+            shape (tuple): original image (height, width).
+            img_shape (tuple): network input (height, width).
+            det (array): Nx6 (x1, y1, x2, y2, conf, cls) in image coordinates.
+            emb (array): NxD embeddings, required once the first one was given.
+        """
+        assert self.writable, 'cache was opened for replay'
+        det = np.asarray(det, dtype=np.float32).reshape(-1, 6)
+        if path not in self._path_ids:
+            self._path_ids[path] = len(self.paths)
+            self.paths.append(path)
+        row = [batch, stream, frame, self._path_ids[path], shape[0], shape[1], img_shape[0], img_shape[1],
+               self._count, len(det)]
+        self._files['records'].write(np.asarray(row, dtype=np.int64).tobytes())
+        self._files['dets'].write(det.tobytes())
+        if emb is not None and len(det):
+            emb = np.asarray(emb, dtype=np.float16).reshape(len(det), -1)
+            self.emb_dim = self.emb_dim or emb.shape[1]
+            self._files['embs'].write(emb.tobytes())
+        self._count += len(det)
+
+    def close(self):
+        """
+        Finish recording and publish the cache under its final name.
+        """
+        if not self.writable:
+            return
+        for f in self._files.values():
+            f.close()
+        self.meta.update(emb_dim=self.emb_dim, paths=self.paths)
+        (self._tmp / 'meta.json').write_text(json.dumps(self.meta, indent=1))
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self._tmp, self.path)
+        self.writable = False
+
+    def __len__(self):
+        return len(self.batches)
+
+    def batch(self, index):
+        """
+        Record rows of batch `index`.
+        """
+        start, end = self.batches.get(index, (0, 0))
+        return self.records[start:end]
+
+    def dets(self, record):
+        start, count = record[8], record[9]
+        return self.det_table[start:start + count]
+
+    def embs(self, record):
+        if self.emb_table is None:
+            return None
+        start, count = record[8], record[9]
+        return self.emb_table[start:start + count]
+
+    def __iter__(self):
+        """
+        Dataloader replacement for replays that do not need the real images:
+        yields (path, img, im0s, vid_cap, data) like the recorded loader,
+        LoadImages or a batched one, with blank frames of the recorded size.
+        `streams` holds the stream indices of the last batch.
+        """
+        blanks = {}
+        for index in sorted(self.batches):
+            self.count = index
+            records = self.batch(index)
+            paths, im0s = [], []
+            for r in records:
+                shape = (int(r[4]), int(r[5]), 3)
+                if shape not in blanks:
+                    blanks[shape] = np.zeros(shape, dtype=np.uint8)
+                paths.append(self.paths[r[3]])
+                im0s.append(blanks[shape])
+            self.streams = [int(r[1]) for r in records]
+            if self.batched:
+                yield paths, None, im0s, [None] * len(paths), [None] * len(paths)
+            else:
+                yield paths[0], None, im0s[0], None, None
+
+
+class CachedExtractor(object):
+    """
+    Stands in for a tracker's FeatureExtractor: returns the embeddings that
+    were stored with the detections of the current frame. Trackers crop
+    slightly different boxes (truncated, clipped, first/second association
+    subsets), so every requested box takes the embedding of the nearest
+    cached box.
+    """
+    def __init__(self):
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.features = torch.zeros((0, 0))
+
+    def load(self, boxes, features):
+        """
+        Args:
+            boxes (array): Nx4 xyxy boxes of the frame.
+            features (array): NxD embeddings, in the same order.
+        """
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.features = torch.from_numpy(np.asarray(features, dtype=np.float32))
+
+    def extract_boxes(self, image, boxes):
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        if not len(boxes):
+            return self.features[:0]
+        dist = np.abs(boxes[:, None, :] - self.boxes[None, :, :]).sum(2)
+        return self.features[torch.from_numpy(dist.argmin(1))]
@@ -5,42 +5,117 @@ Author: Xuanying Chen
 Date: 2022-02-16 17:09:59
 LastEditTime: 2022-03-04 18:29:29
 '''
+import importlib
+import threading
+import time
+from collections import deque
+
 import cv2
 import numpy as np
 from detector.yolov5.utils.augmentations import letterbox
 from detector.yolov5.utils.datasets import LoadImages, LoadStreams
 
-import rospy
-from cm_transport.msg import CustomCImage
-from sensor_msgs.msg import CompressedImage
-from detection.msg import boxes,box
+# rospy and the message packages are only imported once a ROS source or the publisher needs them,
+# runs on files and streams start without a sourced ROS workspace
+_ROS_MESSAGES = {
+    'CompressedImage': 'sensor_msgs.msg',
+    'CustomCImage': 'cm_transport.msg',
+    'boxes': 'detection.msg',
+    'box': 'detection.msg',
+}
+
+
+def ros_message(name):
+    # ROS message class by name, i.e. ros_message('boxes'), classes are passed through
+    if not isinstance(name, str):
+        return name
+    return getattr(importlib.import_module(_ROS_MESSAGES[name]), name)
+
+
+class RosFrame:
+    # One received message with its bookkeeping, handed out as `data` by LoadRosTopic.
+    # seq counts every message the subscriber received, so gaps mean dropped frames.
+    def __init__(self, msg, seq, t_received):
+        self.msg = msg
+        self.seq = seq
+        self.t_received = t_received  # wall time the callback got the message
+        self.t_decoded = None  # wall time the image was decoded
+        self.tram_status = msg.tram_status.status if hasattr(msg, 'tram_status') else 0
+
+    @property
+    def header(self):
+        return getattr(self.msg, 'header', None)
+
+    @property
+    def stamp(self):
+        # publisher side stamp in seconds, None without a header
+        header = self.header
+        return header.stamp.to_sec() if header is not None and hasattr(header, 'stamp') else None
+
+    def latency(self, now=None):
+        # seconds since the message was received
+        return (time.time() if now is None else now) - self.t_received
+
 
 class LoadRosTopic:  # for inference
     # YOLOv5 rostopic dataloader, i.e. `python detect.py --source 1`
-    def __init__(self, topic='/usb_cam/compressed', img_size=640, stride=32, auto=True, datatype=CompressedImage):
+    # The subscriber callback only queues the raw message, decoding happens in __next__.
+    # Every received message is yielded exactly once; when inference is slower than the
+    # topic the oldest pending messages are dropped (counted in `dropped`) so the output
+    # stays close to real time.
+    def __init__(self, topic='/usb_cam/compressed', img_size=640, stride=32, auto=True, datatype='CompressedImage',
+                 queue_size=3, timeout=None, chw=True):
+        import rospy
         self.img_size = img_size
         self.stride = stride
         self.auto = auto
+        self.chw = chw  # False yields the letterboxed BGR HWC frame
         self.topic = topic
-        self.datatype = datatype
+        self.datatype = ros_message(datatype)
+        self.timeout = timeout  # seconds without a message before StopIteration, None waits forever
         self.data = None
-        self.image = None
         self.header = None
-        rospy.init_node('detection_listener', anonymous=True)
-        rospy.Subscriber(self.topic, datatype, self.callback, queue_size = 3)
+        self.tram_status = 0
+        self.seq = -1  # last received
+        self.dropped = 0
+        self.frames = deque(maxlen=queue_size)
+        self.cond = threading.Condition()
+        if not rospy.core.is_initialized():  # several topics share one node
+            rospy.init_node('detection_listener', anonymous=True)
+        rospy.Subscriber(self.topic, self.datatype, self.callback, queue_size = queue_size)
         # rospy.spin()
 
     def callback(self,data):
-        self.data = data
-        if self.datatype == CustomCImage:
-            np_arr = np.fromstring(data.image.data, np.uint8)
-            self.tram_status = data.tram_status.status
-            rospy.loginfo(rospy.get_caller_id() + "I heard %d",self.tram_status)
-        elif self.datatype == CompressedImage:
-            np_arr = np.fromstring(data.data, np.uint8)
-            self.tram_status = 0
-            self.header = data.header
-        self.image = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        # runs on a rospy thread, keep it short
+        t = time.time()
+        with self.cond:
+            self.seq += 1
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1  # drop oldest
+            self.frames.append(RosFrame(data, self.seq, t))
+            self.cond.notify()
+
+    def decode(self, frame):
+        if self.datatype.__name__ == 'CustomCImage':
+            import rospy
+            np_arr = np.frombuffer(frame.msg.image.data, np.uint8)
+            rospy.loginfo(rospy.get_caller_id() + "I heard %d",frame.tram_status)
+        else:
+            np_arr = np.frombuffer(frame.msg.data, np.uint8)
+        img0 = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        frame.t_decoded = time.time()
+        return img0
+
+    def wait(self):
+        # next unseen frame, blocks until one arrives
+        import rospy
+        t0 = time.time()
+        with self.cond:
+            while not self.frames:
+                if rospy.is_shutdown() or (self.timeout is not None and time.time() - t0 > self.timeout):
+                    raise StopIteration
+                self.cond.wait(0.1)
+            return self.frames.popleft()
 
     def __iter__(self):
         self.count = -1
@@ -50,30 +125,129 @@ class LoadRosTopic:  # for inference
         
         self.count += 1
         # Read frame
-        img0 = self.image.copy()
+        frame = self.wait()
+        img0 = self.decode(frame)
+        assert img0 is not None, f'Can not decode frame {frame.seq} of {self.topic}'
+        self.data, self.header, self.tram_status = frame, frame.header, frame.tram_status
         
         # Padded resize
         img = letterbox(img0, self.img_size, stride=self.stride,auto=self.auto)[0]
 
         # Convert
-        img = img.transpose((2, 0, 1))[::-1]  # HWC to CHW, BGR to RGB
-        img = np.ascontiguousarray(img)
+        if self.chw:
+            img = img.transpose((2, 0, 1))[::-1]  # HWC to CHW, BGR to RGB
+            img = np.ascontiguousarray(img)
 
-        return self.topic, img, img0, None, self.data #self.tram_status      
+        return self.topic, img, img0, None, frame
 
     def __len__(self):
         return 0
 
 
+class LoadMultiSource:  # for inference
+    # Several sources batched together, i.e. `python main.py --source vid.mp4 rtsp://cam2 ros:/cam3/compressed`
+    # Every source is letterboxed to the full img_size, so the frames stack into one batch.
+    # A source that runs out (end of file) leaves the batch, `streams` holds the source
+    # index of every image in the last batch. chw=False yields a list of letterboxed BGR HWC
+    # frames instead of the stacked batch.
+    def __init__(self, sources, img_size=640, stride=32, datatype='CompressedImage', chw=True):
+        self.sources = list(sources)
+        self.chw = chw
+        self.loaders = []
+        for s in self.sources:
+            if s.startswith('ros:'):
+                loader = LoadRosTopic(s[4:], img_size=img_size, stride=stride, auto=False, datatype=datatype, chw=chw)
+            elif s.isnumeric() or s.lower().startswith(('rtsp://', 'rtmp://', 'http://', 'https://')):
+                loader = LoadStreams(s, img_size=img_size, stride=stride, auto=False, chw=chw)
+            else:
+                loader = LoadImages(s, img_size=img_size, stride=stride, auto=False, chw=chw)
+            self.loaders.append(loader)
+        self.streams = []
+
+    @property
+    def reuses_frames(self):
+        # stream loaders yield the same frame again until a new one arrives
+        return any(isinstance(x, LoadStreams) for x in self.loaders)
+
+    def __iter__(self):
+        self.count = -1
+        self.iters = [iter(x) for x in self.loaders]
+        self.active = list(range(len(self.loaders)))
+        return self
+
+    def __next__(self):
+        self.count += 1
+        paths, imgs, im0s, caps, datas, streams = [], [], [], [], [], []
+        for i in list(self.active):
+            try:
+                path, img, im0, cap, data = next(self.iters[i])
+            except StopIteration:
+                self.active.remove(i)
+                continue
+            if isinstance(self.loaders[i], LoadStreams):  # batch of one
+                path, img, im0 = path[0], img[0], im0[0]
+            paths.append(path)
+            imgs.append(img)
+            im0s.append(im0)
+            caps.append(cap)
+            datas.append(data)
+            streams.append(i)
+        if not streams:
+            raise StopIteration
+        self.streams = streams
+        if not self.chw:
+            return paths, imgs, im0s, caps, datas
+        return paths, np.ascontiguousarray(np.stack(imgs, 0)), im0s, caps, datas
+
+    def __len__(self):
+        return len(self.sources)
+
+
 class PublishRosTopic: 
-    def __init__(self,topic='/detection/boxes',rate=10, datatype=boxes):
-        self.rate = rospy.Rate(rate) 
-        self.pub = rospy.Publisher(topic, datatype, queue_size=3)  
+    # Non-blocking publisher: send() only queues the message, a daemon thread publishes it.
+    # A full queue drops its oldest message (counted in `dropped`), so a slow topic never
+    # stalls the detection loop. `rate` optionally caps the publishing rate (Hz) on the
+    # publisher thread, None publishes as fast as messages come in.
+    def __init__(self,topic='/detection/boxes',rate=None, datatype='boxes', queue_size=3):
+        import rospy
+        self.rate = rospy.Rate(rate) if rate else None
+        self.pub = rospy.Publisher(topic, ros_message(datatype), queue_size=queue_size)  
         # rospy.init_node('detection_talker', anonymous=True)
+        self.queue = deque(maxlen=queue_size)
+        self.cond = threading.Condition()
+        self.sent, self.dropped = 0, 0
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
     
     def send(self,data):
-        self.pub.publish(data)
-        self.rate.sleep()
+        with self.cond:
+            if self.closed:
+                return
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1  # drop oldest
+            self.queue.append(data)
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.queue and not self.closed:
+                    self.cond.wait()
+                if not self.queue:  # closed and drained
+                    return
+                data = self.queue.popleft()
+            self.pub.publish(data)
+            self.sent += 1
+            if self.rate is not None:
+                self.rate.sleep()
+
+    def close(self, timeout=1.0):
+        # publish what is still queued, then stop the thread
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join(timeout)
 
 
 def handler(signum, frame):
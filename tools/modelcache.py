@@ -0,0 +1,149 @@
+'''
+Description: On-disk cache of compiled detector models, built on first use and loaded directly afterwards
+Version:
+Author:
+Date: 2026-10-19 01:46:12
+LastEditTime: 2026-10-19 01:46:12
+'''
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+
+from detector.yolov5.utils.general import LOGGER, check_img_size
+
+__all__ = ["MODEL_FORMATS", "compiled_model", "model_key"]
+
+# format -> artifact of weights `<stem>.pt` inside its cache folder
+MODEL_FORMATS = {
+    'torchscript': '{}.torchscript',
+    'onnx': '{}.onnx',
+    'openvino': '{}_openvino_model/{}.xml',
+}
+
+
+def _file_hash(path, chunk=1 << 20):
+    # content hash, a copied or touched weights file still hits the cache
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def model_key(weights, fmt, imgsz, batch=1, half=False, device='cpu', opset=12):
+    """
+    Everything a compiled model depends on: weights content, format, input
+    size, batch size (None for dynamic), dtype, device type, the ONNX opset
+    and the torch version that traced or exported it.
+    """
+    return dict(
+        weights=[_file_hash(w) for w in weights],
+        format=fmt,
+        imgsz=list(imgsz),
+        batch=batch,
+        dtype='float16' if half else 'float32',
+        device=torch.device(device).type,
+        opset=opset if fmt in ('onnx', 'openvino') else None,
+        torch=torch.__version__,
+    )
+
+
+def _export(weights, fmt, imgsz, batch, half, device, opset, file):
+    # fused model exported next to `file` (<stem>.pt in the build folder), as export.py does
+    from detector.yolov5.export import export_onnx, export_openvino, export_torchscript
+    from models.common import Conv
+    from models.experimental import attempt_load
+    from models.yolo import Detect
+    from utils.activations import SiLU
+
+    model = attempt_load(weights if len(weights) > 1 else weights[0], map_location=device, inplace=True, fuse=True)
+    imgsz = [check_img_size(x, int(max(model.stride))) for x in imgsz]  # as main.py checks them
+    im = torch.zeros(batch or 1, 3, *imgsz).to(device)
+    if half:
+        im, model = im.half(), model.half()
+    model.eval()
+    for m in model.modules():
+        if isinstance(m, Conv) and fmt != 'torchscript':  # assign export-friendly activations
+            if isinstance(m.act, nn.SiLU):
+                m.act = SiLU()
+        elif isinstance(m, Detect):
+            m.inplace = False
+            m.onnx_dynamic = batch is None
+    for _ in range(2):
+        model(im)  # dry runs
+
+    if fmt == 'torchscript':
+        export_torchscript(model, im, file, optimize=False)
+    else:  # OpenVINO converts the ONNX model
+        export_onnx(model, im, file, opset, train=False, dynamic=batch is None, simplify=False)
+        if fmt == 'openvino':
+            export_openvino(model, im, file)
+
+
+def compiled_model(weights, fmt, imgsz, batch=1, half=False, device='cpu', root='weights/compiled', opset=12):
+    """
+    Compiled model of `weights`, exported into the cache folder under
+    `root` on first use and found there afterwards:
+    .. code-block:: none
+        <root>/<stem>_<format>_<hash>/
+            key.json                  model_key() of the artifact
+            <stem>.torchscript        fused, traced TorchScript
+            <stem>.onnx               ONNX, also kept for OpenVINO
+            <stem>_openvino_model/    OpenVINO IR (<stem>.xml, <stem>.bin)
+    A model is built in `<folder>.partial<pid>` and renamed when complete,
+    so that a process killed while exporting (or two processes exporting
+    at once) never leaves a half-written model behind.
+    Args:
+        weights (str | list[str]): PyTorch weights, several for an ensemble.
+        fmt (str): 'torchscript', 'onnx' or 'openvino'.
+        imgsz (list[int]): inference size h,w (or one size for both).
+        batch (int): batch size, None for a dynamic batch (ONNX and OpenVINO
+            fix it otherwise, traced TorchScript takes any batch size).
+        half (bool): FP16 model, CUDA only.
+        device (str | torch.device): device to export on.
+        root (str): cache folder.
+        opset (int): ONNX opset, at most 12 for OpenVINO.
+    Returns:
+        str: path to load with DetectMultiBackend.
+    """
+    from models.experimental import attempt_download
+
+    assert fmt in MODEL_FORMATS, f'--compile must be one of {list(MODEL_FORMATS)}, not {fmt}'
+    weights = [str(attempt_download(w)) for w in (weights if isinstance(weights, (list, tuple)) else [weights])]
+    assert all(Path(w).suffix == '.pt' for w in weights), f'only PyTorch weights are compiled, not {weights}'
+    imgsz = list(imgsz) * 2 if len(imgsz) == 1 else list(imgsz)
+    device = torch.device(device)
+    half &= device.type != 'cpu' and fmt != 'openvino'  # FP16 on CUDA only, OpenVINO IR is FP32 here
+    if fmt == 'openvino':
+        opset = min(opset, 12)  # OpenVINO requires opset <= 12
+
+    key = model_key(weights, fmt, imgsz, batch, half, device, opset)
+    stem = Path(weights[0]).stem
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()[:12]
+    folder = Path(root) / f'{stem}_{fmt}_{digest}'
+    artifact = MODEL_FORMATS[fmt].format(stem, stem)
+    if (folder / 'key.json').is_file():
+        LOGGER.info(f'Loading compiled model {folder / artifact}')
+        return str(folder / artifact)
+
+    LOGGER.info(f'Compiling {weights} to {fmt} into {folder}, once...')
+    tmp = folder.with_name(f'{folder.name}.partial{os.getpid()}')
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    try:
+        _export(weights, fmt, imgsz, batch, half, device, opset, tmp / f'{stem}.pt')
+        assert (tmp / artifact).exists(), f'{fmt} export of {weights} failed, see the log above'
+        (tmp / 'key.json').write_text(json.dumps(key, indent=2))
+        try:
+            os.replace(tmp, folder)
+        except OSError:  # built by another process meanwhile
+            if not (folder / 'key.json').is_file():
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return str(folder / artifact)
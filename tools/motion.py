@@ -0,0 +1,99 @@
+'''
+Description: Motion gate, static frames skip the detector and ReID
+Version:
+Author:
+Date: 2026-10-18 22:41:05
+LastEditTime: 2026-10-18 22:41:05
+'''
+import cv2
+import numpy as np
+
+__all__ = ["MotionGate", "parse_rois"]
+
+
+def parse_rois(rois):
+    """
+    'x1,y1,x2,y2' strings to (x1, y1, x2, y2) tuples, fractions of the frame.
+    """
+    boxes = []
+    for roi in rois or []:
+        box = tuple(float(v) for v in roi.split(','))
+        assert len(box) == 4 and 0 <= box[0] < box[2] <= 1 and 0 <= box[1] < box[3] <= 1, \
+            f'ROI {roi} must be x1,y1,x2,y2 fractions of the frame'
+        boxes.append(box)
+    return boxes
+
+
+class MotionGate(object):
+    """
+    Flags the frames of a static scene, which then skip the detector and ReID.
+    Every frame is shrunk to `width` pixels, converted to grey and blurred, and
+    compared with the reference frame of its stream, the last one in which
+    motion was found: slow motion adds up until it counts, and objects that
+    came to rest do not leave ghosts behind as in a running average. The
+    score of a region is the fraction of its pixels that differ from the
+    reference by more than `pixel_thresh` grey levels. A frame is static when
+    no region scores `thresh` or more and the last motion is more than `hold`
+    frames ago, so that the trackers see moving objects come to rest.
+    Args:
+        rois (list[tuple]): regions (x1, y1, x2, y2) as fractions of the frame,
+            default the whole frame.
+        thresh (float): moving fraction of a region that counts as motion.
+        pixel_thresh (float): grey level change of a moving pixel.
+        hold (int): frames still detected after the last motion.
+        width (int): width of the downsampled frame.
+    """
+    def __init__(self, rois=None, thresh=0.002, pixel_thresh=20, hold=5, width=160):
+        self.rois = list(rois) if rois else [(0.0, 0.0, 1.0, 1.0)]
+        self.thresh = thresh
+        self.pixel_thresh = pixel_thresh
+        self.hold = hold
+        self.width = width
+        self.frames = 0  # frames gated
+        self.static = 0  # frames found static
+        self.scores = {}  # stream -> ROI scores of its last frame
+        self._reference = {}
+        self._since_motion = {}
+
+    def score(self, stream, im0):
+        """
+        Moving fraction of every ROI of `im0` against the reference of
+        `stream`, None for the first frame. The frame becomes the reference
+        when a region moved.
+        """
+        h, w = im0.shape[:2]
+        small = cv2.resize(im0, (self.width, max(int(h * self.width / w), 1)), interpolation=cv2.INTER_AREA)
+        grey = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0).astype(np.float32)
+        reference = self._reference.get(stream)
+        if reference is None or reference.shape != grey.shape:
+            self._reference[stream] = grey
+            return None
+        moving = cv2.absdiff(grey, reference) > self.pixel_thresh
+
+        sh, sw = moving.shape
+        scores = []
+        for x1, y1, x2, y2 in self.rois:
+            r = moving[int(y1 * sh):max(int(y2 * sh), int(y1 * sh) + 1),
+                       int(x1 * sw):max(int(x2 * sw), int(x1 * sw) + 1)]
+            scores.append(r.mean())
+        scores = np.asarray(scores)
+        if (scores >= self.thresh).any():
+            self._reference[stream] = grey
+        return scores
+
+    def __call__(self, stream, im0):
+        """
+        True when frame `im0` of `stream` is static.
+        """
+        scores = self.score(stream, im0)
+        self.scores[stream] = scores
+        moving = scores is None or (scores >= self.thresh).any()
+        since = 0 if moving else self._since_motion.get(stream, 0) + 1
+        self._since_motion[stream] = since
+        static = since > self.hold
+        self.frames += 1
+        self.static += static
+        return static
+
+    def summary(self):
+        return f'Motion gate: {self.static}/{self.frames} frames static ({self.static / max(self.frames, 1) * 1E2:.1f}% skipped)'
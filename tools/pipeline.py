@@ -0,0 +1,173 @@
+'''
+Description: Staged pipeline runner with bounded queues between workers
+Version:
+Author:
+Date: 2026-10-18 09:12:40
+LastEditTime: 2026-10-18 09:12:40
+'''
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional
+
+__all__ = ["Stage", "Pipeline"]
+
+_STOP = object()
+
+
+class _Failure(object):
+    """
+    Carries an exception raised in a worker down to the caller thread.
+    """
+    def __init__(self, stage: str, exc: BaseException) -> None:
+        self.stage = stage
+        self.exc = exc
+
+
+class Stage(object):
+    """
+    A single step of a :class:`Pipeline`.
+    Args:
+        name (str): name used in logs and timing reports.
+        func (callable): takes one item and returns the item for the next
+            stage. Returning None drops the item.
+    """
+    def __init__(self, name: str, func: Callable[[Any], Any]) -> None:
+        self.name = name
+        self.func = func
+        self.busy = 0.0  # seconds spent inside func
+        self.count = 0   # items processed
+
+    def __call__(self, item: Any) -> Any:
+        t = time.time()
+        try:
+            return self.func(item)
+        finally:
+            self.busy += time.time() - t
+            self.count += 1
+
+
+class Pipeline(object):
+    """
+    Run a chain of stages concurrently, one worker thread per stage, connected
+    by bounded FIFO queues:
+    .. code-block:: python
+        pipeline = Pipeline(queue_size=4)
+        pipeline.add_stage('preprocess', preprocess)
+        pipeline.add_stage('inference', inference)
+        pipeline.add_stage('sink', sink)
+        pipeline.run(dataset)
+    The source iterable is consumed on its own thread and the last stage runs
+    on the calling thread, so GUI calls (cv2.imshow) and signal handlers keep
+    working. Each stage has exactly one worker, hence items leave the pipeline
+    in the order the source produced them. Throughput is bounded by the slowest
+    stage instead of the sum of all stages; `queue_size` bounds how far fast
+    stages may run ahead (and how many frames are held in memory).
+    A stage raising StopIteration stops the whole pipeline cleanly, any other
+    exception is re-raised from :meth:`run`.
+    """
+    def __init__(self, queue_size: int = 4) -> None:
+        assert queue_size > 0, "queue_size must be positive"
+        self.queue_size = queue_size
+        self.stages: List[Stage] = []
+        self._stop = threading.Event()
+
+    def add_stage(self, name: str, func: Callable[[Any], Any]) -> "Pipeline":
+        self.stages.append(Stage(name, func))
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _put(self, q: queue.Queue, item: Any) -> bool:
+        # block while the consumer is behind, but give up once stopped
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue) -> Any:
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _STOP
+
+    def _produce(self, source: Iterable, out_q: queue.Queue) -> None:
+        try:
+            for item in source:
+                if not self._put(out_q, item):
+                    return
+        except BaseException as e:
+            self._put(out_q, _Failure('source', e))
+            return
+        self._put(out_q, _STOP)
+
+    def _work(self, stage: Stage, in_q: queue.Queue, out_q: queue.Queue) -> None:
+        while True:
+            item = self._get(in_q)
+            if item is _STOP or isinstance(item, _Failure):
+                self._put(out_q, item)
+                return
+            try:
+                item = stage(item)
+            except StopIteration:
+                self._put(out_q, _STOP)
+                return
+            except BaseException as e:
+                self._put(out_q, _Failure(stage.name, e))
+                return
+            if item is not None:
+                if not self._put(out_q, item):
+                    return
+
+    def run(self, source: Iterable, sink: Optional[Callable[[Any], Any]] = None) -> int:
+        """
+        Push every item of `source` through the stages.
+        Args:
+            source (iterable): produces the items, e.g. a dataloader.
+            sink (callable): optional extra stage appended after the others.
+        Returns:
+            int: number of items that reached the end of the pipeline.
+        """
+        if sink is not None:
+            self.add_stage('sink', sink)
+        assert len(self.stages), "Pipeline has no stages"
+        self._stop.clear()
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        workers = [threading.Thread(target=self._produce, args=(source, queues[0]), daemon=True)]
+        for k, stage in enumerate(self.stages[:-1]):
+            workers.append(threading.Thread(target=self._work, args=(stage, queues[k], queues[k + 1]), daemon=True))
+        for w in workers:
+            w.start()
+
+        last, done = self.stages[-1], 0
+        try:
+            while True:
+                item = self._get(queues[-1])
+                if item is _STOP:
+                    break
+                if isinstance(item, _Failure):
+                    raise RuntimeError(f"pipeline stage '{item.stage}' failed: {item.exc!r}") from item.exc
+                try:
+                    last(item)
+                except StopIteration:
+                    break
+                done += 1
+        finally:
+            self.stop()
+            for w in workers:
+                w.join(timeout=1.0)
+        return done
+
+    def summary(self) -> str:
+        """
+        Per-stage mean busy time; the largest one bounds the throughput.
+        """
+        parts = [f'{s.name} {s.busy / max(s.count, 1) * 1E3:.1f}ms' for s in self.stages]
+        return 'Pipeline stages: ' + ', '.join(parts)
@@ -0,0 +1,269 @@
+'''
+Description: Regions of interest, the detector runs on crops of the frames instead of the whole frames
+Version:
+Author:
+Date: 2026-10-18 23:24:17
+LastEditTime: 2026-10-18 23:24:17
+'''
+from collections import namedtuple
+
+import cv2
+import numpy as np
+import torch
+import yaml
+from matplotlib.path import Path as PolygonPath
+
+from detector.yolov5.utils.augmentations import letterbox
+from detector.yolov5.utils.general import batched_nms
+
+__all__ = ["Region", "RegionCropper", "load_regions", "tile_windows"]
+
+# one detector input: image index in the batch, region, crop origin in the frame, letterbox ratio and padding,
+# size in the frame, and which of its (left, top, right, bottom) borders cut through the region
+Window = namedtuple('Window', ['image', 'region', 'x', 'y', 'ratio', 'left', 'top', 'width', 'height', 'cut'])
+
+
+class Region(object):
+    """
+    A region of interest, a rectangle or a polygon in pixels of the original
+    frame. The detector sees the bounding rectangle of the region, the pixels
+    outside a polygon are greyed out and detections centred outside of it
+    are dropped.
+    Args:
+        points (array): Nx2 polygon corners, None for the whole frame.
+        tile (bool): split a crop larger than the detector input into
+            overlapping tiles instead of scaling it down.
+        overlap (float): overlap of neighbouring tiles, fraction of the tile size.
+        full (bool): with `tile`, also detect on the whole crop scaled down,
+            for objects larger than a tile.
+    """
+    def __init__(self, points=None, tile=False, overlap=0.2, full=False):
+        self.points = None if points is None else np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        assert self.points is None or len(self.points) >= 3, 'a region needs at least 3 corners'
+        self.tile = tile
+        self.overlap = overlap
+        self.full = full
+        self.is_rect = self.points is None or (len(self.points) == 4 and self._axis_aligned())
+        self._path = None if self.is_rect else PolygonPath(self.points)
+        self._masks = {}  # frame shape -> mask of the crop
+
+    def _axis_aligned(self):
+        xs, ys = np.unique(self.points[:, 0]), np.unique(self.points[:, 1])
+        return len(xs) == 2 and len(ys) == 2
+
+    @classmethod
+    def from_config(cls, entry):
+        """
+        Region of a config entry, `{rect: [x1, y1, x2, y2]}` or
+        `{polygon: [[x, y], ...]}`, with optional `tile`, `overlap` and `full` keys.
+        """
+        if 'rect' in entry:
+            x1, y1, x2, y2 = entry['rect']
+            points = [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+        elif 'polygon' in entry:
+            points = entry['polygon']
+        else:
+            raise ValueError(f'region {entry} needs a rect or a polygon')
+        return cls(points, tile=entry.get('tile', False), overlap=entry.get('overlap', 0.2),
+                   full=entry.get('full', False))
+
+    def box(self, width, height):
+        """
+        Bounding rectangle (x1, y1, x2, y2) of the region inside a width x height frame.
+        """
+        if self.points is None:
+            return 0, 0, width, height
+        x1, y1 = np.floor(self.points.min(0)).astype(int)
+        x2, y2 = np.ceil(self.points.max(0)).astype(int)
+        return max(x1, 0), max(y1, 0), min(x2, width), min(y2, height)
+
+    def crop(self, im0):
+        """
+        Pixels of the region and the origin (x, y) of the crop in the frame.
+        Rectangles are views of `im0`, polygons copies with the outside
+        filled with the letterbox grey.
+        """
+        h, w = im0.shape[:2]
+        x1, y1, x2, y2 = self.box(w, h)
+        crop = im0[y1:y2, x1:x2]
+        if not self.is_rect and crop.size:
+            mask = self._masks.get((h, w))
+            if mask is None:
+                mask = np.zeros(crop.shape[:2], dtype=np.uint8)
+                cv2.fillPoly(mask, [np.round(self.points - [x1, y1]).astype(np.int32)], 1)
+                self._masks[(h, w)] = mask = mask.astype(bool)
+            crop = np.where(mask[..., None], crop, np.uint8(114))
+        return crop, x1, y1
+
+    def contains(self, xy):
+        """
+        Whether the points `xy` (Nx2, frame pixels) lie inside the region.
+        """
+        if self._path is None:
+            return np.ones(len(xy), dtype=bool)
+        return self._path.contains_points(xy)
+
+
+def load_regions(path, sources):
+    """
+    Regions of every stream from a yaml file. Keys are sources as given to
+    `--source`, stream indices or `default`, values lists of regions:
+    .. code-block:: yaml
+        default:                 # streams without their own entry
+          - rect: [0, 80, 1280, 720]
+        cam1.mp4:
+          - polygon: [[100, 700], [600, 300], [900, 300], [1200, 700]]
+          - rect: [0, 0, 1920, 1080]
+            tile: true           # overlapping tiles of the detector input size
+            overlap: 0.2
+            full: true           # plus the whole crop scaled down
+    Args:
+        path (str): config file.
+        sources (list[str]): one source per stream.
+    Returns:
+        dict: stream index -> list[Region], streams without regions run on
+            the whole frame.
+    """
+    with open(path, 'r') as f:
+        cfg = yaml.load(f.read(), Loader=yaml.FullLoader) or {}
+    regions = {}
+    for k, source in enumerate(sources):
+        entries = cfg.get(source, cfg.get(k, cfg.get('default')))
+        if entries:
+            regions[k] = [Region.from_config(e) for e in entries]
+    return regions
+
+
+def tile_windows(width, height, size, overlap=0.2):
+    """
+    (x1, y1, x2, y2) tiles of at most `size` (h, w) covering a width x height
+    image, evenly spread so that neighbours overlap by `overlap` of the tile
+    size at least.
+    """
+    def starts(length, tile):
+        if length <= tile:
+            return [0]
+        step = max(int(tile * (1 - overlap)), 1)
+        n = int(np.ceil((length - tile) / step)) + 1
+        return np.linspace(0, length - tile, n).round().astype(int).tolist()
+
+    th, tw = size
+    return [(x, y, min(x + tw, width), min(y + th, height)) for y in starts(height, th) for x in starts(width, tw)]
+
+
+def _box_ios(box1, box2):
+    # intersection of every pair of xyxy boxes over the area of the box1 one, NxM
+    lt = torch.max(box1[:, None, :2], box2[:, :2])
+    rb = torch.min(box1[:, None, 2:], box2[:, 2:])
+    inter = (rb - lt).clamp(0).prod(2)
+    return inter / ((box1[:, 2:] - box1[:, :2]).prod(1)[:, None] + 1E-7)
+
+
+class RegionCropper(object):
+    """
+    Detector inputs cut out of the regions of interest of every frame, at
+    native resolution: crops are only padded to a stride multiple, crops
+    larger than the detector input are tiled or scaled down to fit it.
+    Tiles are padded to the detector input size, so that all the tiles of a
+    batch go through one forward pass. Inputs of the same shape are batched,
+    and the NMS outputs of all inputs of a frame are mapped back to frame
+    coordinates and merged, see :meth:`merge`.
+    Args:
+        regions (dict): stream index -> list[Region], see :func:`load_regions`.
+        img_size (tuple): (h, w) largest detector input, the tile size.
+        stride (int): model stride.
+        auto (bool): pad to a stride multiple, else to `img_size` (for
+            backends with a fixed input shape).
+        tile (bool): tile the whole frame of streams without regions.
+        overlap (float): overlap of those tiles.
+        full (bool): also detect on those frames scaled down.
+    """
+    def __init__(self, regions, img_size, stride=32, auto=True, tile=False, overlap=0.2, full=False):
+        self.regions = regions
+        self.img_size = tuple(img_size)
+        self.stride = stride
+        self.auto = auto
+        self._whole = [Region(tile=tile, overlap=overlap, full=full)]
+
+    def inputs(self, streams, im0s):
+        """
+        Args:
+            streams (list[int]): stream index of every frame.
+            im0s (list[array]): BGR frames.
+        Returns:
+            list[(list[array], list[Window])]: letterboxed uint8 BGR HWC
+                inputs of one shape, with the window of every input.
+        """
+        groups = {}
+        for i, (k, im0) in enumerate(zip(streams, im0s)):
+            for region in self.regions.get(k, self._whole):
+                crop, x0, y0 = region.crop(im0)
+                h, w = crop.shape[:2]
+                if not h or not w:
+                    continue
+                tiles = tile_windows(w, h, self.img_size, region.overlap) if region.tile else [(0, 0, w, h)]
+                if len(tiles) > 1 and region.full:
+                    tiles.append((0, 0, w, h))
+                for x1, y1, x2, y2 in tiles:
+                    img, (r, _), (dw, dh) = letterbox(crop[y1:y2, x1:x2], self.img_size, stride=self.stride,
+                                                      auto=self.auto and not region.tile, scaleup=False)
+                    imgs, windows = groups.setdefault(img.shape, ([], []))
+                    imgs.append(img)
+                    windows.append(Window(i, region, x0 + x1, y0 + y1, r, int(round(dw - 0.1)), int(round(dh - 0.1)),
+                                          x2 - x1, y2 - y1, (x1 > 0, y1 > 0, x2 < w, y2 < h)))
+        return list(groups.values())
+
+    @staticmethod
+    def merge(preds, windows, n, iou_thres=0.45, agnostic=False, max_det=1000, cover_thres=0.6):
+        """
+        NMS outputs of every input to detections of every frame. Inputs that
+        overlap see the same objects: the detections of a frame go through
+        NMS once more, as in `non_max_suppression` (per class unless
+        `agnostic`, at most `max_det`). An object cut by a tile border leaves
+        a partial box that may outscore the whole one, or overlap it too
+        little for NMS: boxes touching a border inside the region are dropped
+        first when `cover_thres` of their area lies in a box no border cuts.
+        Args:
+            preds (list[Tensor]): Nx6 (x1, y1, x2, y2, conf, cls) per input.
+            windows (list[Window]): window of every input, same order.
+            n (int): frames in the batch.
+        Returns:
+            list[Tensor]: Nx6 detections per frame, in frame coordinates.
+        """
+        device = preds[0].device if len(preds) else 'cpu'
+        dets, cuts, counts = [[] for _ in range(n)], [[] for _ in range(n)], [0] * n
+        for det, win in zip(preds, windows):
+            counts[win.image] += 1
+            if not len(det):
+                continue
+            det = det.clone()
+            det[:, [0, 2]] = ((det[:, [0, 2]] - win.left) / win.ratio).clamp_(0, win.width)
+            det[:, [1, 3]] = ((det[:, [1, 3]] - win.top) / win.ratio).clamp_(0, win.height)
+            cut = torch.zeros(len(det), dtype=torch.bool, device=det.device)
+            for j, (inner, limit) in enumerate(zip(win.cut, (0, 0, win.width, win.height))):
+                if inner:
+                    cut |= (det[:, j] - limit).abs() <= 1
+            det[:, [0, 2]] += win.x
+            det[:, [1, 3]] += win.y
+            det[:, :4] = det[:, :4].round()
+            if not win.region.is_rect:
+                inside = torch.from_numpy(win.region.contains(((det[:, :2] + det[:, 2:4]) / 2).cpu().numpy()))
+                det, cut = det[inside.to(det.device)], cut[inside.to(det.device)]
+            dets[win.image].append(det)
+            cuts[win.image].append(cut)
+        out = []
+        for det, cut, count in zip(dets, cuts, counts):
+            det = torch.cat(det) if det else torch.zeros((0, 6), device=device)
+            if count > 1 and len(det):  # overlapping tiles and regions see the same objects
+                cut = torch.cat(cut)
+                if cut.any() and not cut.all():  # before NMS, which may prefer a part to the whole object
+                    covered = _box_ios(det[cut, :4], det[~cut, :4]) > cover_thres
+                    if not agnostic:
+                        covered &= det[cut, 5:6] == det[~cut, 5]
+                    keep = ~cut
+                    keep[cut] = ~covered.any(1)
+                    det = det[keep]
+                keep = batched_nms(det[:, :4], det[:, 4], det[:, 5].long() * (not agnostic), iou_thres)
+                det = det[keep[:max_det]]
+            out.append(det)
+        return out
@@ -5,6 +5,7 @@ Author: Xuanying Chen
 Date: 2022-03-03 22:01:54
 LastEditTime: 2022-03-03 22:34:48
 '''
+import importlib
 from typing import Any, Dict, Iterable, Iterator, Tuple
 
 from tabulate import tabulate
@@ -27,6 +28,9 @@ class Registry(Iterable[Tuple[str, Any]]):
     Or:
     .. code-block:: python
         BACKBONE_REGISTRY.register(MyBackbone)
+    Or, to import the module defining it on the first `get` only:
+    .. code-block:: python
+        BACKBONE_REGISTRY.register_lazy('MyBackbone', 'package.backbones.my_backbone')
     """
 
     def __init__(self, name: str) -> None:
@@ -36,6 +40,7 @@ class Registry(Iterable[Tuple[str, Any]]):
         """
         self._name: str = name
         self._obj_map: Dict[str, Any] = {}
+        self._lazy_map: Dict[str, str] = {}
 
     def _do_register(self, name: str, obj: Any) -> None:
         assert (
@@ -44,6 +49,20 @@ class Registry(Iterable[Tuple[str, Any]]):
             name, self._name
         )
         self._obj_map[name] = obj
+        self._lazy_map.pop(name, None)
+
+    def register_lazy(self, name: str, module: str) -> None:
+        """
+        Register `name` as defined in `module`, which registers it when imported.
+        The module is imported on the first `get(name)`, so that selecting one
+        object does not pay for importing all of them.
+        """
+        assert (
+            name not in self._obj_map and name not in self._lazy_map
+        ), "An object named '{}' was already registered in '{}' registry!".format(
+            name, self._name
+        )
+        self._lazy_map[name] = module
 
     def register(self, obj: Any = None) -> Any:
         """
@@ -65,6 +84,9 @@ class Registry(Iterable[Tuple[str, Any]]):
 
     def get(self, name: str) -> Any:
         ret = self._obj_map.get(name)
+        if ret is None and name in self._lazy_map:
+            importlib.import_module(self._lazy_map[name])
+            ret = self._obj_map.get(name)
         if ret is None:
             raise KeyError(
                 "No object named '{}' found in '{}' registry!".format(name, self._name)
@@ -72,16 +94,19 @@ class Registry(Iterable[Tuple[str, Any]]):
         return ret
 
     def __contains__(self, name: str) -> bool:
-        return name in self._obj_map
+        return name in self._obj_map or name in self._lazy_map
 
     def __repr__(self) -> str:
         table_headers = ["Names", "Objects"]
         table = tabulate(
-            self._obj_map.items(), headers=table_headers, tablefmt="fancy_grid"
+            list(self._obj_map.items()) + [(k, "<lazy: {}>".format(v)) for k, v in self._lazy_map.items()],
+            headers=table_headers, tablefmt="fancy_grid"
         )
         return "Registry of {}:\n".format(self._name) + table
 
     def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        for name in list(self._lazy_map):  # iterating needs the objects, import them all
+            self.get(name)
         return iter(self._obj_map.items())
 
     # pyre-fixme[4]: Attribute must be annotated.
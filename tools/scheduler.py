@@ -0,0 +1,119 @@
+'''
+Description: Detector scheduling, the trackers extrapolate the frames the detector skips
+Version:
+Author:
+Date: 2026-10-18 21:37:52
+LastEditTime: 2026-10-18 21:37:52
+'''
+import threading
+
+import numpy as np
+
+__all__ = ["DetectionScheduler"]
+
+
+class DetectionScheduler(object):
+    """
+    Decides which frames go through the detector. The frames in between are
+    predict-only steps: the trackers extrapolate their tracks with the Kalman
+    filter (`Tracker.predict`) and the boxes are flagged as predicted.
+    A fixed schedule detects every `interval` frames. An adaptive one detects
+    as rarely as the tracks allow, up to every `interval` frames: the fastest
+    track may move `max_shift` of its height between two detections, and a
+    new track id (something entered the scene) brings it back to every frame
+    until the next detection.
+    In a pipeline frames are scheduled when they are pre-processed, a queue
+    of batches ahead of the tracker updates that adapt the interval. Frames
+    skipped before a new track was seen are caught by :meth:`overdue`.
+    Args:
+        interval (int): frames per detection, the upper bound when adaptive.
+        adaptive (bool): adapt the interval to track speed and new tracks.
+        max_shift (float): motion allowed between two detections, in box heights.
+    """
+    def __init__(self, interval=1, adaptive=False, max_shift=0.1):
+        assert interval >= 1, 'interval must be at least 1'
+        self.interval = interval
+        self.adaptive = adaptive
+        self.max_shift = max_shift
+        self.detected = 0
+        self.skipped = 0
+        self._since = None   # frames since the last detection
+        self._last = {}      # stream -> (frame, {track_id: (cx, cy, h)}) at its last detection
+        self._max_id = {}    # stream -> highest track id seen, ids only grow
+        self._intervals = {}  # stream -> interval its tracks allow
+        self._lock = threading.Lock()
+
+    @property
+    def current(self):
+        """
+        Frames per detection right now.
+        """
+        if not self.adaptive:
+            return self.interval
+        return min(self._intervals.values(), default=1)
+
+    def step(self):
+        """
+        Whether the next frame (or batch of frames) runs the detector. Call
+        once per frame, in order.
+        """
+        with self._lock:
+            if self._since is not None:
+                self._since += 1
+            detect = self._since is None or self._since >= self.current
+            if detect:
+                self._since = 0
+                self.detected += 1
+            else:
+                self.skipped += 1
+            return detect
+
+    def overdue(self, streams, frames):
+        """
+        Whether frames that :meth:`step` skipped must be detected after all,
+        because the interval has dropped since they were scheduled. Counts
+        them as detected when so.
+        Args:
+            streams (list[int]): stream indices of the batch.
+            frames (list[int]): their frame numbers.
+        """
+        if not self.adaptive:
+            return False
+        with self._lock:
+            current = self.current
+            late = any(k in self._last and frame - self._last[k][0] >= current for k, frame in zip(streams, frames))
+            if late:
+                self.skipped -= 1
+                self.detected += 1
+            return late
+
+    def observe(self, stream, frame, outputs):
+        """
+        Tracks of `stream` after the tracker update of detected frame `frame`,
+        adapts the interval.
+        Args:
+            stream (int): stream index.
+            frame (int): frame number of the stream.
+            outputs (array): Nx5 (x1, y1, x2, y2, track_id) as returned by the tracker.
+        """
+        if not self.adaptive:
+            return
+        out = np.asarray(outputs, dtype=np.float64).reshape(-1, 5)
+        tracks = {int(t): ((x1 + x2) / 2, (y1 + y2) / 2, max(y2 - y1, 1.0)) for x1, y1, x2, y2, t in out}
+        with self._lock:
+            prev = self._last.get(stream)
+            self._last[stream] = (frame, tracks)
+            max_id = self._max_id.get(stream, -1)
+            self._max_id[stream] = max(max_id, max(tracks, default=-1))
+            if prev is None or self._max_id[stream] > max_id:
+                self._intervals[stream] = 1
+                return
+            # tracks lost and found again in between have no previous position
+            frames, prev_tracks = max(frame - prev[0], 1), prev[1]
+            speed = max((np.hypot(cx - prev_tracks[t][0], cy - prev_tracks[t][1]) / h
+                         for t, (cx, cy, h) in tracks.items() if t in prev_tracks), default=0.0) / frames
+            self._intervals[stream] = int(np.clip(self.max_shift / max(speed, 1E-6), 1, self.interval))
+
+    def summary(self):
+        total = max(self.detected + self.skipped, 1)
+        return f'Detector ran on {self.detected}/{total} frames ({self.skipped / total * 1E2:.1f}% predicted)'
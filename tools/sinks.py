@@ -0,0 +1,256 @@
+'''
+Description: Buffered result sinks (MOT/KITTI txt, JSON, Parquet, NPZ)
+Version:
+Author:
+Date: 2026-10-18 14:20:37
+LastEditTime: 2026-10-18 14:20:37
+'''
+import threading
+
+import numpy as np
+
+from tools.registry import Registry
+from tracker.deep_sort.utils.io import format_results
+from tracker.deep_sort.utils.json_logger import BboxToJsonLogger
+
+__all__ = ["SINK_REGISTRY", "ResultSink", "TxtSink", "JsonSink", "ParquetSink", "NpzSink",
+           "SinkFlusher", "build_sinks"]
+
+SINK_REGISTRY = Registry("SINK")
+SINK_REGISTRY.__doc__ = """
+Registry for result sinks, which store tracking results of one stream.
+The registered object must be a callable that accepts two arguments:
+the output path without extension and the class names (or None).
+Registered object must return instance of :class:`ResultSink`.
+"""
+
+
+class ResultSink(object):
+    """
+    Keeps the results of one stream in memory and writes them out in one go
+    on :meth:`flush`, so file I/O scales with the number of flushes instead
+    of the number of boxes. `add` may be called while another thread
+    flushes.
+    Args:
+        path (str): output file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._buffer = []
+        self._lock = threading.Lock()     # guards the buffer
+        self._io_lock = threading.Lock()  # keeps writes in order
+
+    def add(self, frame_id, tlwhs, track_ids, scores=None, classes=None, predicted=None):
+        """
+        Args:
+            frame_id (int): 1-based frame number.
+            tlwhs (array): Nx4 boxes (top left x, top left y, width, height).
+            track_ids (array): N track ids.
+            scores (array): N confidences, optional.
+            classes (array): N class ids, optional.
+            predicted (array): N flags of boxes extrapolated without a
+                detection, optional.
+        """
+        n = len(track_ids)
+        scores = np.full(n, -1.0) if scores is None else scores
+        classes = np.full(n, -1) if classes is None else classes
+        predicted = np.zeros(n, dtype=bool) if predicted is None else predicted
+        with self._lock:
+            self._buffer.append((frame_id, tlwhs, track_ids, scores, classes, predicted))
+
+    def flush(self):
+        with self._io_lock:
+            with self._lock:
+                results, self._buffer = self._buffer, []
+            if results:
+                self._write(results)
+
+    def close(self):
+        self.flush()
+
+    def _write(self, results):
+        raise NotImplementedError
+
+    @staticmethod
+    def _columns(results):
+        # (frame_id, tlwhs, track_ids, scores, classes, predicted) tuples to flat columns
+        results = results or [(0, np.zeros((0, 4)), [], [], [], [])]  # empty columns of the same dtypes
+        counts = [len(r[2]) for r in results]
+        tlwhs = np.concatenate([np.asarray(r[1], dtype=np.float32).reshape(-1, 4) for r in results])
+        return dict(
+            frame=np.repeat(np.asarray([r[0] for r in results], dtype=np.int32), counts),
+            id=np.concatenate([np.asarray(r[2], dtype=np.int64).reshape(-1) for r in results]),
+            x=tlwhs[:, 0], y=tlwhs[:, 1], w=tlwhs[:, 2], h=tlwhs[:, 3],
+            score=np.concatenate([np.asarray(r[3], dtype=np.float32).reshape(-1) for r in results]),
+            cls=np.concatenate([np.asarray(r[4], dtype=np.int32).reshape(-1) for r in results]),
+            predicted=np.concatenate([np.asarray(r[5], dtype=bool).reshape(-1) for r in results]))
+
+
+class TxtSink(ResultSink):
+    """
+    MOT or KITTI text results, appended on every flush.
+    Args:
+        path (str): output file, truncated on creation.
+        data_type (str): 'mot' or 'kitti', see `tracker.deep_sort.utils.io`.
+    """
+    def __init__(self, path, data_type='mot'):
+        super().__init__(path)
+        self.data_type = data_type
+        format_results([], data_type)  # raise early on unknown formats
+        open(path, 'w').close()
+
+    def _write(self, results):
+        text = format_results([r[:3] for r in results], self.data_type)
+        with open(self.path, 'a') as f:
+            f.write(text)
+
+
+class JsonSink(ResultSink):
+    """
+    JSON results through :class:`BboxToJsonLogger`. JSON can not be appended
+    to, flushes only move the results into the logger and the file is
+    written once on :meth:`close`.
+    Args:
+        path (str): output file.
+        names (list[str]): class names for the labels, optional.
+    """
+    def __init__(self, path, names=None):
+        super().__init__(path)
+        self.names = names
+        self.logger = BboxToJsonLogger()
+
+    def _write(self, results):
+        for frame_id, tlwhs, track_ids, scores, classes, _ in results:
+            if not self.logger.frame_exists(frame_id):
+                self.logger.add_frame(frame_id)
+            for (x, y, w, h), track_id, score, cls in zip(tlwhs, track_ids, scores, classes):
+                track_id = int(track_id)
+                if self.logger.bbox_exists(frame_id, track_id):
+                    continue
+                self.logger.add_bbox_to_frame(frame_id, track_id, top=int(y), left=int(x), width=int(w), height=int(h))
+                category = self.names[int(cls)] if self.names is not None and cls >= 0 else str(int(cls))
+                self.logger.add_label_to_bbox(frame_id, track_id, category, float(score))
+
+    def close(self):
+        super().close()
+        with self._io_lock:
+            self.logger.json_output(self.path)
+
+
+class ParquetSink(ResultSink):
+    """
+    Columnar results, one Parquet row group per flush. Needs pyarrow.
+    Args:
+        path (str): output file.
+    """
+    def __init__(self, path):
+        super().__init__(path)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("--save-format parquet needs pyarrow, run `pip install pyarrow`") from e
+        self._pa = pyarrow
+        self._writer = None
+
+    def _write(self, results):
+        table = self._pa.table(self._columns(results))
+        if self._writer is None:
+            self._writer = self._pa.parquet.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        super().close()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class NpzSink(ResultSink):
+    """
+    Columnar results in a numpy .npz archive. The archive can not be appended
+    to, flushes keep the columns in memory and the archive is written once
+    on :meth:`close`.
+    Args:
+        path (str): output file.
+    """
+    def __init__(self, path):
+        super().__init__(path)
+        self._chunks = []
+
+    def _write(self, results):
+        self._chunks.append(self._columns(results))
+
+    def close(self):
+        super().close()
+        with self._io_lock:
+            chunks = self._chunks or [self._columns([])]  # no tracks, still an archive
+            columns = {k: np.concatenate([c[k] for c in chunks]) for k in chunks[0]}
+            self._chunks = [columns]
+            np.savez(self.path, **columns)
+
+
+@SINK_REGISTRY.register()
+def mot(path, names=None):
+    return TxtSink(path + '.txt', 'mot')
+
+
+@SINK_REGISTRY.register()
+def kitti(path, names=None):
+    return TxtSink(path + '_kitti.txt', 'kitti')
+
+
+@SINK_REGISTRY.register()
+def json(path, names=None):
+    return JsonSink(path + '.json', names)
+
+
+@SINK_REGISTRY.register()
+def parquet(path, names=None):
+    return ParquetSink(path + '.parquet')
+
+
+@SINK_REGISTRY.register()
+def npz(path, names=None):
+    return NpzSink(path + '.npz')
+
+
+def build_sinks(formats, path, names=None):
+    """
+    Args:
+        formats (list[str]): registered sink names, e.g. ['mot', 'json'].
+        path (str): output path without extension.
+        names (list[str]): class names, used by the JSON labels.
+    Returns:
+        list[ResultSink]
+    """
+    return [SINK_REGISTRY.get(f)(path, names) for f in formats]
+
+
+class SinkFlusher(object):
+    """
+    Flushes a set of sinks every `interval` seconds on a daemon thread. The
+    sinks stay owned by the caller, which closes them after :meth:`close`.
+    Args:
+        sinks (list[ResultSink]): sinks to flush.
+        interval (float): seconds between two flushes.
+    """
+    def __init__(self, sinks, interval=1.0):
+        self.sinks = list(sinks)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        if self.sinks:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for sink in self.sinks:
+                sink.flush()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,111 @@
+'''
+Description: Per-stream state for multi-camera inference
+Version:
+Author:
+Date: 2026-10-18 13:05:11
+LastEditTime: 2026-10-18 13:05:11
+'''
+from pathlib import Path
+
+import cv2
+
+__all__ = ["StreamState", "stream_count", "stream_names", "video_info"]
+
+
+def stream_names(sources):
+    """
+    Output file stems for `sources`, made unique by prefixing the stream index
+    when several streams are given.
+    Args:
+        sources (list[str]): source paths, urls or topics.
+    Returns:
+        list[str]
+    """
+    names = [s.rstrip('/').split('/')[-1].split('.')[0] or 'stream' for s in sources]
+    if len(names) > 1:
+        names = [f'{i}_{n}' for i, n in enumerate(names)]
+    return names
+
+
+def stream_count(sources):
+    """
+    Frames per batch the dataloader of `sources` yields: one per source, one
+    per line of a single stream list (.txt) file.
+    """
+    if len(sources) == 1 and sources[0].endswith('.txt') and Path(sources[0]).is_file():
+        return len([x for x in Path(sources[0]).read_text().splitlines() if x.strip()])
+    return len(sources)
+
+
+def video_info(vid_cap):
+    """
+    (fps, width, height) of an opened cv2.VideoCapture, None for streams.
+    Read while decoding: the loader may release the capture before the frame
+    reaches the writer.
+    """
+    if not vid_cap:
+        return None
+    return (vid_cap.get(cv2.CAP_PROP_FPS),
+            int(vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+
+class StreamState(object):
+    """
+    Everything one input stream owns when several streams share a detector:
+    its tracker, its result writers and its entrance counters.
+    Args:
+        tracker (Tracker): tracker instance used for this stream only.
+        save_dir (Path): folder receiving the stream's video and txt results.
+        name (str): stem of the results files.
+    """
+    def __init__(self, tracker, save_dir, name):
+        self.tracker = tracker
+        self.save_dir = Path(save_dir)
+        self.save_dir.mkdir(parents=True, exist_ok=True)
+        self.results_path = str(self.save_dir / name)  # sinks add their extension
+        self.sinks = []
+        self.vid_path, self.vid_writer = None, None
+        self.seen = 0
+        self.reset_counting()
+
+    def reset_counting(self):
+        self.in_id_list = list()
+        self.out_id_list = list()
+        self.in_flag = dict()
+        self.out_flag = dict()
+        self.prev_center = dict()
+        self.count_str = ""
+
+    def write_results(self, frame_id, tlwhs, track_ids, scores=None, classes=None, predicted=None):
+        """
+        Hand the tracks of one frame to every result sink of the stream.
+        """
+        for sink in self.sinks:
+            sink.add(frame_id, tlwhs, track_ids, scores, classes, predicted)
+
+    def write_video(self, save_path, im0, vid_info=None):
+        """
+        Append `im0` to the video at `save_path`, starting a new file whenever
+        the path changes (e.g. next video of a folder source).
+        Args:
+            vid_info (tuple): (fps, width, height) from :func:`video_info`,
+                None for streams.
+        """
+        if self.vid_path != save_path:  # new video
+            self.vid_path = save_path
+            if isinstance(self.vid_writer, cv2.VideoWriter):
+                self.vid_writer.release()  # release previous video writer
+            if vid_info:  # video
+                fps, w, h = vid_info
+            else:  # stream
+                fps, w, h = 30, im0.shape[1], im0.shape[0]
+                save_path += '.mp4'
+            self.vid_writer = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+        self.vid_writer.write(im0)
+
+    def release(self):
+        if isinstance(self.vid_writer, cv2.VideoWriter):
+            self.vid_writer.release()
+        for sink in self.sinks:
+            sink.close()
@@ -0,0 +1,254 @@
+'''
+Description: Hyperparameter sweeps over tracker arguments and DEEPSORT yaml keys
+Version:
+Author:
+Date: 2026-10-18 19:48:26
+LastEditTime: 2026-10-18 19:48:26
+'''
+import copy
+import csv
+import hashlib
+import itertools
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from tools.benchmark import MotSequence, replay
+
+__all__ = ["SearchSpace", "Leaderboard", "trial_context", "trial_id", "write_deepsort_config", "evaluate_trial"]
+
+# options of sweep.py itself, they do not change what a trial computes
+SWEEP_ARGS = ('space', 'search', 'trials', 'seed', 'mot_root', 'seqs', 'workers', 'leaderboard', 'rank', 'top')
+
+
+class SearchSpace(object):
+    """
+    Parameters to sweep, usually read from a yaml file:
+    .. code-block:: yaml
+        track_thresh: [0.4, 0.5, 0.6]        # grid values, random choices
+        match_thresh: {low: 0.6, high: 0.9}  # random search only, uniform
+        mot20: false                         # fixed
+        DEEPSORT:
+          MAX_DIST: [0.1, 0.2, 0.3]
+          NN_BUDGET: {low: 50, high: 150}    # int bounds sample ints
+    Keys under DEEPSORT override the deep_sort yaml (`--config_deepsort`),
+    every other key is a tracker argument, e.g. `track_buffer` or `tracker`.
+    Args:
+        space (dict): parsed yaml as above.
+    """
+    def __init__(self, space):
+        self.params = {}  # flat name -> list of values or {low, high}
+        for k, v in space.items():
+            if k == 'DEEPSORT':
+                for key, values in v.items():
+                    self.params[f'DEEPSORT.{key}'] = values
+            else:
+                self.params[k] = v
+        for k, v in self.params.items():
+            if isinstance(v, dict):
+                assert set(v) == {'low', 'high'}, f'{k}: ranges are given as {{low: .., high: ..}}'
+            elif not isinstance(v, list):
+                self.params[k] = [v]
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r') as f:
+            return cls(yaml.load(f.read(), Loader=yaml.FullLoader))
+
+    def grid(self):
+        """
+        Every combination of the listed values.
+        """
+        ranges = [k for k, v in self.params.items() if isinstance(v, dict)]
+        if ranges:
+            raise ValueError(f'grid search needs value lists, {ranges} are ranges')
+        keys = list(self.params)
+        return [dict(zip(keys, values)) for values in itertools.product(*(self.params[k] for k in keys))]
+
+    def random(self, n, seed=0):
+        """
+        `n` configurations, lists are sampled uniformly, ranges uniformly
+        between their bounds. The same seed gives the same configurations.
+        """
+        rng = np.random.RandomState(seed)
+        trials = []
+        for _ in range(n):
+            params = {}
+            for k, v in self.params.items():
+                if isinstance(v, dict):
+                    if isinstance(v['low'], int) and isinstance(v['high'], int):
+                        params[k] = int(rng.randint(v['low'], v['high'] + 1))
+                    else:
+                        params[k] = float(rng.uniform(v['low'], v['high']))
+                else:
+                    params[k] = v[rng.randint(len(v))]
+            trials.append(params)
+        return trials
+
+
+def trial_context(args, seqs):
+    """
+    Everything a trial runs with besides its parameters: the tracker, the
+    sequences and the fixed tracker arguments of the sweep.
+    Args:
+        args (Namespace): base tracker arguments.
+        seqs (list[str]): sequence names.
+    Returns:
+        dict: hashed into the trial id by :func:`trial_id`.
+    """
+    fixed = {k: v for k, v in vars(args).items() if k not in SWEEP_ARGS}
+    return dict(tracker=args.tracker, seqs=sorted(seqs), args=fixed)
+
+
+def trial_id(params, context=None):
+    """
+    Stable id of a configuration, used to skip finished trials on resume.
+    With a :func:`trial_context` the same parameters on another tracker,
+    other sequences or other fixed arguments get a different id, so a
+    changed sweep reruns its trials instead of resuming from stale rows.
+    """
+    key = dict(params=params, context=context or {})
+    return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()[:10]
+
+
+class Leaderboard(object):
+    """
+    One row per finished trial, written as soon as the trial ends so that an
+    interrupted sweep resumes where it stopped. `.csv` files are appended to,
+    `.parquet` files are rewritten (needs pyarrow).
+    Args:
+        path (str): leaderboard file, loaded when it exists.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.parquet = self.path.suffix == '.parquet'
+        self.rows = []
+        if self.path.is_file():
+            if self.parquet:
+                import pandas as pd
+                self.rows = pd.read_parquet(self.path).to_dict('records')
+            else:
+                with open(self.path, newline='') as f:
+                    self.rows = list(csv.DictReader(f))
+        self.done = {str(r['trial']) for r in self.rows}
+
+    def add(self, row):
+        self.rows.append(row)
+        self.done.add(str(row['trial']))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.parquet:
+            import pandas as pd
+            tmp = self.path.with_name(self.path.name + '.tmp')
+            pd.DataFrame(self.rows).to_parquet(tmp, index=False)
+            os.replace(tmp, self.path)  # a crash mid-write keeps the previous file
+            return
+        new = not self.path.is_file() or self.path.stat().st_size == 0
+        if not new:
+            with open(self.path, newline='') as f:
+                fieldnames = next(csv.reader(f))
+        else:
+            fieldnames = list(row)
+        with open(self.path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+            if new:
+                writer.writeheader()
+            writer.writerow(row)
+
+    def table(self, rank=None, top=None):
+        """
+        Rows as a DataFrame, best `rank` first.
+        """
+        import pandas as pd
+        df = pd.DataFrame(self.rows)
+        if rank is not None and len(df):
+            df[rank] = pd.to_numeric(df[rank], errors='coerce')
+            df = df.sort_values(rank, ascending=rank in ('num_switches', 'num_fragmentations'))
+        return df if top is None else df.head(top)
+
+
+def write_deepsort_config(base, overrides, path):
+    """
+    Copy of the deep_sort yaml `base` with DEEPSORT keys replaced.
+    Args:
+        overrides (dict): e.g. {'MAX_DIST': 0.3}.
+    Returns:
+        str: `path`.
+    """
+    with open(base, 'r') as f:
+        cfg = yaml.load(f.read(), Loader=yaml.FullLoader)
+    cfg.setdefault('DEEPSORT', {}).update(overrides)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        yaml.dump(cfg, f)
+    return str(path)
+
+
+def evaluate_trial(params, args, seqs, config_dir, context=None):
+    """
+    Track every sequence with `params` applied to `args` and score the
+    trial with :class:`Evaluator` over all sequences together.
+    Args:
+        params (dict): one configuration of a :class:`SearchSpace`.
+        args (Namespace): base tracker arguments.
+        seqs (list[Sequence]): sequences with ground truth.
+        config_dir (str): where the per-trial deep_sort yaml files go.
+        context (dict): :func:`trial_context` of the sweep, part of the trial id.
+    Returns:
+        dict: leaderboard row, trial id, parameters, overall metrics, FPS and
+            the ReID skip rate of appearance based trackers.
+    """
+    from tracker.deep_sort.utils.evaluation import Evaluator
+
+    tid = trial_id(params, context)
+    args = copy.copy(args)
+    overrides = {k.split('.', 1)[1]: v for k, v in params.items() if k.startswith('DEEPSORT.')}
+    if overrides:
+        args.config_deepsort = write_deepsort_config(args.config_deepsort, overrides,
+                                                     Path(config_dir) / f'{tid}.yaml')
+    for k, v in params.items():
+        if not k.startswith('DEEPSORT.'):
+            if not hasattr(args, k):
+                raise ValueError(f"'{k}' is neither a tracker argument nor under DEEPSORT")
+            setattr(args, k, v)
+
+    accs, names, frames, seconds, skips = [], [], 0, 0.0, []
+    t = time.time()
+    for seq in seqs:
+        run = replay(args.tracker, args, seq)
+        evaluator = Evaluator(seq.data_root, seq.name, 'mot')
+        for frame_id, tlwhs, ids in run['results']:
+            evaluator.eval_frame(frame_id, tlwhs, ids)
+        accs.append(evaluator.acc)
+        names.append(seq.name)
+        frames += len(run['latency'])
+        seconds += run['latency'].sum()
+        if run['reid_skip_rate'] is not None:
+            skips.append(run['reid_skip_rate'])
+    summary = Evaluator.get_summary(accs, names)
+    overall = summary.loc['OVERALL'] if len(names) > 1 else summary.iloc[0]
+
+    row = dict(trial=tid, tracker=args.tracker)
+    row.update(params)
+    row.update({k: float(v) for k, v in overall.items()})
+    row.update(fps=frames / max(seconds, 1E-9), wall_s=time.time() - t)
+    if skips:
+        row.update(reid_skip_rate=float(np.mean(skips)))
+    return row
+
+
+# worker side of a ProcessPoolExecutor: sequences are loaded once per process
+
+_seqs = []
+
+
+def init_worker(seq_dirs, min_score=None):
+    global _seqs
+    _seqs = [MotSequence(d, min_score=min_score) for d in seq_dirs]
+
+
+def run_trial(params, args, config_dir, context=None):
+    return evaluate_trial(params, args, _seqs, config_dir, context)
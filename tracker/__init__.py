@@ -5,6 +5,4 @@ Author: Xuanying Chen
 Date: 2022-03-04 15:13:52
 LastEditTime: 2022-03-04 17:57:21
 '''
-from .deep_sort.deep_sort import deepsort
-from .bytetracker.byte_tracker import bytetracker
-from .deep_bytetracker.deep_bytetracker import deep_bytetracker
\ No newline at end of file
+# the trackers register themselves when imported, which build.py does on first use
\ No newline at end of file
@@ -15,6 +15,10 @@ The registered object must be a callable that accepts one arguments:
 args
 Registered object must return instance of :class:`Tracker`.
 """
+# imported on first use, a run only pays for the tracker (and ReID backend) it selects
+TRACKER_REGISTRY.register_lazy("deepsort", "tracker.deep_sort.deep_sort")
+TRACKER_REGISTRY.register_lazy("bytetracker", "tracker.bytetracker.byte_tracker")
+TRACKER_REGISTRY.register_lazy("deep_bytetracker", "tracker.deep_bytetracker.deep_bytetracker")
 
 def build_tracker(args):
     tracker_name = args.tracker
@@ -1,10 +1,5 @@
 import numpy as np
-from collections import deque
-import os
-import os.path as osp
-import copy
 import torch
-import torch.nn.functional as F
 
 from .kalman_filter import KalmanFilter
 from . import matching
@@ -12,135 +7,191 @@ from .basetrack import BaseTrack, TrackState
 from ..build import TRACKER_REGISTRY
 from tracker.tracker import Tracker
 
-__all__ =["STrack","BYTETracker"]
+__all__ =["STrack","STrackTable","BYTETracker"]
+
+
+def tlwh_to_xyah(tlwh):
+    ret = np.asarray(tlwh, dtype=np.float64).copy()
+    ret[..., :2] += ret[..., 2:] / 2
+    ret[..., 2] /= ret[..., 3]
+    return ret
+
+
+class STrackTable(object):
+    """
+    Structure-of-arrays storage for the tracklets of one BYTETracker. Every
+    tracklet lives in one row of a set of preallocated columns, so prediction,
+    correction and state transitions are applied to many tracklets with a
+    single numpy call. The tracker only passes row indices around; STrack is
+    a lightweight view on one row.
+    """
+    def __init__(self, capacity=128):
+        self.track_id = np.zeros(capacity, dtype=np.int64)
+        self.state = np.full(capacity, TrackState.New, dtype=np.int8)
+        self.is_activated = np.zeros(capacity, dtype=bool)
+        self.score = np.zeros(capacity, dtype=np.float64)
+        self.mean = np.zeros((capacity, 8), dtype=np.float64)
+        self.covariance = np.zeros((capacity, 8, 8), dtype=np.float64)
+        self.frame_id = np.zeros(capacity, dtype=np.int64)
+        self.start_frame = np.zeros(capacity, dtype=np.int64)
+        self.tracklet_len = np.zeros(capacity, dtype=np.int64)
+        self._used = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return int(self._used.sum())
 
+    @property
+    def capacity(self):
+        return len(self._used)
+
+    def _grow(self, capacity):
+        for name in ('track_id', 'state', 'is_activated', 'score', 'mean',
+                     'covariance', 'frame_id', 'start_frame', 'tracklet_len', '_used'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def allocate(self, n):
+        """Reserve `n` free rows and return their indices."""
+        free = np.flatnonzero(~self._used)
+        if len(free) < n:
+            self._grow(max(2 * self.capacity, self.capacity + n))
+            free = np.flatnonzero(~self._used)
+        rows = free[:n]
+        self._used[rows] = True
+        return rows
+
+    def release(self, rows):
+        self._used[rows] = False
+
+    def rows(self):
+        return np.flatnonzero(self._used)
+
+    def tlwh(self, rows):
+        """Current boxes of `rows` in format `(top left x, top left y, width, height)`."""
+        ret = self.mean[rows, :4].copy()
+        ret[:, 2] *= ret[:, 3]
+        ret[:, :2] -= ret[:, 2:] / 2
+        return ret
 
-class STrack(BaseTrack):
-    shared_kalman = KalmanFilter()
-    def __init__(self, tlwh, score):
+    def tlbr(self, rows):
+        """Current boxes of `rows` in format `(min x, min y, max x, max y)`."""
+        ret = self.tlwh(rows)
+        ret[:, 2:] += ret[:, :2]
+        return ret
+
+    def activate(self, kalman_filter, tlwh, score, frame_id):
+        """Start one new tracklet per box of `tlwh` and return their rows."""
+        rows = self.allocate(len(tlwh))
+        for row, xyah in zip(rows, tlwh_to_xyah(tlwh)):
+            self.track_id[row] = BaseTrack.next_id()
+            self.mean[row], self.covariance[row] = kalman_filter.initiate(xyah)
+        self.tracklet_len[rows] = 0
+        self.state[rows] = TrackState.Tracked
+        self.is_activated[rows] = frame_id == 1
+        self.score[rows] = score
+        self.frame_id[rows] = frame_id
+        self.start_frame[rows] = frame_id
+        return rows
+
+    def multi_predict(self, kalman_filter, rows):
+        if len(rows) == 0:
+            return
+        mean = self.mean[rows]
+        mean[self.state[rows] != TrackState.Tracked, 7] = 0
+        self.mean[rows], self.covariance[rows] = kalman_filter.multi_predict(mean, self.covariance[rows])
+
+    def update(self, kalman_filter, rows, tlwh, score, frame_id):
+        """
+        Correct the matched tracklets `rows` with the boxes `tlwh`. Tracklets
+        that were Tracked continue, the others are re-activated.
+        Returns the boolean mask of the rows that were Tracked before.
+        """
+        was_tracked = self.state[rows] == TrackState.Tracked
+        if len(rows) == 0:
+            return was_tracked
+        self.mean[rows], self.covariance[rows] = kalman_filter.multi_update(
+            self.mean[rows], self.covariance[rows], tlwh_to_xyah(tlwh))
+        self.tracklet_len[rows] = np.where(was_tracked, self.tracklet_len[rows] + 1, 0)
+        self.state[rows] = TrackState.Tracked
+        self.is_activated[rows] = True
+        self.score[rows] = score
+        self.frame_id[rows] = frame_id
+        return was_tracked
 
-        # wait activate
-        self._tlwh = np.asarray(tlwh, dtype=np.float)
-        self.kalman_filter = None
-        self.mean, self.covariance = None, None
-        self.is_activated = False
 
-        self.score = score
-        self.tracklet_len = 0
+class STrack(BaseTrack):
+    """
+    View on one row of a :class:`STrackTable`. Attribute reads and writes go
+    straight to the table columns.
+    """
+    shared_kalman = KalmanFilter()
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def _column(name):
+        def fget(self):
+            return getattr(self._table, name)[self._row]
+        def fset(self, value):
+            getattr(self._table, name)[self._row] = value
+        return property(fget, fset)
+
+    track_id = _column('track_id')
+    state = _column('state')
+    is_activated = _column('is_activated')
+    score = _column('score')
+    mean = _column('mean')
+    covariance = _column('covariance')
+    frame_id = _column('frame_id')
+    start_frame = _column('start_frame')
+    tracklet_len = _column('tracklet_len')
+    del _column
 
     def predict(self):
-        mean_state = self.mean.copy()
-        if self.state != TrackState.Tracked:
-            mean_state[7] = 0
-        self.mean, self.covariance = self.kalman_filter.predict(mean_state, self.covariance)
+        self._table.multi_predict(self.shared_kalman, np.array([self._row]))
 
     @staticmethod
     def multi_predict(stracks):
         if len(stracks) > 0:
-            multi_mean = np.asarray([st.mean.copy() for st in stracks])
-            multi_covariance = np.asarray([st.covariance for st in stracks])
-            for i, st in enumerate(stracks):
-                if st.state != TrackState.Tracked:
-                    multi_mean[i][7] = 0
-            multi_mean, multi_covariance = STrack.shared_kalman.multi_predict(multi_mean, multi_covariance)
-            for i, (mean, cov) in enumerate(zip(multi_mean, multi_covariance)):
-                stracks[i].mean = mean
-                stracks[i].covariance = cov
-
-    def activate(self, kalman_filter, frame_id):
-        """Start a new tracklet"""
-        self.kalman_filter = kalman_filter
-        self.track_id = self.next_id()
-        self.mean, self.covariance = self.kalman_filter.initiate(self.tlwh_to_xyah(self._tlwh))
-
-        self.tracklet_len = 0
-        self.state = TrackState.Tracked
-        if frame_id == 1:
-            self.is_activated = True
-        # self.is_activated = True
-        self.frame_id = frame_id
-        self.start_frame = frame_id
-
-    def re_activate(self, new_track, frame_id, new_id=False):
-        self.mean, self.covariance = self.kalman_filter.update(
-            self.mean, self.covariance, self.tlwh_to_xyah(new_track.tlwh)
-        )
-        self.tracklet_len = 0
-        self.state = TrackState.Tracked
-        self.is_activated = True
-        self.frame_id = frame_id
-        if new_id:
-            self.track_id = self.next_id()
-        self.score = new_track.score
-
-    def update(self, new_track, frame_id):
-        """
-        Update a matched track
-        :type new_track: STrack
-        :type frame_id: int
-        :type update_feature: bool
-        :return:
-        """
-        self.frame_id = frame_id
-        self.tracklet_len += 1
-
-        new_tlwh = new_track.tlwh
-        self.mean, self.covariance = self.kalman_filter.update(
-            self.mean, self.covariance, self.tlwh_to_xyah(new_tlwh))
-        self.state = TrackState.Tracked
-        self.is_activated = True
-
-        self.score = new_track.score
+            table = stracks[0]._table
+            table.multi_predict(STrack.shared_kalman, np.array([st._row for st in stracks]))
 
     @property
-    # @jit(nopython=True)
     def tlwh(self):
         """Get current position in bounding box format `(top left x, top left y,
                 width, height)`.
         """
-        if self.mean is None:
-            return self._tlwh.copy()
-        ret = self.mean[:4].copy()
-        ret[2] *= ret[3]
-        ret[:2] -= ret[2:] / 2
-        return ret
+        return self._table.tlwh([self._row])[0]
 
     @property
-    # @jit(nopython=True)
     def tlbr(self):
         """Convert bounding box to format `(min x, min y, max x, max y)`, i.e.,
         `(top left, bottom right)`.
         """
-        ret = self.tlwh.copy()
-        ret[2:] += ret[:2]
-        return ret
+        return self._table.tlbr([self._row])[0]
 
     @staticmethod
-    # @jit(nopython=True)
     def tlwh_to_xyah(tlwh):
         """Convert bounding box to format `(center x, center y, aspect ratio,
         height)`, where the aspect ratio is `width / height`.
         """
-        ret = np.asarray(tlwh).copy()
-        ret[:2] += ret[2:] / 2
-        ret[2] /= ret[3]
-        return ret
+        return tlwh_to_xyah(tlwh)
 
     def to_xyah(self):
         return self.tlwh_to_xyah(self.tlwh)
 
     @staticmethod
-    # @jit(nopython=True)
     def tlbr_to_tlwh(tlbr):
         ret = np.asarray(tlbr).copy()
-        ret[2:] -= ret[:2]
+        ret[..., 2:] -= ret[..., :2]
         return ret
 
     @staticmethod
-    # @jit(nopython=True)
     def tlwh_to_tlbr(tlwh):
         ret = np.asarray(tlwh).copy()
-        ret[2:] += ret[:2]
+        ret[..., 2:] += ret[..., :2]
         return ret
 
     def __repr__(self):
@@ -149,9 +200,12 @@ class STrack(BaseTrack):
 
 class BYTETracker(Tracker):
     def __init__(self, args, frame_rate=30):
-        self.tracked_stracks = []  # type: list[STrack]
-        self.lost_stracks = []  # type: list[STrack]
-        self.removed_stracks = []  # type: list[STrack]
+        self.table = STrackTable()
+        # rows of self.table, in list order
+        self.tracked_rows = np.empty(0, dtype=np.int64)
+        self.lost_rows = np.empty(0, dtype=np.int64)
+        # ids of removed tracklets that may still sit in the lost list
+        self.removed_ids = np.empty(0, dtype=np.int64)
 
         self.frame_id = 0
         self.args = args
@@ -161,186 +215,170 @@ class BYTETracker(Tracker):
         self.max_time_lost = self.buffer_size
         self.kalman_filter = KalmanFilter()
 
-    def update(self, output_results, img_info, img_size):
+    @property
+    def tracked_stracks(self):
+        return [STrack(self.table, row) for row in self.tracked_rows]
+
+    @property
+    def lost_stracks(self):
+        return [STrack(self.table, row) for row in self.lost_rows]
+
+    def predict(self):
+        """Kalman-only step for a frame without detections, the tracks do not age"""
+        table = self.table
+        activated = table.is_activated[self.tracked_rows]
+        table.multi_predict(self.kalman_filter, joint_rows(self.tracked_rows[activated], self.lost_rows))
+        return self._outputs()
+
+    def hold(self):
+        """Step for a frame of a static scene: the tracklets seen last stay where they are, lost ones keep ageing"""
         self.frame_id += 1
-        activated_starcks = []
-        refind_stracks = []
-        lost_stracks = []
-        removed_stracks = []
+        table = self.table
+        table.frame_id[self.tracked_rows] = self.frame_id
+        rows = self.lost_rows[self.frame_id - table.frame_id[self.lost_rows] > self.max_time_lost]
+        table.state[rows] = TrackState.Removed
+        self.lost_rows = sub_rows(self.lost_rows, rows)
+        table.release(rows)
+        return self._outputs()
+
+    def _outputs(self):
+        table = self.table
+        output_rows = self.tracked_rows[table.is_activated[self.tracked_rows]]
+        return list(np.c_[table.tlbr(output_rows), table.track_id[output_rows]].astype(int))
 
+    def update(self, output_results, img_info, img_size):
+        self.frame_id += 1
+        table = self.table
+        activated_rows = []
+        refind_rows = []
+        lost_rows = []
+        removed_rows = []
+
+        if isinstance(output_results, torch.Tensor):
+            output_results = output_results.detach().cpu().numpy()
         if output_results.shape[1] == 5:
             scores = output_results[:, 4]
-            bboxes = output_results[:, :4]
         else:
-            output_results = output_results.cpu().numpy()
             scores = output_results[:, 4] * output_results[:, 5]
-            bboxes = output_results[:, :4]  # x1y1x2y2
         img_h, img_w = img_info[0], img_info[1]
         scale = min(img_size[0] / float(img_h), img_size[1] / float(img_w))
-        bboxes /= scale
+        bboxes = output_results[:, :4] / scale  # x1y1x2y2
 
         remain_inds = scores > self.args.track_thresh
         inds_low = scores > 0.1
         inds_high = scores < self.args.track_thresh
 
-        inds_second = np.logical_and(inds_low, inds_high).bool()
+        inds_second = np.logical_and(inds_low, inds_high)
         dets_second = bboxes[inds_second]
         dets = bboxes[remain_inds]
         scores_keep = scores[remain_inds]
         scores_second = scores[inds_second]
 
-        if len(dets) > 0:
-            '''Detections'''
-            detections = [STrack(STrack.tlbr_to_tlwh(tlbr), s) for
-                          (tlbr, s) in zip(dets, scores_keep)]
-        else:
-            detections = []
-
         ''' Add newly detected tracklets to tracked_stracks'''
-        unconfirmed = []
-        tracked_stracks = []  # type: list[STrack]
-        for track in self.tracked_stracks:
-            if not track.is_activated:
-                unconfirmed.append(track)
-            else:
-                tracked_stracks.append(track)
+        activated = table.is_activated[self.tracked_rows]
+        unconfirmed = self.tracked_rows[~activated]
+        tracked_rows = self.tracked_rows[activated]
 
         ''' Step 2: First association, with high score detection boxes'''
-        strack_pool = joint_stracks(tracked_stracks, self.lost_stracks)
+        strack_pool = joint_rows(tracked_rows, self.lost_rows)
         # Predict the current location with KF
-        STrack.multi_predict(strack_pool)
-        dists = matching.iou_distance(strack_pool, detections)
+        table.multi_predict(self.kalman_filter, strack_pool)
+        dists = matching.iou_distance(table.tlbr(strack_pool), dets)
         if not self.args.mot20:
-            dists = matching.fuse_score(dists, detections)
+            dists = matching.fuse_score(dists, scores_keep)
         matches, u_track, u_detection = matching.linear_assignment(dists, thresh=self.args.match_thresh)
-
-        for itracked, idet in matches:
-            track = strack_pool[itracked]
-            det = detections[idet]
-            if track.state == TrackState.Tracked:
-                track.update(detections[idet], self.frame_id)
-                activated_starcks.append(track)
-            else:
-                track.re_activate(det, self.frame_id, new_id=False)
-                refind_stracks.append(track)
+        self._update_matched(strack_pool, dets, scores_keep, matches, activated_rows, refind_rows)
 
         ''' Step 3: Second association, with low score detection boxes'''
         # association the untrack to the low score detections
-        if len(dets_second) > 0:
-            '''Detections'''
-            detections_second = [STrack(STrack.tlbr_to_tlwh(tlbr), s) for
-                          (tlbr, s) in zip(dets_second, scores_second)]
-        else:
-            detections_second = []
-        r_tracked_stracks = [strack_pool[i] for i in u_track if strack_pool[i].state == TrackState.Tracked]
-        dists = matching.iou_distance(r_tracked_stracks, detections_second)
+        r_tracked_rows = strack_pool[np.asarray(u_track, dtype=np.int64)]
+        r_tracked_rows = r_tracked_rows[table.state[r_tracked_rows] == TrackState.Tracked]
+        dists = matching.iou_distance(table.tlbr(r_tracked_rows), dets_second)
         matches, u_track, u_detection_second = matching.linear_assignment(dists, thresh=0.5)
-        for itracked, idet in matches:
-            track = r_tracked_stracks[itracked]
-            det = detections_second[idet]
-            if track.state == TrackState.Tracked:
-                track.update(det, self.frame_id)
-                activated_starcks.append(track)
-            else:
-                track.re_activate(det, self.frame_id, new_id=False)
-                refind_stracks.append(track)
-
-        for it in u_track:
-            track = r_tracked_stracks[it]
-            if not track.state == TrackState.Lost:
-                track.mark_lost()
-                lost_stracks.append(track)
+        self._update_matched(r_tracked_rows, dets_second, scores_second, matches, activated_rows, refind_rows)
+
+        rows = r_tracked_rows[np.asarray(u_track, dtype=np.int64)]
+        rows = rows[table.state[rows] != TrackState.Lost]
+        table.state[rows] = TrackState.Lost
+        lost_rows.append(rows)
 
         '''Deal with unconfirmed tracks, usually tracks with only one beginning frame'''
-        detections = [detections[i] for i in u_detection]
-        dists = matching.iou_distance(unconfirmed, detections)
+        u_detection = np.asarray(u_detection, dtype=np.int64)
+        dets, scores_keep = dets[u_detection], scores_keep[u_detection]
+        dists = matching.iou_distance(table.tlbr(unconfirmed), dets)
         if not self.args.mot20:
-            dists = matching.fuse_score(dists, detections)
+            dists = matching.fuse_score(dists, scores_keep)
         matches, u_unconfirmed, u_detection = matching.linear_assignment(dists, thresh=0.7)
-        for itracked, idet in matches:
-            unconfirmed[itracked].update(detections[idet], self.frame_id)
-            activated_starcks.append(unconfirmed[itracked])
-        for it in u_unconfirmed:
-            track = unconfirmed[it]
-            track.mark_removed()
-            removed_stracks.append(track)
+        # unconfirmed tracklets are Tracked, so every match lands in activated_rows
+        self._update_matched(unconfirmed, dets, scores_keep, matches, activated_rows, activated_rows)
+        rows = unconfirmed[np.asarray(u_unconfirmed, dtype=np.int64)]
+        table.state[rows] = TrackState.Removed
+        removed_rows.append(rows)
 
         """ Step 4: Init new stracks"""
-        for inew in u_detection:
-            track = detections[inew]
-            if track.score < self.det_thresh:
-                continue
-            track.activate(self.kalman_filter, self.frame_id)
-            activated_starcks.append(track)
+        u_detection = np.asarray(u_detection, dtype=np.int64)
+        u_detection = u_detection[scores_keep[u_detection] >= self.det_thresh]
+        activated_rows.append(table.activate(
+            self.kalman_filter, STrack.tlbr_to_tlwh(dets[u_detection]), scores_keep[u_detection], self.frame_id))
         """ Step 5: Update state"""
-        for track in self.lost_stracks:
-            if self.frame_id - track.end_frame > self.max_time_lost:
-                track.mark_removed()
-                removed_stracks.append(track)
-
-        # print('Ramained match {} s'.format(t4-t3))
-
-        self.tracked_stracks = [t for t in self.tracked_stracks if t.state == TrackState.Tracked]
-        self.tracked_stracks = joint_stracks(self.tracked_stracks, activated_starcks)
-        self.tracked_stracks = joint_stracks(self.tracked_stracks, refind_stracks)
-        self.lost_stracks = sub_stracks(self.lost_stracks, self.tracked_stracks)
-        self.lost_stracks.extend(lost_stracks)
-        self.lost_stracks = sub_stracks(self.lost_stracks, self.removed_stracks)
-        self.removed_stracks.extend(removed_stracks)
-        self.tracked_stracks, self.lost_stracks = remove_duplicate_stracks(self.tracked_stracks, self.lost_stracks)
-        # get scores of lost tracks
-        output_stracks = [track for track in self.tracked_stracks if track.is_activated]
-
-        outputs = []
-        for track in output_stracks:
-            x1,y1,x2,y2 = track.tlwh_to_tlbr(track.tlwh)
-            track_id = track.track_id
-            outputs.append(np.array([x1, y1, x2, y2, track_id], dtype=np.int))
-
-        return outputs
-
-
-def joint_stracks(tlista, tlistb):
-    exists = {}
-    res = []
-    for t in tlista:
-        exists[t.track_id] = 1
-        res.append(t)
-    for t in tlistb:
-        tid = t.track_id
-        if not exists.get(tid, 0):
-            exists[tid] = 1
-            res.append(t)
-    return res
-
-
-def sub_stracks(tlista, tlistb):
-    stracks = {}
-    for t in tlista:
-        stracks[t.track_id] = t
-    for t in tlistb:
-        tid = t.track_id
-        if stracks.get(tid, 0):
-            del stracks[tid]
-    return list(stracks.values())
-
-
-def remove_duplicate_stracks(stracksa, stracksb):
-    pdist = matching.iou_distance(stracksa, stracksb)
-    pairs = np.where(pdist < 0.15)
-    dupa, dupb = list(), list()
-    for p, q in zip(*pairs):
-        timep = stracksa[p].frame_id - stracksa[p].start_frame
-        timeq = stracksb[q].frame_id - stracksb[q].start_frame
-        if timep > timeq:
-            dupb.append(q)
-        else:
-            dupa.append(p)
-    resa = [t for i, t in enumerate(stracksa) if not i in dupa]
-    resb = [t for i, t in enumerate(stracksb) if not i in dupb]
-    return resa, resb
+        rows = self.lost_rows[self.frame_id - table.frame_id[self.lost_rows] > self.max_time_lost]
+        table.state[rows] = TrackState.Removed
+        removed_rows.append(rows)
+
+        tracked = self.tracked_rows[table.state[self.tracked_rows] == TrackState.Tracked]
+        tracked = joint_rows(tracked, np.concatenate(activated_rows))
+        tracked = joint_rows(tracked, np.concatenate(refind_rows))
+        lost = sub_rows(self.lost_rows, tracked)
+        lost = np.concatenate([lost] + lost_rows)
+        lost = sub_rows(lost, lost[np.isin(table.track_id[lost], self.removed_ids)])
+        self.tracked_rows, self.lost_rows = remove_duplicate_rows(table, tracked, lost)
+
+        # recycle rows no list refers to any more
+        alive = np.zeros(table.capacity, dtype=bool)
+        alive[self.tracked_rows] = True
+        alive[self.lost_rows] = True
+        table.release(table.rows()[~alive[table.rows()]])
+        removed_ids = np.concatenate([self.removed_ids] + [table.track_id[r] for r in removed_rows])
+        self.removed_ids = removed_ids[np.isin(removed_ids, table.track_id[np.flatnonzero(alive)])]
+
+        return self._outputs()
+
+    def _update_matched(self, rows, dets, scores, matches, activated_rows, refind_rows):
+        matches = np.asarray(matches, dtype=np.int64).reshape(-1, 2)
+        rows, idet = rows[matches[:, 0]], matches[:, 1]
+        was_tracked = self.table.update(self.kalman_filter, rows, STrack.tlbr_to_tlwh(dets[idet]),
+                                        scores[idet], self.frame_id)
+        activated_rows.append(rows[was_tracked])
+        refind_rows.append(rows[~was_tracked])
+
+
+def joint_rows(rowsa, rowsb):
+    rowsb = _unique(rowsb)
+    return np.concatenate([rowsa, rowsb[~np.isin(rowsb, rowsa)]]).astype(np.int64)
+
+
+def sub_rows(rowsa, rowsb):
+    rowsa = _unique(rowsa)
+    return rowsa[~np.isin(rowsa, rowsb)]
+
+
+def _unique(rows):
+    # drop repeated rows, keeping the first occurrence in place
+    return rows[np.sort(np.unique(rows, return_index=True)[1])]
+
+
+def remove_duplicate_rows(table, rowsa, rowsb):
+    pdist = matching.iou_distance(table.tlbr(rowsa), table.tlbr(rowsb))
+    p, q = np.where(pdist < 0.15)
+    timep = table.frame_id[rowsa[p]] - table.start_frame[rowsa[p]]
+    timeq = table.frame_id[rowsb[q]] - table.start_frame[rowsb[q]]
+    keep_a = np.ones(len(rowsa), dtype=bool)
+    keep_b = np.ones(len(rowsb), dtype=bool)
+    keep_b[q[timep > timeq]] = False
+    keep_a[p[timep <= timeq]] = False
+    return rowsa[keep_a], rowsb[keep_b]
 
 @TRACKER_REGISTRY.register()
 def bytetracker(args):
     tracker = BYTETracker(args)
-    return tracker
\ No newline at end of file
+    return tracker
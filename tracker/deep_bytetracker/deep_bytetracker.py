@@ -1,6 +1,5 @@
 import numpy as np
 from collections import deque
-import sys
 import os.path as osp
 import copy
 import torch
@@ -11,15 +10,14 @@ from . import matching
 from .basetrack import BaseTrack, TrackState
 from ..build import TRACKER_REGISTRY
 from tracker.tracker import Tracker
-
-sys.path.append('tracker/deep_sort/deep/reid')
-from torchreid.utils import FeatureExtractor
+from ..deep_sort.deep_sort import shared_extractor
 
 __all__ =["STrack","DeepBYTETracker"]
 
 
 class STrack(BaseTrack):
     shared_kalman = KalmanFilter()
+    feature_budget = 100  # recent embeddings kept per track
     def __init__(self, tlwh, score, feature):
 
         # wait activate
@@ -28,10 +26,17 @@ class STrack(BaseTrack):
         self.mean, self.covariance = None, None
         self.is_activated = False
         self.curr_feature = feature
+        self.features = deque(maxlen=self.feature_budget)
+        self.feature_frame = 0  # frame of the newest cached embedding
 
         self.score = score
         self.tracklet_len = 0
 
+    def update_features(self, feature, frame_id):
+        """Cache an embedding of this track seen at `frame_id`"""
+        self.features.append(feature)
+        self.feature_frame = frame_id
+
     def predict(self):
         mean_state = self.mean.copy()
         if self.state != TrackState.Tracked:
@@ -152,6 +157,7 @@ class STrack(BaseTrack):
 
 
 class DeepBYTETracker(Tracker):
+    feature_refresh = 30  # frames after which a matched track is embedded again
     def __init__(self, args, frame_rate=30):
         self.tracked_stracks = []  # type: list[STrack]
         self.lost_stracks = []  # type: list[STrack]
@@ -164,22 +170,77 @@ class DeepBYTETracker(Tracker):
         self.buffer_size = int(frame_rate / 30.0 * args.track_buffer)
         self.max_time_lost = self.buffer_size
         self.kalman_filter = KalmanFilter()
-        self.extractor = FeatureExtractor(
-            model_name=args.deep_sort_model,
-            device=str(args.device)
-        )
+        self.extractor = shared_extractor(args.deep_sort_model, args.device)
+        # boxes embedded vs boxes an eager tracker would embed
+        self.reid_computed = 0
+        self.reid_candidates = 0
 
     def get_features(self, bbox_xyxy, ori_img):
-        im_crops = []
-        for box in bbox_xyxy:
-            x1, y1, x2, y2 = box
-            im = ori_img[int(y1):int(y2), int(x1):int(x2)]
-            im_crops.append(im)
-        if im_crops:
-            features = self.extractor(im_crops)
-        else:
-            features = np.array([])
-        return features
+        if not len(bbox_xyxy):
+            return np.array([])
+        return self.extractor.extract_boxes(ori_img, np.trunc(np.asarray(bbox_xyxy, dtype=np.float32)))
+
+    @property
+    def reid_skip_rate(self):
+        return 1.0 - self.reid_computed / max(self.reid_candidates, 1)
+
+    def extract_features(self, stracks, ori_img):
+        """Embed the detections of `stracks` that have no embedding yet, in one batch"""
+        stracks = [t for t in stracks if t.curr_feature is None]
+        self.reid_computed += len(stracks)
+        features = self.get_features([t.tlbr for t in stracks], ori_img)
+        for t, f in zip(stracks, features):
+            t.curr_feature = f.cpu().numpy()
+
+    def ambiguous_pairs(self, iou_dists, tracks, lamb):
+        """
+        Track x detection pairs of the first association whose outcome depends
+        on appearance. Tracked tracks are candidates of the detections they
+        overlap, the other pairs get the largest appearance distance and so
+        never match. Lost tracks are candidates of every detection, so that
+        they can be re-identified by appearance alone. Embedding distances lie
+        in [0, 1] (cosine distance of non-negative features): a candidate above
+        match_thresh on IoU alone never matches, and a pair that is the only
+        candidate of both its track and its detection matches whatever the
+        appearance when it stays under the threshold at the largest appearance
+        distance. Tracks whose newest embedding is older than `feature_refresh`
+        frames are kept ambiguous so their cache follows appearance changes.
+        """
+        thresh = self.args.match_thresh
+        lost = np.array([t.state == TrackState.Lost for t in tracks], dtype=bool)
+        feasible = ((iou_dists < 1.0) | lost[:, None]) & (lamb * iou_dists <= thresh)
+        certain = lamb * iou_dists + (1.0 - lamb) <= thresh
+        single = (feasible.sum(1, keepdims=True) == 1) & (feasible.sum(0, keepdims=True) == 1)
+        fresh = np.array([self.frame_id - t.feature_frame <= self.feature_refresh for t in tracks], dtype=bool)
+        return feasible & ~(certain & single & fresh[:, None])
+
+    def predict(self):
+        """Kalman-only step for a frame without detections, the tracks do not age"""
+        tracked_stracks = [t for t in self.tracked_stracks if t.is_activated]
+        STrack.multi_predict(joint_stracks(tracked_stracks, self.lost_stracks))
+        return self._outputs()
+
+    def hold(self):
+        """Step for a frame of a static scene: the tracks seen last stay where they are, lost ones keep ageing"""
+        self.frame_id += 1
+        for track in self.tracked_stracks:
+            track.frame_id = self.frame_id
+        removed_stracks = [t for t in self.lost_stracks if self.frame_id - t.end_frame > self.max_time_lost]
+        for track in removed_stracks:
+            track.mark_removed()
+        self.lost_stracks = sub_stracks(self.lost_stracks, removed_stracks)
+        self.removed_stracks.extend(removed_stracks)
+        return self._outputs()
+
+    def _outputs(self):
+        outputs = []
+        for track in self.tracked_stracks:
+            if not track.is_activated:
+                continue
+            x1,y1,x2,y2 = track.tlwh_to_tlbr(track.tlwh)
+            track_id = track.track_id
+            outputs.append(np.array([x1, y1, x2, y2, track_id], dtype=np.int))
+        return outputs
 
     def update(self, output_results, img_info, img_size,img):
         self.frame_id += 1
@@ -209,14 +270,13 @@ class DeepBYTETracker(Tracker):
         scores_keep = scores[remain_inds]
         scores_second = scores[inds_second]
 
-        ## add reid features into matching 
-        features = self.get_features(dets,img)
-        features_second = self.get_features(dets_second,img)
+        # reid features are computed lazily, only for detections whose matching needs them
+        self.reid_candidates += len(dets) + len(dets_second)
 
         if len(dets) > 0:
             '''Detections'''
-            detections = [STrack(STrack.tlbr_to_tlwh(tlbr), s, f.cpu().numpy()) for
-                          (tlbr, s, f) in zip(dets, scores_keep, features)]
+            detections = [STrack(STrack.tlbr_to_tlwh(tlbr), s, None) for
+                          (tlbr, s) in zip(dets, scores_keep)]
         else:
             detections = []
 
@@ -237,8 +297,10 @@ class DeepBYTETracker(Tracker):
         iou_dists = matching.iou_distance(strack_pool, detections)
         if not self.args.mot20:
             iou_dists = matching.fuse_score(iou_dists, detections)
-        app_dists = matching.embedding_distance(strack_pool, detections)
         lamb = 0.7
+        ambiguous = self.ambiguous_pairs(iou_dists, strack_pool, lamb)
+        self.extract_features([detections[i] for i in np.unique(np.nonzero(ambiguous)[1])], img)
+        app_dists = matching.embedding_distance(strack_pool, detections, mask=ambiguous)
         dists = lamb*iou_dists + (1.0-lamb)*app_dists
         matches, u_track, u_detection = matching.linear_assignment(dists, thresh=self.args.match_thresh)
 
@@ -246,7 +308,8 @@ class DeepBYTETracker(Tracker):
             track = strack_pool[itracked]
             det = detections[idet]
             ## add new feature into matched tracks
-            track.features += det.curr_feature
+            if det.curr_feature is not None:
+                track.update_features(det.curr_feature, self.frame_id)
             if track.state == TrackState.Tracked:
                 track.update(detections[idet], self.frame_id)
                 activated_starcks.append(track)
@@ -258,8 +321,8 @@ class DeepBYTETracker(Tracker):
         # association the untrack to the low score detections
         if len(dets_second) > 0:
             '''Detections'''
-            detections_second = [STrack(STrack.tlbr_to_tlwh(tlbr), s, f.cpu().numpy()) for
-                          (tlbr, s, f) in zip(dets_second, scores_second,features_second)]
+            detections_second = [STrack(STrack.tlbr_to_tlwh(tlbr), s, None) for
+                          (tlbr, s) in zip(dets_second, scores_second)]
         else:
             detections_second = []
         r_tracked_stracks = [strack_pool[i] for i in u_track if strack_pool[i].state == TrackState.Tracked]
@@ -268,8 +331,6 @@ class DeepBYTETracker(Tracker):
         for itracked, idet in matches:
             track = r_tracked_stracks[itracked]
             det = detections_second[idet]
-            ## add new feature into matched tracks
-            track.features += det.curr_feature
             if track.state == TrackState.Tracked:
                 track.update(det, self.frame_id)
                 activated_starcks.append(track)
@@ -298,15 +359,12 @@ class DeepBYTETracker(Tracker):
             removed_stracks.append(track)
 
         """ Step 4: Init new stracks"""
-        for inew in u_detection:
-            track = detections[inew]
-            if track.score < self.det_thresh:
-                continue
+        new_stracks = [detections[inew] for inew in u_detection if detections[inew].score >= self.det_thresh]
+        self.extract_features(new_stracks, img)
+        for track in new_stracks:
             track.activate(self.kalman_filter, self.frame_id)
             ## add first feature
-            print(track.curr_feature.shape)
-            track.features.append(track.curr_feature)
-            print(len(track.features))
+            track.update_features(track.curr_feature, self.frame_id)
             activated_starcks.append(track)
         """ Step 5: Update state"""
         for track in self.lost_stracks:
@@ -324,16 +382,7 @@ class DeepBYTETracker(Tracker):
         self.lost_stracks = sub_stracks(self.lost_stracks, self.removed_stracks)
         self.removed_stracks.extend(removed_stracks)
         self.tracked_stracks, self.lost_stracks = remove_duplicate_stracks(self.tracked_stracks, self.lost_stracks)
-        # get scores of lost tracks
-        output_stracks = [track for track in self.tracked_stracks if track.is_activated]
-
-        outputs = []
-        for track in output_stracks:
-            x1,y1,x2,y2 = track.tlwh_to_tlbr(track.tlwh)
-            track_id = track.track_id
-            outputs.append(np.array([x1, y1, x2, y2, track_id], dtype=np.int))
-
-        return outputs
+        return self._outputs()
 
 
 def joint_stracks(tlista, tlistb):
@@ -191,6 +191,31 @@ class KalmanFilter(object):
 
         return mean, covariance
 
+    def multi_project(self, mean, covariance):
+        """Project state distributions to measurement space (Vectorized version).
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional mean matrix of the states.
+        covariance : ndarray
+            The Nx8x8 dimensional covariance matrices of the states.
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the Nx4 projected means and Nx4x4 projected covariance
+            matrices of the given state estimates.
+        """
+        std = np.stack([
+            self._std_weight_position * mean[:, 3],
+            self._std_weight_position * mean[:, 3],
+            1e-1 * np.ones_like(mean[:, 3]),
+            self._std_weight_position * mean[:, 3]], axis=1)
+        projected_mean = mean[:, :4]
+        projected_cov = covariance[:, :4, :4].copy()
+        diag = np.arange(4)
+        projected_cov[:, diag, diag] += np.square(std)
+        return projected_mean, projected_cov
+
     def update(self, mean, covariance, measurement):
         """Run Kalman filter correction step.
 
@@ -266,5 +291,43 @@ class KalmanFilter(object):
                 overwrite_b=True)
             squared_maha = np.sum(z * z, axis=0)
             return squared_maha
+        else:
+            raise ValueError('invalid distance metric')
+
+    def gating_distance_batch(self, mean, covariance, measurements,
+                              only_position=False, metric='maha'):
+        """Compute gating distances between many state distributions and
+        measurements at once.
+        Parameters
+        ----------
+        mean : ndarray
+            Nx8 matrix of state means.
+        covariance : ndarray
+            Nx8x8 array of state covariances.
+        measurements : ndarray
+            An Mx4 dimensional matrix of M measurements in format (x, y, a, h).
+        only_position : Optional[bool]
+            If True, distance computation is done with respect to the bounding
+            box center position only.
+        Returns
+        -------
+        ndarray
+            Returns an NxM matrix, where element (i, j) contains the squared
+            distance between state i and `measurements[j]`.
+        """
+        mean, covariance = self.multi_project(mean, covariance)
+        measurements = np.asarray(measurements).reshape(-1, 4)
+        if only_position:
+            mean, covariance = mean[:, :2], covariance[:, :2, :2]
+            measurements = measurements[:, :2]
+
+        d = measurements[None, :, :] - mean[:, None, :]
+        if metric == 'gaussian':
+            return np.sum(d * d, axis=2)
+        elif metric == 'maha':
+            cholesky_factor = np.linalg.cholesky(covariance)
+            z = np.linalg.solve(cholesky_factor, d.transpose(0, 2, 1))
+            squared_maha = np.sum(z * z, axis=1)
+            return squared_maha
         else:
             raise ValueError('invalid distance metric')
\ No newline at end of file
@@ -110,21 +110,28 @@ def v_iou_distance(atracks, btracks):
 
     return cost_matrix
 
-def embedding_distance(tracks, detections, metric='cosine'):
+def embedding_distance(tracks, detections, metric='cosine', mask=None):
     """
     :param tracks: list[STrack]
     :param detections: list[BaseTrack]
     :param metric:
+    :param mask: bool matrix of the pairs to compute, the others (and tracks
+                 without features) get the largest distance 1, default all
     :return: cost_matrix np.ndarray
     """
 
-    cost_matrix = np.zeros((len(tracks), len(detections)), dtype=np.float)
+    cost_matrix = np.ones((len(tracks), len(detections)), dtype=np.float)
     if cost_matrix.size == 0:
         return cost_matrix
-    det_features = np.asarray([track.curr_feature for track in detections], dtype=np.float)
+    if mask is None:
+        mask = np.ones(cost_matrix.shape, dtype=bool)
     for i, track in enumerate(tracks):
+        cols = np.nonzero(mask[i])[0]
+        if not len(cols) or not len(track.features):
+            continue
         track_features = np.asarray(track.features,dtype=np.float)
-        cost_matrix[i, :] = np.maximum(0.0, cdist(track_features, det_features, metric).min(axis=0))
+        det_features = np.asarray([detections[j].curr_feature for j in cols], dtype=np.float)
+        cost_matrix[i, cols] = np.maximum(0.0, cdist(track_features, det_features, metric).min(axis=0))
         # cost_matrix[i, :] = np.maximum(0.0, cdist(track.features.reshape(1,-1), det_features, metric))
     # track_features = np.asarray([track.features for track in tracks], dtype=np.float)
     # cost_matrix = np.maximum(0.0, cdist(track_features, det_features, metric))  # Nomalized features
@@ -137,10 +144,11 @@ def gate_cost_matrix(kf, cost_matrix, tracks, detections, only_position=False):
     gating_dim = 2 if only_position else 4
     gating_threshold = kalman_filter.chi2inv95[gating_dim]
     measurements = np.asarray([det.to_xyah() for det in detections])
-    for row, track in enumerate(tracks):
-        gating_distance = kf.gating_distance(
-            track.mean, track.covariance, measurements, only_position)
-        cost_matrix[row, gating_distance > gating_threshold] = np.inf
+    gating_distance = kf.gating_distance_batch(
+        np.asarray([track.mean for track in tracks]),
+        np.asarray([track.covariance for track in tracks]),
+        measurements, only_position)
+    cost_matrix[gating_distance > gating_threshold] = np.inf
     return cost_matrix
 
 
@@ -150,11 +158,12 @@ def fuse_motion(kf, cost_matrix, tracks, detections, only_position=False, lambda
     gating_dim = 2 if only_position else 4
     gating_threshold = kalman_filter.chi2inv95[gating_dim]
     measurements = np.asarray([det.to_xyah() for det in detections])
-    for row, track in enumerate(tracks):
-        gating_distance = kf.gating_distance(
-            track.mean, track.covariance, measurements, only_position, metric='maha')
-        cost_matrix[row, gating_distance > gating_threshold] = np.inf
-        cost_matrix[row] = lambda_ * cost_matrix[row] + (1 - lambda_) * gating_distance
+    gating_distance = kf.gating_distance_batch(
+        np.asarray([track.mean for track in tracks]),
+        np.asarray([track.covariance for track in tracks]),
+        measurements, only_position, metric='maha')
+    cost_matrix[gating_distance > gating_threshold] = np.inf
+    cost_matrix = lambda_ * cost_matrix + (1 - lambda_) * gating_distance
     return cost_matrix
 
 
@@ -1,80 +1,60 @@
 from __future__ import absolute_import
-import torch
-
-from .pcb import *
-from .mlfn import *
-from .hacnn import *
-from .osnet import *
-from .senet import *
-from .mudeep import *
-from .nasnet import *
-from .resnet import *
-from .densenet import *
-from .xception import *
-from .osnet_ain import *
-from .resnetmid import *
-from .shufflenet import *
-from .squeezenet import *
-from .inceptionv4 import *
-from .mobilenetv2 import *
-from .resnet_ibn_a import *
-from .resnet_ibn_b import *
-from .shufflenetv2 import *
-from .inceptionresnetv2 import *
+import importlib
 
+# model name -> (module, function), the module is imported when the model is built
 __model_factory = {
     # image classification models
-    'resnet18': resnet18,
-    'resnet34': resnet34,
-    'resnet50': resnet50,
-    'resnet101': resnet101,
-    'resnet152': resnet152,
-    'resnext50_32x4d': resnext50_32x4d,
-    'resnext101_32x8d': resnext101_32x8d,
-    'resnet50_fc512': resnet50_fc512,
-    'se_resnet50': se_resnet50,
-    'se_resnet50_fc512': se_resnet50_fc512,
-    'se_resnet101': se_resnet101,
-    'se_resnext50_32x4d': se_resnext50_32x4d,
-    'se_resnext101_32x4d': se_resnext101_32x4d,
-    'densenet121': densenet121,
-    'densenet169': densenet169,
-    'densenet201': densenet201,
-    'densenet161': densenet161,
-    'densenet121_fc512': densenet121_fc512,
-    'inceptionresnetv2': inceptionresnetv2,
-    'inceptionv4': inceptionv4,
-    'xception': xception,
-    'resnet50_ibn_a': resnet50_ibn_a,
-    'resnet50_ibn_b': resnet50_ibn_b,
+    'resnet18': ('resnet', 'resnet18'),
+    'resnet34': ('resnet', 'resnet34'),
+    'resnet50': ('resnet', 'resnet50'),
+    'resnet101': ('resnet', 'resnet101'),
+    'resnet152': ('resnet', 'resnet152'),
+    'resnext50_32x4d': ('resnet', 'resnext50_32x4d'),
+    'resnext101_32x8d': ('resnet', 'resnext101_32x8d'),
+    'resnet50_fc512': ('resnet', 'resnet50_fc512'),
+    'se_resnet50': ('senet', 'se_resnet50'),
+    'se_resnet50_fc512': ('senet', 'se_resnet50_fc512'),
+    'se_resnet101': ('senet', 'se_resnet101'),
+    'se_resnext50_32x4d': ('senet', 'se_resnext50_32x4d'),
+    'se_resnext101_32x4d': ('senet', 'se_resnext101_32x4d'),
+    'densenet121': ('densenet', 'densenet121'),
+    'densenet169': ('densenet', 'densenet169'),
+    'densenet201': ('densenet', 'densenet201'),
+    'densenet161': ('densenet', 'densenet161'),
+    'densenet121_fc512': ('densenet', 'densenet121_fc512'),
+    'inceptionresnetv2': ('inceptionresnetv2', 'inceptionresnetv2'),
+    'inceptionv4': ('inceptionv4', 'inceptionv4'),
+    'xception': ('xception', 'xception'),
+    'resnet50_ibn_a': ('resnet_ibn_a', 'resnet50_ibn_a'),
+    'resnet50_ibn_b': ('resnet_ibn_b', 'resnet50_ibn_b'),
     # lightweight models
-    'nasnsetmobile': nasnetamobile,
-    'mobilenetv2_x1_0': mobilenetv2_x1_0,
-    'mobilenetv2_x1_4': mobilenetv2_x1_4,
-    'shufflenet': shufflenet,
-    'squeezenet1_0': squeezenet1_0,
-    'squeezenet1_0_fc512': squeezenet1_0_fc512,
-    'squeezenet1_1': squeezenet1_1,
-    'shufflenet_v2_x0_5': shufflenet_v2_x0_5,
-    'shufflenet_v2_x1_0': shufflenet_v2_x1_0,
-    'shufflenet_v2_x1_5': shufflenet_v2_x1_5,
-    'shufflenet_v2_x2_0': shufflenet_v2_x2_0,
+    'nasnsetmobile': ('nasnet', 'nasnetamobile'),
+    'mobilenetv2_x1_0': ('mobilenetv2', 'mobilenetv2_x1_0'),
+    'mobilenetv2_x1_4': ('mobilenetv2', 'mobilenetv2_x1_4'),
+    'shufflenet': ('shufflenet', 'shufflenet'),
+    'squeezenet1_0': ('squeezenet', 'squeezenet1_0'),
+    'squeezenet1_0_fc512': ('squeezenet', 'squeezenet1_0_fc512'),
+    'squeezenet1_1': ('squeezenet', 'squeezenet1_1'),
+    'shufflenet_v2_x0_5': ('shufflenetv2', 'shufflenet_v2_x0_5'),
+    'shufflenet_v2_x1_0': ('shufflenetv2', 'shufflenet_v2_x1_0'),
+    'shufflenet_v2_x1_5': ('shufflenetv2', 'shufflenet_v2_x1_5'),
+    'shufflenet_v2_x2_0': ('shufflenetv2', 'shufflenet_v2_x2_0'),
     # reid-specific models
-    'mudeep': MuDeep,
-    'resnet50mid': resnet50mid,
-    'hacnn': HACNN,
-    'pcb_p6': pcb_p6,
-    'pcb_p4': pcb_p4,
-    'mlfn': mlfn,
-    'osnet_x1_0': osnet_x1_0,
-    'osnet_x0_75': osnet_x0_75,
-    'osnet_x0_5': osnet_x0_5,
-    'osnet_x0_25': osnet_x0_25,
-    'osnet_ibn_x1_0': osnet_ibn_x1_0,
-    'osnet_ain_x1_0': osnet_ain_x1_0,
-    'osnet_ain_x0_75': osnet_ain_x0_75,
-    'osnet_ain_x0_5': osnet_ain_x0_5,
-    'osnet_ain_x0_25': osnet_ain_x0_25
+    'mudeep': ('mudeep', 'MuDeep'),
+    'resnet50mid': ('resnetmid', 'resnet50mid'),
+    'hacnn': ('hacnn', 'HACNN'),
+    'pcb_p6': ('pcb', 'pcb_p6'),
+    'pcb_p4': ('pcb', 'pcb_p4'),
+    'mlfn': ('mlfn', 'mlfn'),
+    'osnet_x1_0': ('osnet', 'osnet_x1_0'),
+    'osnet_x0_75': ('osnet', 'osnet_x0_75'),
+    'osnet_x0_5': ('osnet', 'osnet_x0_5'),
+    'osnet_x0_25': ('osnet', 'osnet_x0_25'),
+    'osnet_ibn_x1_0': ('osnet', 'osnet_ibn_x1_0'),
+    'osnet_ain_x1_0': ('osnet_ain', 'osnet_ain_x1_0'),
+    'osnet_ain_x0_75': ('osnet_ain', 'osnet_ain_x0_75'),
+    'osnet_ain_x0_5': ('osnet_ain', 'osnet_ain_x0_5'),
+    'osnet_ain_x0_25': ('osnet_ain', 'osnet_ain_x0_25')
 }
 
 
@@ -114,9 +94,19 @@ def build_model(
         raise KeyError(
             'Unknown model: {}. Must be one of {}'.format(name, avai_models)
         )
-    return __model_factory[name](
+    module, attr = __model_factory[name]
+    model_fn = getattr(importlib.import_module('.' + module, __name__), attr)
+    return model_fn(
         num_classes=num_classes,
         loss=loss,
         pretrained=pretrained,
         use_gpu=use_gpu
     )
+
+
+def __getattr__(name):
+    # model functions as attributes, e.g. models.osnet_x1_0, imported on first access
+    for module, attr in __model_factory.values():
+        if attr == name:
+            return getattr(importlib.import_module('.' + module, __name__), attr)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
@@ -3,6 +3,7 @@ import numpy as np
 import torch
 import torchvision.transforms as T
 from PIL import Image
+from torchvision.ops import roi_align
 
 from torchreid.utils import (
     check_isfile, load_pretrained_weights, compute_model_complexity
@@ -24,6 +25,10 @@ class FeatureExtractor(object):
     Returned is a torch tensor with shape (B, D) where D is the
     feature dimension.
 
+    For tracking, ``extract_boxes(image, boxes)`` takes a full frame and
+    an Nx4 array of (x1, y1, x2, y2) boxes and builds the normalized
+    batch on ``device`` in one pass, without per-crop PIL conversions.
+
     Args:
         model_name (str): model name.
         model_path (str): path to model weights.
@@ -54,6 +59,8 @@ class FeatureExtractor(object):
 
         features = extractor(image_list)
         print(features.shape) # output (5, 512)
+
+        features = extractor.extract_boxes(frame, boxes_xyxy)
     """
 
     def __init__(
@@ -105,6 +112,46 @@ class FeatureExtractor(object):
         self.preprocess = preprocess
         self.to_pil = to_pil
         self.device = device
+        self.image_size = tuple(image_size)
+        self.pixel_norm = pixel_norm
+        self.pixel_mean = torch.tensor(pixel_mean, device=device).view(1, 3, 1, 1) * 255.
+        self.pixel_std = torch.tensor(pixel_std, device=device).view(1, 3, 1, 1) * 255.
+
+    def preprocess_boxes(self, image, boxes):
+        """Crops, resizes and normalizes all boxes of one image at once.
+
+        Args:
+            image (numpy.ndarray): image with shape (H, W, C), uint8.
+            boxes (numpy.ndarray or torch.Tensor): Nx4 boxes in
+                (x1, y1, x2, y2) pixel coordinates.
+
+        Returns:
+            torch.Tensor: batch with shape (N, C, image_size[0], image_size[1]).
+        """
+        h, w = image.shape[:2]
+        boxes = torch.tensor(np.asarray(boxes, dtype=np.float32).reshape(-1, 4), device=self.device)
+        boxes[:, 0::2] = boxes[:, 0::2].clamp(0, w)
+        boxes[:, 1::2] = boxes[:, 1::2].clamp(0, h)
+        # channel order is kept as is, matching the ToPILImage path
+        frame = torch.from_numpy(np.ascontiguousarray(image)).to(self.device)
+        frame = frame.permute(2, 0, 1).unsqueeze(0).float()
+        rois = torch.cat((boxes.new_zeros((len(boxes), 1)), boxes), 1)
+        # adaptive sampling averages over the source cells, similar to an
+        # antialiased resize when crops are larger than the output size
+        images = roi_align(frame, rois, output_size=self.image_size, spatial_scale=1.0,
+                           sampling_ratio=0, aligned=True)
+        if self.pixel_norm:
+            images = (images - self.pixel_mean) / self.pixel_std
+        else:
+            images = images / 255.
+        return images
+
+    def extract_boxes(self, image, boxes):
+        """Returns features with shape (N, D) for the Nx4 xyxy `boxes` of `image`."""
+        images = self.preprocess_boxes(image, boxes)
+        with torch.no_grad():
+            features = self.model(images)
+        return features
 
     def __call__(self, input):
         if isinstance(input, list):
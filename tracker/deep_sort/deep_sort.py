@@ -10,19 +10,38 @@ from tracker.build import TRACKER_REGISTRY
 from tracker.tracker import Tracker
 
 sys.path.append('tracker/deep_sort/deep/reid')
-from torchreid.utils import FeatureExtractor
 
-__all__ = ['DeepSort','deepsort']
+__all__ = ['DeepSort','deepsort','shared_extractor']
 
+_extractors = {}
 
-class DeepSort(Tracker):
-    def __init__(self, model_type, device, max_dist=0.2, max_iou_distance=0.7, max_age=70, n_init=3, nn_budget=100):
 
-        self.extractor = FeatureExtractor(
+def shared_extractor(model_type, device):
+    """
+    FeatureExtractor for `model_type` on `device`, loaded once per process so
+    that tracker instances of several streams share the same ReID weights.
+    torchreid is imported here, runs without ReID never load it.
+    """
+    key = (model_type, str(device))
+    if key not in _extractors:
+        from torchreid.utils import FeatureExtractor
+        _extractors[key] = FeatureExtractor(
             model_name=model_type,
             device=str(device)
         )
+    return _extractors[key]
+
+
+class DeepSort(Tracker):
+    def __init__(self, model_type, device, max_dist=0.2, max_iou_distance=0.7, max_age=70, n_init=3, nn_budget=100,
+                 reid_margin=None):
+
+        self.extractor = shared_extractor(model_type, device)
         print(str(device))
+        # adaptive ReID: detections that IoU associates with this margin skip feature extraction
+        self.reid_margin = reid_margin
+        self.reid_computed = 0
+        self.reid_candidates = 0
  
         max_cosine_distance = max_dist
         metric = NearestNeighborDistanceMetric(
@@ -32,16 +51,38 @@ class DeepSort(Tracker):
 
     def update(self, bbox_xywh, confidences, classes, ori_img, use_yolo_preds=False):
         self.height, self.width = ori_img.shape[:2]
-        # generate detections
-        features = self._get_features(bbox_xywh, ori_img)
+        self.tracker.predict()
+
+        # generate detections, features only for those motion cannot associate
         bbox_tlwh = self._xywh_to_tlwh(bbox_xywh)
-        detections = [Detection(bbox_tlwh[i], conf, features[i]) for i, conf in enumerate(
+        detections = [Detection(bbox_tlwh[i], conf, None) for i, conf in enumerate(
             confidences)]
-            
+        matches = []
+        if self.reid_margin is not None:
+            matches = self.tracker.confident_matches(detections, self.reid_margin)
+        skipped = set(d for _, d in matches)
+        need = [i for i in range(len(detections)) if i not in skipped]
+        features = self._get_features(np.asarray(bbox_xywh)[need], ori_img)
+        for i, feature in zip(need, features):
+            detections[i].feature = np.asarray(feature.cpu(), dtype=np.float32)
+        self.reid_computed += len(need)
+        self.reid_candidates += len(detections)
+
         # update tracker
-        self.tracker.predict()
-        self.tracker.update(detections, classes)
+        self.tracker.update(detections, classes, matches)
+        return self._outputs(use_yolo_preds)
 
+    def predict(self):
+        """Kalman-only step for a frame without detections, the tracks do not age"""
+        self.tracker.extrapolate()
+        return self._outputs()
+
+    def hold(self):
+        """Step for a frame of a static scene: the tracks seen last stay where they are, missed ones keep ageing"""
+        self.tracker.hold()
+        return self._outputs()
+
+    def _outputs(self, use_yolo_preds=False):
         # output bbox identities
         outputs = []
         for track in self.tracker.tracks:
@@ -60,6 +101,10 @@ class DeepSort(Tracker):
             outputs = np.stack(outputs, axis=0)
         return outputs
 
+    @property
+    def reid_skip_rate(self):
+        return 1.0 - self.reid_computed / max(self.reid_candidates, 1)
+
     """
     TODO:
         Convert bbox from xc_yc_w_h to xtl_ytl_w_h
@@ -109,16 +154,17 @@ class DeepSort(Tracker):
         return t, l, w, h
 
     def _get_features(self, bbox_xywh, ori_img):
-        im_crops = []
-        for box in bbox_xywh:
-            x1, y1, x2, y2 = self._xywh_to_xyxy(box)
-            im = ori_img[y1:y2, x1:x2]
-            im_crops.append(im)
-        if im_crops:
-            features = self.extractor(im_crops)
-        else:
-            features = np.array([])
-        return features
+        bbox_xywh = np.asarray(bbox_xywh, dtype=np.float32).reshape(-1, 4)
+        if not len(bbox_xywh):
+            return np.array([])
+        # same clipping as _xywh_to_xyxy, for all boxes at once
+        x, y, w, h = bbox_xywh.T
+        bbox_xyxy = np.stack([
+            np.maximum(np.trunc(x - w / 2), 0),
+            np.maximum(np.trunc(y - h / 2), 0),
+            np.minimum(np.trunc(x + w / 2), self.width - 1),
+            np.minimum(np.trunc(y + h / 2), self.height - 1)], axis=1)
+        return self.extractor.extract_boxes(ori_img, bbox_xyxy)
 
 
 @TRACKER_REGISTRY.register()
@@ -130,5 +176,6 @@ def deepsort(args):
                     max_dist=cfg.DEEPSORT.MAX_DIST,
                     max_iou_distance=cfg.DEEPSORT.MAX_IOU_DISTANCE,
                     max_age=cfg.DEEPSORT.MAX_AGE, n_init=cfg.DEEPSORT.N_INIT, nn_budget=cfg.DEEPSORT.NN_BUDGET,
+                    reid_margin=cfg.DEEPSORT.get('REID_MARGIN'),
                     )
     return model
\ No newline at end of file
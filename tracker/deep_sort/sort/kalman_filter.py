@@ -183,6 +183,101 @@ class KalmanFilter(object):
             kalman_gain, projected_cov, kalman_gain.T))
         return new_mean, new_covariance
 
+    def multi_predict(self, mean, covariance):
+        """Run Kalman filter prediction step (Vectorized version).
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional mean matrix of the object states at the previous
+            time step.
+        covariance : ndarray
+            The Nx8x8 dimensional covariance matrices of the object states at the
+            previous time step.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the mean matrix and covariance matrices of the predicted
+            states.
+
+        """
+        std = np.stack([
+            self._std_weight_position * mean[:, 0],
+            self._std_weight_position * mean[:, 1],
+            1 * mean[:, 2],
+            self._std_weight_position * mean[:, 3],
+            self._std_weight_velocity * mean[:, 0],
+            self._std_weight_velocity * mean[:, 1],
+            0.1 * mean[:, 2],
+            self._std_weight_velocity * mean[:, 3]], axis=1)
+        motion_cov = np.zeros_like(covariance)
+        diag = np.arange(8)
+        motion_cov[:, diag, diag] = np.square(std)
+
+        mean = np.dot(mean, self._motion_mat.T)
+        covariance = np.matmul(np.matmul(
+            self._motion_mat, covariance), self._motion_mat.T) + motion_cov
+        return mean, covariance
+
+    def multi_project(self, mean, covariance):
+        """Project state distributions to measurement space (Vectorized version).
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional mean matrix of the states.
+        covariance : ndarray
+            The Nx8x8 dimensional covariance matrices of the states.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the Nx4 projected means and Nx4x4 projected covariance
+            matrices of the given state estimates.
+
+        """
+        std = np.stack([
+            self._std_weight_position * mean[:, 0],
+            self._std_weight_position * mean[:, 1],
+            0.1 * mean[:, 2],
+            self._std_weight_position * mean[:, 3]], axis=1)
+        # the observation matrix selects the first four state components
+        projected_mean = mean[:, :4]
+        projected_cov = covariance[:, :4, :4].copy()
+        diag = np.arange(4)
+        projected_cov[:, diag, diag] += np.square(std)
+        return projected_mean, projected_cov
+
+    def multi_update(self, mean, covariance, measurement):
+        """Run Kalman filter correction step (Vectorized version).
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional predicted state means.
+        covariance : ndarray
+            The Nx8x8 dimensional state covariances.
+        measurement : ndarray
+            The Nx4 dimensional measurements (x, y, a, h), one per state.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the measurement-corrected state distributions.
+
+        """
+        projected_mean, projected_cov = self.multi_project(mean, covariance)
+
+        # K^T = S^-1 * H * P, solved for all states at once
+        kalman_gain_t = np.linalg.solve(projected_cov, covariance[:, :4, :])
+        innovation = measurement - projected_mean
+
+        new_mean = mean + np.einsum('ni,nij->nj', innovation, kalman_gain_t)
+        new_covariance = covariance - np.matmul(
+            np.matmul(kalman_gain_t.transpose(0, 2, 1), projected_cov), kalman_gain_t)
+        return new_mean, new_covariance
+
     def gating_distance(self, mean, covariance, measurements,
                         only_position=False):
         """Compute gating distance between state distribution and measurements.
@@ -225,3 +320,39 @@ class KalmanFilter(object):
             overwrite_b=True)
         squared_maha = np.sum(z * z, axis=0)
         return squared_maha
+
+    def gating_distance_batch(self, mean, covariance, measurements,
+                              only_position=False):
+        """Compute gating distances between many state distributions and
+        measurements at once.
+
+        Parameters
+        ----------
+        mean : ndarray
+            Nx8 matrix of state means.
+        covariance : ndarray
+            Nx8x8 array of state covariances.
+        measurements : ndarray
+            An Mx4 dimensional matrix of M measurements in format (x, y, a, h).
+        only_position : Optional[bool]
+            If True, distance computation is done with respect to the bounding
+            box center position only.
+
+        Returns
+        -------
+        ndarray
+            Returns an NxM matrix, where element (i, j) contains the squared
+            Mahalanobis distance between state i and `measurements[j]`.
+
+        """
+        mean, covariance = self.multi_project(mean, covariance)
+        measurements = np.asarray(measurements).reshape(-1, 4)
+        if only_position:
+            mean, covariance = mean[:, :2], covariance[:, :2, :2]
+            measurements = measurements[:, :2]
+
+        cholesky_factor = np.linalg.cholesky(covariance)
+        d = measurements[None, :, :] - mean[:, None, :]
+        z = np.linalg.solve(cholesky_factor, d.transpose(0, 2, 1))
+        squared_maha = np.sum(z * z, axis=1)
+        return squared_maha
@@ -51,24 +51,32 @@ def min_cost_matching(
 
     cost_matrix = distance_metric(
         tracks, detections, track_indices, detection_indices)
+    return _solve(cost_matrix, max_distance, track_indices, detection_indices)
+
+
+def _solve(cost_matrix, max_distance, track_indices, detection_indices):
+    """Solve the assignment for a precomputed cost matrix whose rows and
+    columns map to `track_indices` and `detection_indices`. Unmatched
+    bookkeeping is done with boolean masks instead of list scans.
+    """
+    track_indices = np.asarray(track_indices)
+    detection_indices = np.asarray(detection_indices)
     cost_matrix[cost_matrix > max_distance] = max_distance + 1e-5
     row_indices, col_indices = linear_sum_assignment(cost_matrix)
 
-    matches, unmatched_tracks, unmatched_detections = [], [], []
-    for col, detection_idx in enumerate(detection_indices):
-        if col not in col_indices:
-            unmatched_detections.append(detection_idx)
-    for row, track_idx in enumerate(track_indices):
-        if row not in row_indices:
-            unmatched_tracks.append(track_idx)
-    for row, col in zip(row_indices, col_indices):
-        track_idx = track_indices[row]
-        detection_idx = detection_indices[col]
-        if cost_matrix[row, col] > max_distance:
-            unmatched_tracks.append(track_idx)
-            unmatched_detections.append(detection_idx)
-        else:
-            matches.append((track_idx, detection_idx))
+    valid = cost_matrix[row_indices, col_indices] <= max_distance
+    row_assigned = np.zeros(len(track_indices), dtype=bool)
+    row_assigned[row_indices] = True
+    col_assigned = np.zeros(len(detection_indices), dtype=bool)
+    col_assigned[col_indices] = True
+
+    # never assigned first, then assigned pairs rejected by the gate
+    unmatched_tracks = np.r_[
+        track_indices[~row_assigned], track_indices[row_indices[~valid]]].tolist()
+    unmatched_detections = np.r_[
+        detection_indices[~col_assigned], detection_indices[col_indices[~valid]]].tolist()
+    matches = list(zip(track_indices[row_indices[valid]].tolist(),
+                       detection_indices[col_indices[valid]].tolist()))
     return matches, unmatched_tracks, unmatched_detections
 
 
@@ -113,23 +121,26 @@ def matching_cascade(
     if detection_indices is None:
         detection_indices = list(range(len(detections)))
 
-    unmatched_detections = detection_indices
+    unmatched_detections = list(detection_indices)
     matches = []
-    for level in range(cascade_depth):
+    if len(track_indices) == 0 or len(detection_indices) == 0:
+        return matches, list(track_indices), unmatched_detections
+
+    # The cost between a track and a detection does not depend on the cascade
+    # level, so the full matrix is computed once and sliced per age bucket.
+    cost_matrix = distance_metric(
+        tracks, detections, track_indices, detection_indices)
+    ages = np.array([tracks[k].time_since_update for k in track_indices])
+    col_of = {d: col for col, d in enumerate(detection_indices)}
+    for age in np.unique(ages[(ages >= 1) & (ages <= cascade_depth)]):
         if len(unmatched_detections) == 0:  # No detections left
             break
 
-        track_indices_l = [
-            k for k in track_indices
-            if tracks[k].time_since_update == 1 + level
-        ]
-        if len(track_indices_l) == 0:  # Nothing to match at this level
-            continue
-
-        matches_l, _, unmatched_detections = \
-            min_cost_matching(
-                distance_metric, max_distance, tracks, detections,
-                track_indices_l, unmatched_detections)
+        rows = np.flatnonzero(ages == age)
+        cols = [col_of[d] for d in unmatched_detections]
+        matches_l, _, unmatched_detections = _solve(
+            cost_matrix[np.ix_(rows, cols)], max_distance,
+            [track_indices[r] for r in rows], unmatched_detections)
         matches += matches_l
     unmatched_tracks = list(set(track_indices) - set(k for k, _ in matches))
     return matches, unmatched_tracks, unmatched_detections
@@ -169,13 +180,15 @@ def gate_cost_matrix(
     ndarray
         Returns the modified cost matrix.
     """
+    if cost_matrix.size == 0:
+        return cost_matrix
     gating_dim = 2 if only_position else 4
     gating_threshold = kalman_filter.chi2inv95[gating_dim]
     measurements = np.asarray(
         [detections[i].to_xyah() for i in detection_indices])
-    for row, track_idx in enumerate(track_indices):
-        track = tracks[track_idx]
-        gating_distance = kf.gating_distance(
-            track.mean, track.covariance, measurements, only_position)
-        cost_matrix[row, gating_distance > gating_threshold] = gated_cost
+    gating_distance = kf.gating_distance_batch(
+        np.asarray([tracks[i].mean for i in track_indices]),
+        np.asarray([tracks[i].covariance for i in track_indices]),
+        measurements, only_position)
+    cost_matrix[gating_distance > gating_threshold] = gated_cost
     return cost_matrix
\ No newline at end of file
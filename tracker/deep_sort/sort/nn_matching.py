@@ -2,92 +2,18 @@
 import numpy as np
 
 
-def _pdist(a, b):
-    """Compute pair-wise squared distance between points in `a` and `b`.
-    Parameters
-    ----------
-    a : array_like
-        An NxM matrix of N samples of dimensionality M.
-    b : array_like
-        An LxM matrix of L samples of dimensionality M.
-    Returns
-    -------
-    ndarray
-        Returns a matrix of size len(a), len(b) such that eleement (i, j)
-        contains the squared distance between `a[i]` and `b[j]`.
-    """
-    a, b = np.asarray(a), np.asarray(b)
-    if len(a) == 0 or len(b) == 0:
-        return np.zeros((len(a), len(b)))
-    a2, b2 = np.square(a).sum(axis=1), np.square(b).sum(axis=1)
-    r2 = -2. * np.dot(a, b.T) + a2[:, None] + b2[None, :]
-    r2 = np.clip(r2, 0., float(np.inf))
-    return r2
-
-
-def _cosine_distance(a, b, data_is_normalized=False):
-    """Compute pair-wise cosine distance between points in `a` and `b`.
-    Parameters
-    ----------
-    a : array_like
-        An NxM matrix of N samples of dimensionality M.
-    b : array_like
-        An LxM matrix of L samples of dimensionality M.
-    data_is_normalized : Optional[bool]
-        If True, assumes rows in a and b are unit length vectors.
-        Otherwise, a and b are explicitly normalized to lenght 1.
-    Returns
-    -------
-    ndarray
-        Returns a matrix of size len(a), len(b) such that eleement (i, j)
-        contains the squared distance between `a[i]` and `b[j]`.
-    """
-    if not data_is_normalized:
-        a = np.asarray(a) / np.linalg.norm(a, axis=1, keepdims=True)
-        b = np.asarray(b) / np.linalg.norm(b, axis=1, keepdims=True)
-    return 1. - np.dot(a, b.T)
-
-
-def _nn_euclidean_distance(x, y):
-    """ Helper function for nearest neighbor distance metric (Euclidean).
-    Parameters
-    ----------
-    x : ndarray
-        A matrix of N row-vectors (sample points).
-    y : ndarray
-        A matrix of M row-vectors (query points).
-    Returns
-    -------
-    ndarray
-        A vector of length M that contains for each entry in `y` the
-        smallest Euclidean distance to a sample in `x`.
-    """
-    distances = _pdist(x, y)
-    return np.maximum(0.0, distances.min(axis=0))
-
-
-def _nn_cosine_distance(x, y):
-    """ Helper function for nearest neighbor distance metric (cosine).
-    Parameters
-    ----------
-    x : ndarray
-        A matrix of N row-vectors (sample points).
-    y : ndarray
-        A matrix of M row-vectors (query points).
-    Returns
-    -------
-    ndarray
-        A vector of length M that contains for each entry in `y` the
-        smallest cosine distance to a sample in `x`.
-    """
-    distances = _cosine_distance(x, y)
-    return distances.min(axis=0)
-
-
 class NearestNeighborDistanceMetric(object):
     """
     A nearest neighbor distance metric that, for each target, returns
     the closest distance to any sample that has been observed so far.
+
+    Samples live in one contiguous `(max_tracks, budget, dim)` float32
+    gallery. Every target owns one row that is used as a ring buffer, so
+    appending a sample overwrites the oldest one once the budget is reached.
+    For the cosine metric rows are normalized when they are stored, and the
+    full targets x features cost matrix is one batched matrix product
+    followed by a masked minimum over the budget axis.
+
     Parameters
     ----------
     metric : str
@@ -98,24 +24,71 @@ class NearestNeighborDistanceMetric(object):
     budget : Optional[int]
         If not None, fix samples per class to at most this number. Removes
         the oldest samples when the budget is reached.
+    max_tracks : Optional[int]
+        Initial number of gallery rows. The gallery grows when more targets
+        are active at the same time.
+
     Attributes
     ----------
-    samples : Dict[int -> List[ndarray]]
-        A dictionary that maps from target identities to the list of samples
-        that have been observed so far.
+    samples : Dict[int -> ndarray]
+        A dictionary that maps from target identities to the samples that
+        have been observed so far, oldest first (read-only view).
     """
 
-    def __init__(self, metric, matching_threshold, budget=None):
-        if metric == "euclidean":
-            self._metric = _nn_euclidean_distance
-        elif metric == "cosine":
-            self._metric = _nn_cosine_distance
-        else:
+    def __init__(self, metric, matching_threshold, budget=None, max_tracks=128):
+        if metric not in ("euclidean", "cosine"):
             raise ValueError(
                 "Invalid metric; must be either 'euclidean' or 'cosine'")
+        self._normalize = metric == "cosine"
         self.matching_threshold = matching_threshold
         self.budget = budget
-        self.samples = {}
+        self.max_tracks = max_tracks
+
+        self._gallery = None  # (max_tracks, budget, dim), allocated on first fit
+        self._count = np.zeros(max_tracks, dtype=np.int64)  # valid samples per row
+        self._head = np.zeros(max_tracks, dtype=np.int64)  # next write position per row
+        self._rows = {}  # target -> gallery row
+        self._free = list(range(max_tracks - 1, -1, -1))
+
+    @property
+    def samples(self):
+        samples = {}
+        for target, row in self._rows.items():
+            n, cap = self._count[row], self._gallery.shape[1]
+            order = (self._head[row] - n + np.arange(n)) % cap
+            samples[target] = self._gallery[row, order]
+        return samples
+
+    def _allocate(self, dim):
+        budget = self.budget if self.budget is not None else 16
+        self._gallery = np.zeros((self.max_tracks, budget, dim), dtype=np.float32)
+
+    def _grow_tracks(self):
+        n = len(self._count)
+        self._gallery = np.concatenate((self._gallery, np.zeros_like(self._gallery)), axis=0)
+        self._count = np.r_[self._count, np.zeros(n, dtype=np.int64)]
+        self._head = np.r_[self._head, np.zeros(n, dtype=np.int64)]
+        self._free = list(range(2 * n - 1, n - 1, -1)) + self._free
+
+    def _grow_budget(self, needed):
+        # only used without a budget: unroll the rings and double the sample axis
+        cap = self._gallery.shape[1]
+        new_cap = max(2 * cap, needed)
+        gallery = np.zeros((len(self._gallery), new_cap, self._gallery.shape[2]), dtype=np.float32)
+        for row in self._rows.values():
+            n = self._count[row]
+            gallery[row, :n] = self._gallery[row, (self._head[row] - n + np.arange(n)) % cap]
+            self._head[row] = n
+        self._gallery = gallery
+
+    def _row(self, target):
+        row = self._rows.get(target)
+        if row is None:
+            if not self._free:
+                self._grow_tracks()
+            row = self._rows[target] = self._free.pop()
+            self._count[row] = self._head[row] = 0
+        return row
 
     def partial_fit(self, features, targets, active_targets):
         """Update the distance metric with new data.
@@ -128,12 +101,41 @@ class NearestNeighborDistanceMetric(object):
         active_targets : List[int]
             A list of targets that are currently present in the scene.
         """
-        for feature, target in zip(features, targets):
-            self.samples.setdefault(target, []).append(feature)
+        features = np.asarray(features, dtype=np.float32)
+        targets = np.asarray(targets)
+        if len(features):
+            if self._gallery is None:
+                self._allocate(features.shape[1])
+            if self._normalize:
+                features = features / np.linalg.norm(features, axis=1, keepdims=True)
+
+            # rank of each feature among those of the same target, in arrival order
+            rows = np.array([self._row(t) for t in targets.tolist()], dtype=np.int64)
+            order = np.argsort(rows, kind='stable')
+            sorted_rows = rows[order]
+            starts = np.r_[0, np.flatnonzero(np.diff(sorted_rows)) + 1]
+            lengths = np.diff(np.r_[starts, len(rows)])
+            rank = np.empty(len(rows), dtype=np.int64)
+            rank[order] = np.arange(len(rows)) - np.repeat(starts, lengths)
+            new = np.zeros(len(self._count), dtype=np.int64)
+            np.add.at(new, rows, 1)
+
+            if self.budget is None and (self._count + new).max() > self._gallery.shape[1]:
+                self._grow_budget(int((self._count + new).max()))
+            cap = self._gallery.shape[1]
+
             ## keep last budget(100) appearance descriptors for each track
-            if self.budget is not None:
-                self.samples[target] = self.samples[target][-self.budget:]
-        self.samples = {k: self.samples[k] for k in active_targets}
+            keep = rank >= new[rows] - cap
+            pos = (self._head[rows] + rank) % cap
+            self._gallery[rows[keep], pos[keep]] = features[keep]
+            self._head = (self._head + new) % cap
+            self._count = np.minimum(self._count + new, cap)
+
+        active = set(np.asarray(active_targets).tolist())
+        for target in [t for t in self._rows if t not in active]:
+            row = self._rows.pop(target)
+            self._count[row] = 0
+            self._free.append(row)
 
     def distance(self, features, targets):
         """Compute distance between features and targets.
@@ -150,7 +152,23 @@ class NearestNeighborDistanceMetric(object):
             element (i, j) contains the closest squared distance between
             `targets[i]` and `features[j]`.
         """
-        cost_matrix = np.zeros((len(targets), len(features)))
-        for i, target in enumerate(targets):
-            cost_matrix[i, :] = self._metric(self.samples[target], features)
-        return cost_matrix
\ No newline at end of file
+        targets = np.asarray(targets).tolist()
+        if len(targets) == 0 or len(features) == 0:
+            return np.zeros((len(targets), len(features)))
+        rows = np.array([self._rows[t] for t in targets], dtype=np.int64)
+        counts = self._count[rows]
+        n = int(counts.max())
+        if n == 0:
+            return np.full((len(targets), len(features)), np.inf)
+
+        features = np.asarray(features, dtype=np.float32)
+        gallery = self._gallery[rows, :n]  # (T, n, M)
+        if self._normalize:
+            features = features / np.linalg.norm(features, axis=1, keepdims=True)
+            distances = 1. - np.matmul(gallery, features.T)  # (T, n, N)
+        else:
+            g2 = np.square(gallery).sum(axis=2)[:, :, None]
+            f2 = np.square(features).sum(axis=1)[None, None, :]
+            distances = np.maximum(0.0, g2 + f2 - 2. * np.matmul(gallery, features.T))
+        distances[np.arange(n)[None, :] >= counts[:, None]] = np.inf
+        return distances.min(axis=1).astype(np.float64)
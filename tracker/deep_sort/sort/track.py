@@ -1,4 +1,5 @@
 # vim: expandtab:ts=4:sw=4
+import numpy as np
 
 
 class TrackState:
@@ -16,6 +17,46 @@ class TrackState:
     Deleted = 3
 
 
+class KalmanStateStore:
+    """
+    Structure-of-arrays storage for the Kalman states of many tracks, so that
+    predict/update can run as batched matrix operations.
+
+    Parameters
+    ----------
+    capacity : int
+        Initial number of slots. The store doubles in size when full.
+
+    Attributes
+    ----------
+    mean : ndarray
+        The (capacity, 8) matrix of state means.
+    covariance : ndarray
+        The (capacity, 8, 8) array of state covariances.
+
+    """
+
+    def __init__(self, capacity=64, ndim=8):
+        self.mean = np.zeros((capacity, ndim))
+        self.covariance = np.zeros((capacity, ndim, ndim))
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def allocate(self, mean, covariance):
+        """Reserve a slot, initialize it and return its index."""
+        if not self._free:
+            n = len(self.mean)
+            self.mean = np.concatenate((self.mean, np.zeros_like(self.mean)))
+            self.covariance = np.concatenate((self.covariance, np.zeros_like(self.covariance)))
+            self._free = list(range(2 * n - 1, n - 1, -1))
+        slot = self._free.pop()
+        self.mean[slot] = mean
+        self.covariance[slot] = covariance
+        return slot
+
+    def release(self, slot):
+        self._free.append(slot)
+
+
 class Track:
     """
     A single target track with state space `(x, y, a, h)` and associated
@@ -40,6 +81,9 @@ class Track:
     feature : Optional[ndarray]
         Feature vector of the detection this track originates from. If not None,
         this feature is added to the `features` cache.
+    store : Optional[KalmanStateStore]
+        Shared storage for the Kalman state. `mean` and `covariance` are views
+        into the slot owned by this track. A private store is created if None.
 
     Attributes
     ----------
@@ -60,18 +104,21 @@ class Track:
     features : List[ndarray]
         A cache of features. On each measurement update, the associated feature
         vector is added to this list.
+    time_since_feature : int
+        Number of frames since a feature was last added to the cache.
 
     """
 
     def __init__(self, mean, covariance, track_id, class_id, n_init, max_age,
-                 feature=None):
-        self.mean = mean
-        self.covariance = covariance
+                 feature=None, store=None):
+        self.store = store if store is not None else KalmanStateStore(capacity=1)
+        self.slot = self.store.allocate(mean, covariance)
         self.track_id = track_id
         self.class_id = class_id
         self.hits = 1
         self.age = 1
         self.time_since_update = 0
+        self.time_since_feature = 0
         self.yolo_bbox = [0, 0, 0, 0]
 
         self.state = TrackState.Tentative
@@ -82,6 +129,22 @@ class Track:
         self._n_init = n_init
         self._max_age = max_age
 
+    @property
+    def mean(self):
+        return self.store.mean[self.slot]
+
+    @mean.setter
+    def mean(self, value):
+        self.store.mean[self.slot] = value
+
+    @property
+    def covariance(self):
+        return self.store.covariance[self.slot]
+
+    @covariance.setter
+    def covariance(self, value):
+        self.store.covariance[self.slot] = value
+
     def to_tlwh(self):
         """Get current position in bounding box format `(top left x, top left y,
         width, height)`.
@@ -125,6 +188,7 @@ class Track:
     def increment_age(self):
         self.age += 1
         self.time_since_update += 1
+        self.time_since_feature += 1
 
     def predict(self, kf):
         """Propagate the state distribution to the current time step using a
@@ -151,10 +215,20 @@ class Track:
             The associated detection.
 
         """
-        self.yolo_bbox = detection
         self.mean, self.covariance = kf.update(
             self.mean, self.covariance, detection.to_xyah())
-        self.features.append(detection.feature)
+        self.mark_hit(detection, class_id)
+
+    def mark_hit(self, detection, class_id):
+        """Bookkeeping of a measurement update whose Kalman correction has
+        already been applied to `mean` and `covariance` (e.g. batched by the
+        tracker).
+
+        """
+        self.yolo_bbox = detection
+        if detection.feature is not None:
+            self.features.append(detection.feature)
+            self.time_since_feature = 0
         self.class_id = class_id
 
         self.hits += 1
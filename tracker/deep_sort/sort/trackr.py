@@ -4,7 +4,7 @@ import numpy as np
 from . import kalman_filter
 from . import linear_assignment
 from . import iou_matching
-from .track import Track
+from .track import Track, KalmanStateStore
 
 
 class Trackr:
@@ -30,6 +30,8 @@ class Trackr:
         Number of frames that a track remains in initialization phase.
     kf : kalman_filter.KalmanFilter
         A Kalman filter to filter target trajectories in image space.
+    store : track.KalmanStateStore
+        Means and covariances of all tracks, filtered as one batch.
     tracks : List[Track]
         The list of active tracks at the current time step.
     """
@@ -43,6 +45,7 @@ class Trackr:
         self._lambda = _lambda
 
         self.kf = kalman_filter.KalmanFilter()
+        self.store = KalmanStateStore()
         self.tracks = []
         self._next_id = 1
 
@@ -51,35 +54,119 @@ class Trackr:
 
         This function should be called once every time step, before `update`.
         """
+        self.extrapolate()
         for track in self.tracks:
-            track.predict(self.kf)
+            track.increment_age()
+
+    def extrapolate(self):
+        """Propagate track state distributions one time step forward without
+        ageing the tracks, for time steps without detections.
+        """
+        if len(self.tracks) == 0:
+            return
+        slots = [t.slot for t in self.tracks]
+        self.store.mean[slots], self.store.covariance[slots] = self.kf.multi_predict(
+            self.store.mean[slots], self.store.covariance[slots])
+
+    def hold(self):
+        """Advance one time step in which nothing moved: the tracks matched at
+        the last step keep their state, missed ones age and are deleted as
+        usual.
+        """
+        for track in self.tracks:
+            if track.time_since_update == 0:
+                track.age += 1
+            else:
+                track.increment_age()
+                track.mark_missed()
+        for t in self.tracks:
+            if t.is_deleted():
+                self.store.release(t.slot)
+        self.tracks = [t for t in self.tracks if not t.is_deleted()]
 
     def increment_ages(self):
         for track in self.tracks:
             track.increment_age()
             track.mark_missed()
 
-    def update(self, detections, classes):
+    def confident_matches(self, detections, margin, max_feature_age=30):
+        """Track / detection pairs that motion alone associates without
+        ambiguity, so that their detections need no appearance feature.
+
+        A pair qualifies when track and detection are each other's lowest IoU
+        cost, that cost is within `max_iou_distance` and the second best
+        candidate of both the track and the detection costs at least `margin`
+        more. Tracks that missed the last frame (returning from the lost
+        state) and tracks without a new feature for `max_feature_age` frames
+        are left to the appearance cascade. Call after `predict`.
+
+        Parameters
+        ----------
+        detections : List[deep_sort.detection.Detection]
+            A list of detections at the current time step.
+        margin : float
+            Minimum IoU cost gap to the second best candidate.
+        max_feature_age : int
+            Tracks not embedded for longer are always matched on appearance.
+
+        Returns
+        -------
+        List[(int, int)]
+            Matched track and detection indices, to pass to `update`.
+
+        """
+        if len(self.tracks) == 0 or len(detections) == 0:
+            return []
+        candidates = np.asarray([d.tlwh for d in detections])
+        cost = np.asarray([1. - iou_matching.iou(t.to_tlwh(), candidates) for t in self.tracks])
+        # gap to the second best candidate, a lone candidate is compared to no overlap (cost 1)
+        rows = np.sort(np.c_[cost, np.ones(len(cost))], axis=1)
+        cols = np.sort(np.r_[cost, np.ones((1, cost.shape[1]))], axis=0)
+        row_margin, col_margin = rows[:, 1] - rows[:, 0], cols[1] - cols[0]
+        best_track = cost.argmin(axis=0)
+
+        matches = []
+        for track_idx, detection_idx in enumerate(cost.argmin(axis=1)):
+            track = self.tracks[track_idx]
+            if best_track[detection_idx] == track_idx \
+                    and cost[track_idx, detection_idx] <= self.max_iou_distance \
+                    and row_margin[track_idx] >= margin and col_margin[detection_idx] >= margin \
+                    and track.time_since_update == 1 and track.time_since_feature <= max_feature_age:
+                matches.append((track_idx, int(detection_idx)))
+        return matches
+
+    def update(self, detections, classes, matches=None):
         """Perform measurement update and track management.
 
         Parameters
         ----------
         detections : List[deep_sort.detection.Detection]
             A list of detections at the current time step.
+        matches : Optional[List[(int, int)]]
+            Track and detection indices already associated (see
+            `confident_matches`), the rest goes through the matching cascade.
 
         """
         # Run matching cascade.
         matches, unmatched_tracks, unmatched_detections = \
-            self._match(detections)
+            self._match(detections, matches)
 
-        # Update track set.
+        # Update track set, with one batched Kalman correction for all matches.
+        if len(matches):
+            slots = [self.tracks[track_idx].slot for track_idx, _ in matches]
+            measurements = np.asarray([detections[detection_idx].to_xyah() for _, detection_idx in matches])
+            self.store.mean[slots], self.store.covariance[slots] = self.kf.multi_update(
+                self.store.mean[slots], self.store.covariance[slots], measurements)
         for track_idx, detection_idx in matches:
-            self.tracks[track_idx].update(
-                self.kf, detections[detection_idx], classes[detection_idx])
+            self.tracks[track_idx].mark_hit(
+                detections[detection_idx], classes[detection_idx])
         for track_idx in unmatched_tracks:
             self.tracks[track_idx].mark_missed()
         for detection_idx in unmatched_detections:
             self._initiate_track(detections[detection_idx], classes[detection_idx].item())
+        for t in self.tracks:
+            if t.is_deleted():
+                self.store.release(t.slot)
         self.tracks = [t for t in self.tracks if not t.is_deleted()]
 
         # Update distance metric.
@@ -106,14 +193,13 @@ class Trackr:
         is more intuitive in terms of values.
         """
         # Compute First the Position-based Cost Matrix
-        pos_cost = np.empty([len(track_indices), len(detection_indices)])
         msrs = np.asarray([dets[i].to_xyah() for i in detection_indices])
-        for row, track_idx in enumerate(track_indices):
-            pos_cost[row, :] = np.sqrt(
-                self.kf.gating_distance(
-                    tracks[track_idx].mean, tracks[track_idx].covariance, msrs, False
-                )
-            ) / self.GATING_THRESHOLD
+        slots = [tracks[i].slot for i in track_indices]
+        pos_cost = np.sqrt(
+            self.kf.gating_distance_batch(
+                self.store.mean[slots], self.store.covariance[slots], msrs, False
+            )
+        ) / self.GATING_THRESHOLD
         pos_gate = pos_cost > 1.0
         # Now Compute the Appearance-based Cost Matrix
         app_cost = self.metric.distance(
@@ -127,10 +213,18 @@ class Trackr:
         # Return Matrix
         return cost_matrix
 
-    def _match(self, detections):
+    def _match(self, detections, matches=None):
+        # Leave out pairs associated beforehand.
+        matches_0 = list(matches or [])
+        matched_tracks = set(k for k, _ in matches_0)
+        matched_detections = set(d for _, d in matches_0)
+        detection_indices = [d for d in range(len(detections)) if d not in matched_detections]
+
         # Split track set into confirmed and unconfirmed tracks.
-        confirmed_tracks = [i for i, t in enumerate(self.tracks) if t.is_confirmed()]
-        unconfirmed_tracks = [i for i, t in enumerate(self.tracks) if not t.is_confirmed()]
+        confirmed_tracks = [
+            i for i, t in enumerate(self.tracks) if t.is_confirmed() and i not in matched_tracks]
+        unconfirmed_tracks = [
+            i for i, t in enumerate(self.tracks) if not t.is_confirmed() and i not in matched_tracks]
 
         # Associate confirmed tracks using appearance features.
         matches_a, unmatched_tracks_a, unmatched_detections = linear_assignment.matching_cascade(
@@ -140,6 +234,7 @@ class Trackr:
             self.tracks,
             detections,
             confirmed_tracks,
+            detection_indices,
         )
 
         # Associate remaining tracks together with unconfirmed tracks using IOU.
@@ -158,7 +253,7 @@ class Trackr:
             unmatched_detections,
         )
 
-        matches = matches_a + matches_b
+        matches = matches_0 + matches_a + matches_b
         unmatched_tracks = list(set(unmatched_tracks_a + unmatched_tracks_b))
         return matches, unmatched_tracks, unmatched_detections
 
@@ -166,5 +261,5 @@ class Trackr:
         mean, covariance = self.kf.initiate(detection.to_xyah())
         self.tracks.append(Track(
             mean, covariance, self._next_id, class_id, self.n_init, self.max_age,
-            detection.feature))
+            detection.feature, store=self.store))
         self._next_id += 1
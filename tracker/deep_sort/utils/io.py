@@ -5,25 +5,34 @@ import numpy as np
 # from utils.log import get_logger
 
 
-def write_results(filename, results, data_type):
-    if data_type == 'mot':
-        save_format = '{frame},{id},{x1},{y1},{w},{h},-1,-1,-1,-1\n'
-    elif data_type == 'kitti':
-        save_format = '{frame} {id} pedestrian 0 0 -10 {x1} {y1} {x2} {y2} -10 -10 -10 -1000 -1000 -1000 -10\n'
-    else:
+SAVE_FORMATS = {
+    'mot': '{frame},{id},{x1},{y1},{w},{h},-1,-1,-1,-1\n',
+    'kitti': '{frame} {id} pedestrian 0 0 -10 {x1} {y1} {x2} {y2} -10 -10 -10 -1000 -1000 -1000 -10\n',
+}
+
+
+def format_results(results, data_type):
+    if data_type not in SAVE_FORMATS:
         raise ValueError(data_type)
+    save_format = SAVE_FORMATS[data_type]
 
+    lines = []
+    for frame_id, tlwhs, track_ids in results:
+        if data_type == 'kitti':
+            frame_id -= 1
+        for tlwh, track_id in zip(tlwhs, track_ids):
+            if track_id < 0:
+                continue
+            x1, y1, w, h = tlwh
+            x2, y2 = x1 + w, y1 + h
+            lines.append(save_format.format(frame=frame_id, id=track_id, x1=x1, y1=y1, x2=x2, y2=y2, w=w, h=h))
+    return ''.join(lines)
+
+
+def write_results(filename, results, data_type):
+    text = format_results(results, data_type)
     with open(filename, 'w') as f:
-        for frame_id, tlwhs, track_ids in results:
-            if data_type == 'kitti':
-                frame_id -= 1
-            for tlwh, track_id in zip(tlwhs, track_ids):
-                if track_id < 0:
-                    continue
-                x1, y1, w, h = tlwh
-                x2, y2 = x1 + w, y1 + h
-                line = save_format.format(frame=frame_id, id=track_id, x1=x1, y1=y1, x2=x2, y2=y2, w=w, h=h)
-                f.write(line)
+        f.write(text)
 
 
 # def write_results(filename, results_dict: Dict, data_type: str):
@@ -26,4 +26,23 @@ class Tracker(object):
         Returns:
             [x1,y1,x2,y2,track_id]
         """
-        pass
\ No newline at end of file
+        pass
+
+    def predict(self):
+        """
+        Advance the tracks by one frame without detections (the detector
+        skipped the frame), extrapolating them with the motion model only.
+        Returns:
+            [x1,y1,x2,y2,track_id] of the extrapolated tracks, like `update`
+        """
+        raise NotImplementedError(f'{type(self).__name__} has no predict-only step')
+
+    def hold(self):
+        """
+        Advance the tracks by one frame of a static scene (nothing moved, the
+        detector skipped the frame): the tracks seen last keep their boxes,
+        the missed ones keep ageing so that they still expire in time.
+        Returns:
+            [x1,y1,x2,y2,track_id] of the held tracks, like `update`
+        """
+        raise NotImplementedError(f'{type(self).__name__} has no hold step')
\ No newline at end of file